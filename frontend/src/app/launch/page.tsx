@@ -7,6 +7,7 @@ type StatusResponse = {
   service: { desiredCount: number; runningCount: number; status: string };
   elasticIp?: string;
   healthy: boolean;
+  phase?: 'stopped' | 'pending' | 'running' | 'placed' | 'healthy';
 };
 
 const DEFAULT_POLL_MS = 2500;
@@ -33,14 +34,17 @@ export default function LaunchPage() {
   const [username, setUsername] = useState('');
   const [password, setPassword] = useState('');
 
-  async function fetchStatus() {
+  async function fetchStatus(since: string | null): Promise<StatusResponse | null> {
     if (!apiBase) {
       setError('Missing NEXT_PUBLIC_DEV_WAKE_API_BASE');
-      return;
+      return null;
     }
 
     try {
-      const res = await fetch(`${apiBase}/status`, { cache: 'no-store' });
+      // Long-poll: answers once the wake phase moves past `since` (or after ~25s)
+      const params = new URLSearchParams({ waitFor: 'healthy' });
+      if (since) params.set('since', since);
+      const res = await fetch(`${apiBase}/status?${params}`, { cache: 'no-store' });
       const json = (await res.json()) as StatusResponse;
       setStatus(json);
       setError(null);
@@ -48,15 +52,30 @@ export default function LaunchPage() {
       if (json.healthy) {
         window.location.href = redirectUrl;
       }
+      return json;
     } catch (e) {
       setError(e instanceof Error ? e.message : 'Failed to fetch status');
+      return null;
     }
   }
 
   useEffect(() => {
-    void fetchStatus();
-    const timer = setInterval(fetchStatus, DEFAULT_POLL_MS);
-    return () => clearInterval(timer);
+    let cancelled = false;
+    void (async () => {
+      let since: string | null = null;
+      while (!cancelled) {
+        const json = await fetchStatus(since);
+        if (json?.healthy) return;
+        since = json?.phase ?? null;
+        // Sleeping with no wake in progress answers at once, so don't spin on it
+        if (!json?.phase || json.phase === 'stopped') {
+          await new Promise((resolve) => setTimeout(resolve, DEFAULT_POLL_MS));
+        }
+      }
+    })();
+    return () => {
+      cancelled = true;
+    };
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [apiBase, redirectUrl]);
 
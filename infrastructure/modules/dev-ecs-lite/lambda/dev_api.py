@@ -1,10 +1,15 @@
 import base64
+import contextlib
 import json
 import os
+import sys
+import threading
 import time
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 
 import boto3
+from botocore.exceptions import ClientError
 
 REGION = os.environ["AWS_REGION"]
 EC2_INSTANCE_ID = os.environ["EC2_INSTANCE_ID"]
@@ -12,13 +17,147 @@ ECS_CLUSTER_ARN = os.environ["ECS_CLUSTER_ARN"]
 ECS_SERVICE_NAME = os.environ["ECS_SERVICE_NAME"]
 DDB_TABLE_NAME = os.environ["DDB_TABLE_NAME"]
 IDLE_TIMEOUT_SEC = int(os.environ.get("IDLE_TIMEOUT_SEC", "3600"))
+# Adaptive idle timeout: MIN_IDLE_TIMEOUT_SEC when no use is expected, up to IDLE_TIMEOUT_SEC when it is
+MIN_IDLE_TIMEOUT_SEC = int(os.environ.get("MIN_IDLE_TIMEOUT_SEC", str(min(900, IDLE_TIMEOUT_SEC))))
+PREWAKE_ENABLED = os.environ.get("PREWAKE_ENABLED", "true").lower() not in ("0", "false", "no")
+# Look this far ahead for expected use; cover boot + task placement + the 15 min schedule
+PREWAKE_LEAD_SEC = int(os.environ.get("PREWAKE_LEAD_SEC", "1800"))
+# Share of past weeks with access in the same weekly bucket that counts as "expected use"
+PREWAKE_THRESHOLD = float(os.environ.get("PREWAKE_THRESHOLD", "0.5"))
+# After an unused pre-wake, don't try again for this long (e.g. public holidays)
+PREWAKE_RETRY_SEC = int(os.environ.get("PREWAKE_RETRY_SEC", str(12 * 3600)))
+# Access counters are kept per bucket of this many seconds (must divide a week)
+ACCESS_BUCKET_SEC = int(os.environ.get("ACCESS_BUCKET_SEC", "1800"))
+HISTORY_WEEKS = int(os.environ.get("HISTORY_WEEKS", "4"))
+WEEK_SEC = 7 * 24 * 3600
 ELASTIC_IP = os.environ.get("ELASTIC_IP", "")
 WAKE_USER = os.environ.get("WAKE_USER", "admin")
 WAKE_PASS = os.environ.get("WAKE_PASS", "1q2w3e4r")
+BACKEND_HEALTH_URL = os.environ.get("BACKEND_HEALTH_URL") or (f"http://{ELASTIC_IP}:3000/" if ELASTIC_IP else "")
+BACKEND_GRAPHQL_URL = os.environ.get("BACKEND_GRAPHQL_URL") or (f"http://{ELASTIC_IP}/graphql" if ELASTIC_IP else "")
+# Shared deadline for the concurrent /status probes
+STATUS_TIMEOUT_SEC = float(os.environ.get("STATUS_TIMEOUT_SEC", "3.5"))
+# Longest /status?waitFor=... hold; API Gateway integrations time out at 30 s
+STATUS_WAIT_MAX_SEC = float(os.environ.get("STATUS_WAIT_MAX_SEC", "25"))
+STATUS_WAIT_BACKOFF_SEC = (1.0, 1.5, 2.5)  # first delay, factor, max delay between probes
+# Wake progress, in order; "placed" means the task is running but not answering HTTP yet
+PHASES = ("stopped", "pending", "running", "placed", "healthy")
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() not in ("0", "false", "no")
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "Dermastore/Lambdas")
 
 _ec2 = boto3.client("ec2", region_name=REGION)
 _ecs = boto3.client("ecs", region_name=REGION)
 _ddb = boto3.client("dynamodb", region_name=REGION)
+_probes = ThreadPoolExecutor(max_workers=8, thread_name_prefix="probe")
+# Health checks of a stopped instance can outlive the request that started them,
+# so they get their own pool and cannot hold up the EC2/ECS probes
+_health_probes = ThreadPoolExecutor(max_workers=4, thread_name_prefix="health")
+# Phase seen by the last /status probe in this container; None until the first one
+_last_phase = None
+_monotonic = time.monotonic
+_sleep = time.sleep
+
+
+# Per-invocation spans flushed as CloudWatch EMF, in the same layout as
+# lambdas/shared/instrumentation.py (this file is deployed on its own, without the layer).
+_metrics = threading.local()
+_cold_start = True
+
+
+@contextlib.contextmanager
+def _span(dependency: str, operation: str, **values):
+    deps = getattr(_metrics, "dependencies", None)
+    if deps is None:
+        yield values
+        return
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield values
+    except Exception:
+        failed = True
+        raise
+    finally:
+        end = time.perf_counter()
+        elapsed_ms = (end - start) * 1000
+        dep = deps.setdefault(dependency, {"LatencyMs": [], "Calls": 0, "Errors": 0, "Operations": {}})
+        dep["LatencyMs"].append(round(elapsed_ms, 3))
+        dep["Calls"] += 1
+        dep["Errors"] += failed
+        dep["Operations"][operation] = dep["Operations"].get(operation, 0) + 1
+        for name, value in values.items():
+            dep[name] = dep.get(name, 0) + value
+        _metrics.overhead += time.perf_counter() - end
+
+
+def _metric(name: str, value: float = 1):
+    values = getattr(_metrics, "values", None)
+    if values is not None:
+        values[name] = values.get(name, 0) + value
+
+
+def _submit(fn, *args, executor: ThreadPoolExecutor | None = None):
+    """Run `fn` on the probe pool (or `executor`), recording its spans into the current invocation."""
+    dependencies = getattr(_metrics, "dependencies", None)
+    values = getattr(_metrics, "values", None)
+
+    def run():
+        _metrics.dependencies, _metrics.values, _metrics.overhead = dependencies, values, 0.0
+        try:
+            return fn(*args)
+        finally:
+            _metrics.dependencies = _metrics.values = None
+
+    return (executor or _probes).submit(run)
+
+
+def _unit(name: str) -> str:
+    if name.endswith("Ms"):
+        return "Milliseconds"
+    if name.endswith("Us"):
+        return "Microseconds"
+    if name.endswith("Sec"):
+        return "Seconds"
+    if name.endswith("Bytes"):
+        return "Bytes"
+    return "Count"
+
+
+def _emf(timestamp: int, dimensions: list, metrics: dict, properties: dict) -> str:
+    return json.dumps({
+        "_aws": {
+            "Timestamp": timestamp,
+            "CloudWatchMetrics": [{
+                "Namespace": METRICS_NAMESPACE,
+                "Dimensions": [dimensions],
+                "Metrics": [{"Name": name, "Unit": _unit(name)} for name in metrics],
+            }],
+        },
+        **properties,
+        **metrics,
+    }, separators=(",", ":"))
+
+
+def _flush_metrics(function: str, request_id: str, cold_start: bool, duration_ms: float, result):
+    flush_start = time.perf_counter()
+    timestamp = int(time.time() * 1000)
+    lines = []
+    for name, dep in _metrics.dependencies.items():
+        operations = dep.pop("Operations")
+        lines.append(_emf(timestamp, ["Function", "Dependency"], dep, {
+            "Function": function, "Dependency": name, "RequestId": request_id, "Operations": operations,
+        }))
+    properties = {"Function": function, "RequestId": request_id}
+    if isinstance(result, dict) and "statusCode" in result:
+        properties["StatusCode"] = result["statusCode"]
+    overhead_us = (_metrics.overhead + time.perf_counter() - flush_start) * 1e6
+    lines.insert(0, _emf(timestamp, ["Function"], {
+        "DurationMs": round(duration_ms, 3),
+        "ColdStart": int(cold_start),
+        "InstrumentationOverheadUs": round(overhead_us, 1),
+        **_metrics.values,
+    }, properties))
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def _resp(status_code: int, body: dict, headers: dict | None = None):
@@ -65,7 +204,8 @@ def _parse_basic_auth(headers: dict) -> tuple[str, str] | None:
 
 
 def _get_instance_state() -> str:
-    resp = _ec2.describe_instances(InstanceIds=[EC2_INSTANCE_ID])
+    with _span("ec2", "DescribeInstances"):
+        resp = _ec2.describe_instances(InstanceIds=[EC2_INSTANCE_ID])
     reservations = resp.get("Reservations", [])
     instance = (reservations[0].get("Instances") or [None])[0] if reservations else None
     state = ((instance or {}).get("State") or {}).get("Name")
@@ -73,7 +213,8 @@ def _get_instance_state() -> str:
 
 
 def _get_service() -> dict:
-    resp = _ecs.describe_services(cluster=ECS_CLUSTER_ARN, services=[ECS_SERVICE_NAME])
+    with _span("ecs", "DescribeServices"):
+        resp = _ecs.describe_services(cluster=ECS_CLUSTER_ARN, services=[ECS_SERVICE_NAME])
     svc = (resp.get("services") or [None])[0] or {}
     return {
         "desiredCount": int(svc.get("desiredCount", 0) or 0),
@@ -82,54 +223,179 @@ def _get_service() -> dict:
     }
 
 
-def _touch():
-    now = int(time.time())
-    _ddb.put_item(
-        TableName=DDB_TABLE_NAME,
-        Item={
-            "id": {"S": "dev"},
-            "last_access": {"N": str(now)},
+def _now() -> int:
+    return int(time.time())
+
+
+# Access history lives on the "dev" item next to last_access: one counter per
+# ACCESS_BUCKET_SEC bucket, named b<epoch // ACCESS_BUCKET_SEC>, kept for HISTORY_WEEKS.
+def _touch(wake_requested: bool = False, wake_started: bool = False):
+    now = _now()
+    assignments = ["last_access = :now", "history_since = if_not_exists(history_since, :now)"]
+    if wake_started:
+        # A wake from stopped starts a new wait, whatever an earlier wake left behind
+        assignments.append("wake_requested_at = :now")
+    elif wake_requested:
+        assignments.append("wake_requested_at = if_not_exists(wake_requested_at, :now)")
+    with _span("dynamodb", "UpdateItem"):
+        _ddb.update_item(
+            TableName=DDB_TABLE_NAME,
+            Key={"id": {"S": "dev"}},
+            UpdateExpression=f"SET {', '.join(assignments)} ADD #bucket :one",
+            ExpressionAttributeNames={"#bucket": f"b{now // ACCESS_BUCKET_SEC}"},
+            ExpressionAttributeValues={":now": {"N": str(now)}, ":one": {"N": "1"}},
+        )
+
+
+def _set_record(**values: int):
+    with _span("dynamodb", "UpdateItem"):
+        _ddb.update_item(
+            TableName=DDB_TABLE_NAME,
+            Key={"id": {"S": "dev"}},
+            UpdateExpression="SET " + ", ".join(f"{name} = :{name}" for name in values),
+            ExpressionAttributeValues={f":{name}": {"N": str(value)} for name, value in values.items()},
+        )
+
+
+def _get_access_record() -> dict:
+    with _span("dynamodb", "GetItem"):
+        resp = _ddb.get_item(
+            TableName=DDB_TABLE_NAME,
+            Key={"id": {"S": "dev"}},
+            ConsistentRead=True,
+        )
+    item = resp.get("Item") or {}
+
+    def number(name: str) -> int:
+        value = item.get(name, {}).get("N")
+        return int(value) if value else 0
+
+    return {
+        "last_access": number("last_access"),
+        "history_since": number("history_since"),
+        "prewake_at": number("prewake_at"),
+        "buckets": {
+            int(name[1:]): int(value["N"])
+            for name, value in item.items()
+            if name[:1] == "b" and name[1:].isdigit() and "N" in value
         },
-    )
+    }
 
 
-def _get_last_access() -> int:
-    resp = _ddb.get_item(
-        TableName=DDB_TABLE_NAME,
-        Key={"id": {"S": "dev"}},
-        ConsistentRead=True,
-    )
-    item = resp.get("Item")
-    if not item:
-        return 0
-    last = item.get("last_access", {}).get("N")
-    return int(last) if last else 0
+def _prune_history(record: dict, now: int):
+    # Only once buckets are a week past the window, so this is about one write a week
+    if not any(bucket < (now - (HISTORY_WEEKS + 1) * WEEK_SEC) // ACCESS_BUCKET_SEC for bucket in record["buckets"]):
+        return
+    oldest = (now - HISTORY_WEEKS * WEEK_SEC) // ACCESS_BUCKET_SEC
+    stale = sorted(bucket for bucket in record["buckets"] if bucket < oldest)[:200]
+    with _span("dynamodb", "UpdateItem"):
+        _ddb.update_item(
+            TableName=DDB_TABLE_NAME,
+            Key={"id": {"S": "dev"}},
+            UpdateExpression="REMOVE " + ", ".join(f"#b{i}" for i in range(len(stale))),
+            ExpressionAttributeNames={f"#b{i}": f"b{bucket}" for i, bucket in enumerate(stale)},
+        )
+
+
+def _activity_probability(record: dict, start: int, end: int) -> float | None:
+    """
+    Highest share of the last HISTORY_WEEKS weeks that saw any access in the
+    same weekly buckets as [start, end]. None until there is a week of history.
+    """
+    since = record["history_since"]
+    weeks = min(HISTORY_WEEKS, (start - since) // WEEK_SEC) if since else 0
+    if weeks < 1:
+        return None
+    per_week = WEEK_SEC // ACCESS_BUCKET_SEC
+    buckets = record["buckets"]
+    best = 0.0
+    for bucket in range(start // ACCESS_BUCKET_SEC, end // ACCESS_BUCKET_SEC + 1):
+        active = sum(1 for week in range(1, weeks + 1) if buckets.get(bucket - week * per_week))
+        best = max(best, active / weeks)
+    return best
+
+
+def _idle_timeout(record: dict, now: int) -> int:
+    """IDLE_TIMEOUT_SEC when use is expected within it, scaling down to MIN_IDLE_TIMEOUT_SEC when not."""
+    probability = _activity_probability(record, now, now + IDLE_TIMEOUT_SEC)
+    if probability is None:
+        return IDLE_TIMEOUT_SEC
+    share = min(1.0, probability / PREWAKE_THRESHOLD) if PREWAKE_THRESHOLD > 0 else 1.0
+    return int(MIN_IDLE_TIMEOUT_SEC + (IDLE_TIMEOUT_SEC - MIN_IDLE_TIMEOUT_SEC) * share)
+
+
+def _should_prewake(record: dict, now: int) -> bool:
+    if not PREWAKE_ENABLED:
+        return False
+    if record["prewake_at"] > record["last_access"] and now - record["prewake_at"] < PREWAKE_RETRY_SEC:
+        return False  # the last pre-wake went unused
+    if now - record["prewake_at"] < PREWAKE_LEAD_SEC:
+        return False
+    probability = _activity_probability(record, now, now + PREWAKE_LEAD_SEC)
+    return probability is not None and probability >= PREWAKE_THRESHOLD
 
 
-def _start_backend():
+def _start_backend(prewake: bool = False):
     state = _get_instance_state()
     if state in ("stopped", "stopping"):
-        _ec2.start_instances(InstanceIds=[EC2_INSTANCE_ID])
+        with _span("ec2", "StartInstances"):
+            _ec2.start_instances(InstanceIds=[EC2_INSTANCE_ID])
 
     # Start ECS service (task will place when instance is ready)
-    _ecs.update_service(cluster=ECS_CLUSTER_ARN, service=ECS_SERVICE_NAME, desiredCount=1)
-    _touch()
+    with _span("ecs", "UpdateService"):
+        _ecs.update_service(cluster=ECS_CLUSTER_ARN, service=ECS_SERVICE_NAME, desiredCount=1)
+    if prewake:
+        # Not an access: it must not feed the history it was predicted from
+        _set_record(prewake_at=_now())
+        _metric("Prewakes")
+    else:
+        # Someone is waiting from now until /status first reports healthy
+        _touch(wake_requested=state != "running", wake_started=state in ("stopped", "stopping"))
 
 
 def _stop_backend():
-    _ecs.update_service(cluster=ECS_CLUSTER_ARN, service=ECS_SERVICE_NAME, desiredCount=0)
+    with _span("ecs", "UpdateService"):
+        _ecs.update_service(cluster=ECS_CLUSTER_ARN, service=ECS_SERVICE_NAME, desiredCount=0)
 
     state = _get_instance_state()
     if state in ("running", "pending"):
-        _ec2.stop_instances(InstanceIds=[EC2_INSTANCE_ID])
-
-
-def _is_healthy() -> bool:
-    if not ELASTIC_IP:
+        with _span("ec2", "StopInstances"):
+            _ec2.stop_instances(InstanceIds=[EC2_INSTANCE_ID])
+
+    # A wake that never saw a healthy /status must not be charged to the next one
+    with _span("dynamodb", "UpdateItem"):
+        _ddb.update_item(
+            TableName=DDB_TABLE_NAME,
+            Key={"id": {"S": "dev"}},
+            UpdateExpression="REMOVE wake_requested_at",
+        )
+
+
+def _report_wake_wait():
+    """Emit WakeWaitSec once per wake: the first healthy /status clears wake_requested_at."""
+    with _span("dynamodb", "UpdateItem"):
+        try:
+            resp = _ddb.update_item(
+                TableName=DDB_TABLE_NAME,
+                Key={"id": {"S": "dev"}},
+                UpdateExpression="REMOVE wake_requested_at",
+                ConditionExpression="attribute_exists(wake_requested_at)",
+                ReturnValues="UPDATED_OLD",
+            )
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+                return
+            raise
+    requested = int(resp["Attributes"]["wake_requested_at"]["N"])
+    _metric("WakeWaitSec", max(0, _now() - requested))
+
+
+def _is_healthy(timeout: float = 3) -> bool:
+    if not BACKEND_HEALTH_URL:
         return False
     try:
-        req = urllib.request.Request(f"http://{ELASTIC_IP}:3000/", method="GET")
-        with urllib.request.urlopen(req, timeout=3) as resp:
+        req = urllib.request.Request(BACKEND_HEALTH_URL, method="GET")
+        with _span("upstream", "HealthCheck"), urllib.request.urlopen(req, timeout=timeout) as resp:
             return 200 <= resp.status < 400
     except Exception:
         return False
@@ -149,22 +415,158 @@ def _handle_touch():
     return _resp(200, {"ok": True})
 
 
-def _handle_status():
-    state = _get_instance_state()
-    service = _get_service()
+def _phase(state: str, service: dict, healthy: bool) -> str:
+    if healthy:
+        return "healthy"
+    if state == "running":
+        return "placed" if service.get("runningCount", 0) > 0 else "running"
+    return "pending" if state == "pending" else "stopped"
+
+
+def _probe_status(deadline: float) -> dict:
+    """
+    Instance, service and HTTP health probed concurrently. A probe that has not
+    answered by `deadline` counts as not ready. Health is only awaited when the
+    other two say a task is running. While the backend was last seen stopped or
+    pending, health is not checked up front: nothing would answer it.
+    """
+    global _last_phase
+    instance = _submit(_get_instance_state)
+    service = _submit(_get_service)
+    health = None
+    if _last_phase not in ("stopped", "pending"):
+        health = _submit(_is_healthy, max(0.1, min(3.0, deadline - _monotonic())), executor=_health_probes)
+
+    def result(future, default):
+        try:
+            return future.result(timeout=max(0.0, deadline - _monotonic()))
+        except FutureTimeout:
+            return default
+
+    state = result(instance, "unknown")
+    svc = result(service, {"desiredCount": 0, "runningCount": 0, "status": "UNKNOWN"})
     healthy = False
-    if state == "running" and service.get("runningCount", 0) > 0:
-        healthy = _is_healthy()
+    if state == "running" and svc.get("runningCount", 0) > 0:
+        if health is None:
+            health = _submit(_is_healthy, max(0.1, min(3.0, deadline - _monotonic())), executor=_health_probes)
+        healthy = result(health, False)
+    _last_phase = _phase(state, svc, healthy)
+    return {"instanceState": state, "service": svc, "healthy": healthy, "phase": _last_phase}
+
+
+def _advance(snapshot: dict, deadline: float) -> dict:
+    """Re-probe only what can move the current phase forward, in order."""
+    global _last_phase
+    snapshot = dict(snapshot)
+    if snapshot["phase"] in ("stopped", "pending"):
+        snapshot["instanceState"] = _get_instance_state()
+    if snapshot["instanceState"] == "running" and snapshot["phase"] != "placed":
+        snapshot["service"] = _get_service()
+    if snapshot["instanceState"] == "running" and snapshot["service"].get("runningCount", 0) > 0:
+        snapshot["healthy"] = _is_healthy(max(0.1, min(3.0, deadline - _monotonic())))
+    snapshot["phase"] = _last_phase = _phase(snapshot["instanceState"], snapshot["service"], snapshot["healthy"])
+    return snapshot
+
+
+def _status_body(snapshot: dict) -> dict:
+    return {
+        "instanceState": snapshot["instanceState"],
+        "service": snapshot["service"],
+        "elasticIp": ELASTIC_IP,
+        "healthy": snapshot["healthy"],
+        "phase": snapshot["phase"],
+    }
 
-    return _resp(
-        200,
-        {
-            "instanceState": state,
-            "service": service,
-            "elasticIp": ELASTIC_IP,
-            "healthy": healthy,
-        },
-    )
+
+def _handle_status():
+    snapshot = _probe_status(_monotonic() + STATUS_TIMEOUT_SEC)
+    if snapshot["healthy"]:
+        _report_wake_wait()
+    return _resp(200, _status_body(snapshot))
+
+
+def _handle_status_wait(event, context):
+    """
+    GET /status?waitFor=<phase>[&since=<phase>][&timeout=<sec>]: long-poll for wake progress.
+
+    Holds the request and probes with backoff, checking only what the current
+    phase needs. It returns as soon as the phase moves past `since` (the last
+    phase the client saw; the first call returns the current phase), when it
+    reaches `waitFor`, when nothing is waking the backend, or at the timeout.
+    Each phase observed carries when it was seen and how long into the request.
+    With `Accept: text/event-stream` the phases come as server-sent events, and
+    EventSource reconnects resume from Last-Event-ID.
+    """
+    query = event.get("queryStringParameters") or {}
+    headers = {k.lower(): v for k, v in (event.get("headers") or {}).items()}
+    target = query.get("waitFor", "healthy")
+    if target not in PHASES:
+        return _resp(400, {"error": f"waitFor must be one of {', '.join(PHASES)}"})
+    stream = "text/event-stream" in headers.get("accept", "")
+    since = query.get("since")
+    if stream and headers.get("last-event-id", "").isdigit():
+        since = PHASES[min(int(headers["last-event-id"]), len(PHASES) - 1)]
+    try:
+        timeout = min(float(query.get("timeout", STATUS_WAIT_MAX_SEC)), STATUS_WAIT_MAX_SEC)
+    except ValueError:
+        return _resp(400, {"error": "timeout must be a number of seconds"})
+    remaining_ms = getattr(context, "get_remaining_time_in_millis", None)
+    if callable(remaining_ms):
+        timeout = min(timeout, remaining_ms() / 1000 - 2)  # leave time to answer
+
+    start = _monotonic()
+    deadline = start + max(0.0, timeout)
+    phases = []
+
+    def observe(snapshot: dict):
+        if not phases or phases[-1]["phase"] != snapshot["phase"]:
+            phases.append({
+                "phase": snapshot["phase"],
+                "at": _now(),
+                "elapsedMs": round((_monotonic() - start) * 1000),
+            })
+
+    snapshot = _probe_status(min(deadline, start + STATUS_TIMEOUT_SEC))
+    observe(snapshot)
+    known = PHASES.index(since) if since in PHASES else -1
+    goal = PHASES.index(target)
+    delay, factor, max_delay = STATUS_WAIT_BACKOFF_SEC
+    probes = 1
+    while known >= PHASES.index(snapshot["phase"]) and PHASES.index(snapshot["phase"]) < goal:
+        if snapshot["phase"] == "stopped" and not snapshot["service"].get("desiredCount"):
+            break  # asleep and nobody asked for a wake
+        if _monotonic() + delay >= deadline:
+            break
+        _sleep(delay)
+        previous = snapshot["phase"]
+        snapshot = _advance(snapshot, deadline)
+        probes += 1
+        observe(snapshot)
+        delay = STATUS_WAIT_BACKOFF_SEC[0] if snapshot["phase"] != previous else min(delay * factor, max_delay)
+
+    if snapshot["healthy"]:
+        _report_wake_wait()
+    body = {
+        **_status_body(snapshot),
+        "waitFor": target,
+        "reached": PHASES.index(snapshot["phase"]) >= goal,
+        "phases": phases,
+        "probes": probes,
+        "waitedMs": round((_monotonic() - start) * 1000),
+    }
+    if not stream:
+        return _resp(200, body)
+
+    events = ["retry: 1000\n"]
+    for phase in phases:
+        if PHASES.index(phase["phase"]) > known:
+            events.append(f"id: {PHASES.index(phase['phase'])}\nevent: phase\ndata: {json.dumps(phase)}\n")
+    events.append(f"event: status\ndata: {json.dumps(body)}\n")
+    return {
+        "statusCode": 200,
+        "headers": {"content-type": "text/event-stream", "cache-control": "no-store"},
+        "body": "\n".join(events) + "\n",
+    }
 
 
 def _handle_magento_graphql(event):
@@ -176,10 +578,10 @@ def _handle_magento_graphql(event):
 
     _touch()
 
-    if not ELASTIC_IP:
+    if not BACKEND_GRAPHQL_URL:
         return _resp(500, {"error": "Missing ELASTIC_IP"})
 
-    upstream = f"http://{ELASTIC_IP}/graphql"
+    upstream = BACKEND_GRAPHQL_URL
     body = (event.get("body") or "").encode("utf-8")
 
     headers_in = event.get("headers") or {}
@@ -190,8 +592,11 @@ def _handle_magento_graphql(event):
 
     req = urllib.request.Request(upstream, data=body, method="POST", headers=headers_out)
     try:
-        with urllib.request.urlopen(req, timeout=15) as resp:
-            data = resp.read().decode("utf-8")
+        with _span("upstream", "GraphQL", RequestBytes=len(body)) as span, \
+                urllib.request.urlopen(req, timeout=15) as resp:
+            raw = resp.read()
+            span["ResponseBytes"] = len(raw)
+            data = raw.decode("utf-8")
             return {
                 "statusCode": resp.status,
                 "headers": {
@@ -211,24 +616,65 @@ def _handle_magento_graphql(event):
 
 def _handle_autosleep():
     state = _get_instance_state()
-    if state != "running":
+    if state not in ("running", "stopped"):
         return
 
-    last = _get_last_access()
-    now = int(time.time())
+    record = _get_access_record()
+    now = _now()
+    _prune_history(record, now)
+
+    if state == "stopped":
+        if _should_prewake(record, now):
+            _start_backend(prewake=True)
+        return
 
     # If we have no record yet, set one now and wait until next interval.
-    if last == 0:
-        _touch()
+    if record["last_access"] == 0 and record["prewake_at"] == 0:
+        _set_record(last_access=now)
         return
 
-    if now - last < IDLE_TIMEOUT_SEC:
+    last = max(record["last_access"], record["prewake_at"])
+    if now - last < _idle_timeout(record, now):
         return
 
     _stop_backend()
+    # Running with nobody using it, from the last access (or pre-wake) until this check
+    _metric("WastedInstanceSec", now - last)
+    if record["prewake_at"] > record["last_access"]:
+        _metric("PrewakeMisses")
 
 
 def lambda_handler(event, context):
+    global _cold_start
+    if not METRICS_ENABLED:
+        return _route(event, context)
+
+    cold_start, _cold_start = _cold_start, False
+    _metrics.dependencies = {}
+    _metrics.values = {}
+    _metrics.overhead = 0.0
+    start = time.perf_counter()
+    result = None
+    try:
+        result = _route(event, context)
+        return result
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        try:
+            _flush_metrics(
+                os.environ.get("AWS_LAMBDA_FUNCTION_NAME") or "dev-api",
+                getattr(context, "aws_request_id", "") or "",
+                cold_start,
+                duration_ms,
+                result,
+            )
+        except Exception as e:  # Metrics must never fail a request
+            print(f"Metrics flush error: {e}")
+        _metrics.dependencies = None
+        _metrics.values = None
+
+
+def _route(event, context=None):
     # EventBridge invokes with {"action": "autosleep"}
     if isinstance(event, dict) and event.get("action") == "autosleep":
         _handle_autosleep()
@@ -252,6 +698,8 @@ def lambda_handler(event, context):
     if method == "POST" and path == "/touch":
         return _handle_touch()
     if method == "GET" and path == "/status":
+        if (event.get("queryStringParameters") or {}).get("waitFor"):
+            return _handle_status_wait(event, context)
         return _handle_status()
     if method == "POST" and path == "/magento/graphql":
         return _handle_magento_graphql(event)
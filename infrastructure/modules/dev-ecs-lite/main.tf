@@ -327,7 +327,8 @@ resource "aws_iam_role_policy" "dev_lambda_policy" {
         Effect = "Allow"
         Action = [
           "dynamodb:GetItem",
-          "dynamodb:PutItem"
+          "dynamodb:PutItem",
+          "dynamodb:UpdateItem"
         ]
         Resource = aws_dynamodb_table.idle.arn
       }
@@ -357,15 +358,18 @@ resource "aws_lambda_function" "dev_api" {
 
   environment {
     variables = {
-      EC2_INSTANCE_ID     = aws_instance.ecs.id
-      ECS_CLUSTER_ARN     = aws_ecs_cluster.main.arn
-      ECS_SERVICE_NAME    = aws_ecs_service.backend.name
-      DDB_TABLE_NAME      = aws_dynamodb_table.idle.name
-      IDLE_TIMEOUT_SEC    = tostring(var.idle_timeout_seconds)
-      ELASTIC_IP          = aws_eip.backend.public_ip
-      WAKE_USER           = var.wake_username
-      WAKE_PASS           = var.wake_password
-      BACKEND_HEALTH_URL  = "http://${aws_eip.backend.public_ip}/"
+      EC2_INSTANCE_ID      = aws_instance.ecs.id
+      ECS_CLUSTER_ARN      = aws_ecs_cluster.main.arn
+      ECS_SERVICE_NAME     = aws_ecs_service.backend.name
+      DDB_TABLE_NAME       = aws_dynamodb_table.idle.name
+      IDLE_TIMEOUT_SEC     = tostring(var.idle_timeout_seconds)
+      MIN_IDLE_TIMEOUT_SEC = tostring(var.min_idle_timeout_seconds)
+      PREWAKE_ENABLED      = tostring(var.prewake_enabled)
+      PREWAKE_THRESHOLD    = tostring(var.prewake_threshold)
+      ELASTIC_IP           = aws_eip.backend.public_ip
+      WAKE_USER            = var.wake_username
+      WAKE_PASS            = var.wake_password
+      BACKEND_HEALTH_URL   = "http://${aws_eip.backend.public_ip}/"
     }
   }
 
@@ -33,6 +33,24 @@ variable "idle_timeout_seconds" {
   default     = 3600
 }
 
+variable "min_idle_timeout_seconds" {
+  type        = number
+  description = "Idle time before auto-sleep when the access history expects no use soon (seconds)"
+  default     = 900
+}
+
+variable "prewake_enabled" {
+  type        = bool
+  description = "Start the backend ahead of usage windows predicted from access history"
+  default     = true
+}
+
+variable "prewake_threshold" {
+  type        = number
+  description = "Share of past weeks with access in a time slot at which it counts as expected use"
+  default     = 0.5
+}
+
 variable "tags" {
   type        = map(string)
   description = "Tags to apply"
@@ -246,6 +246,12 @@ resource "aws_apigatewayv2_route" "skin_analysis" {
   target    = "integrations/${aws_apigatewayv2_integration.skin_analysis.id}"
 }
 
+resource "aws_apigatewayv2_route" "skin_analysis_batch" {
+  api_id    = aws_apigatewayv2_api.main.id
+  route_key = "POST /api/skin-analysis/batch"
+  target    = "integrations/${aws_apigatewayv2_integration.skin_analysis.id}"
+}
+
 resource "aws_lambda_permission" "skin_analysis" {
   statement_id  = "AllowAPIGateway"
   action        = "lambda:InvokeFunction"
@@ -90,6 +90,83 @@ resource "aws_cloudwatch_dashboard" "main" {
           period = 60
           stat   = "p95"
         }
+      },
+      # Embedded Metric Format output of lambdas/shared/instrumentation.py (and dev_api.py)
+      {
+        type   = "metric"
+        x      = 0
+        y      = 18
+        width  = 12
+        height = 6
+        properties = {
+          title  = "Lambda Dependency Latency (p95)"
+          region = data.aws_region.current.name
+          metrics = [
+            [{ expression = "SEARCH('{${var.metrics_namespace},Function,Dependency} MetricName=\"LatencyMs\"', 'p95', 300)", id = "latency" }]
+          ]
+          period = 300
+        }
+      },
+      {
+        type   = "metric"
+        x      = 12
+        y      = 18
+        width  = 12
+        height = 6
+        properties = {
+          title  = "Lambda Duration (p95) & Instrumentation Overhead (p99)"
+          region = data.aws_region.current.name
+          metrics = [
+            [{ expression = "SEARCH('{${var.metrics_namespace},Function} MetricName=\"DurationMs\"', 'p95', 300)", id = "duration" }],
+            [{ expression = "SEARCH('{${var.metrics_namespace},Function} MetricName=\"InstrumentationOverheadUs\"', 'p99', 300)", id = "overhead", yAxis = "right" }]
+          ]
+          period = 300
+        }
+      },
+      {
+        type   = "metric"
+        x      = 0
+        y      = 24
+        width  = 8
+        height = 6
+        properties = {
+          title  = "Bedrock Tokens"
+          region = data.aws_region.current.name
+          metrics = [
+            [{ expression = "SEARCH('{${var.metrics_namespace},Function,Dependency} Dependency=\"bedrock\" (MetricName=\"InputTokens\" OR MetricName=\"OutputTokens\")', 'Sum', 300)", id = "tokens" }]
+          ]
+          period = 300
+        }
+      },
+      {
+        type   = "metric"
+        x      = 8
+        y      = 24
+        width  = 8
+        height = 6
+        properties = {
+          title  = "Dependency Errors"
+          region = data.aws_region.current.name
+          metrics = [
+            [{ expression = "SEARCH('{${var.metrics_namespace},Function,Dependency} MetricName=\"Errors\"', 'Sum', 300)", id = "errors" }]
+          ]
+          period = 300
+        }
+      },
+      {
+        type   = "metric"
+        x      = 16
+        y      = 24
+        width  = 8
+        height = 6
+        properties = {
+          title  = "Cache Hits & Misses"
+          region = data.aws_region.current.name
+          metrics = [
+            [{ expression = "SEARCH('{${var.metrics_namespace},Function,Dependency} MetricName=\"CacheHits\" OR MetricName=\"CacheMisses\"', 'Sum', 300)", id = "cache" }]
+          ]
+          period = 300
+        }
       }
     ]
   })
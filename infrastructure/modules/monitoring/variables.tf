@@ -40,6 +40,12 @@ variable "alarm_sns_topic_arn" {
   default     = ""
 }
 
+variable "metrics_namespace" {
+  description = "CloudWatch namespace of the Lambda EMF metrics (METRICS_NAMESPACE)"
+  type        = string
+  default     = "Dermastore/Lambdas"
+}
+
 variable "tags" {
   description = "Tags to apply to resources"
   type        = map(string)
@@ -0,0 +1,175 @@
+"""
+API Gateway HTTP API (payload v2.0) events for every route the handlers serve.
+
+Each scenario names the handler it targets (the route names in
+`service.app.ROUTES`) and builds event number `n`; varying `n` varies the
+user, session, item and client IP the way real traffic does. Events go through
+`service.events.build_event`, so they match what service mode hands the
+handlers too. The dev API is deployed on a named stage (`dev`), so its raw
+paths carry the stage prefix.
+
+    python apigw_events.py                     # list scenarios
+    python apigw_events.py chat.message -n 3   # print events
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+from typing import Any, Callable, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from service.events import build_event  # noqa: E402
+
+DEV_STAGE = 'dev'
+WAKE_AUTH = 'Basic ' + base64.b64encode(
+    f"{os.environ.get('WAKE_USER', 'admin')}:{os.environ.get('WAKE_PASS', '1q2w3e4r')}".encode('utf-8')
+).decode('ascii')
+
+# Smallest payload the skin-analysis handler accepts as an image (a JPEG header)
+TINY_JPEG = base64.b64encode(b'\xff\xd8\xff\xe0' + b'\0' * 2048).decode('ascii')
+
+CHAT_MESSAGES = [
+    'Can I use retinol and vitamin C in the same routine?',
+    'What sunscreen would you recommend for oily, acne-prone skin?',
+    'My skin feels tight after cleansing, what should I change?',
+    'Is niacinamide safe during pregnancy?',
+]
+PROGRESS_LABELS = ['before', 'week 4', 'week 8']
+SKIN_TYPES = ['oily', 'dry', 'combination', 'normal']
+SKIN_CONCERNS = [['acne', 'oiliness'], ['hyperpigmentation'], ['dryness', 'sensitivity'], ['fine lines']]
+GRAPHQL_QUERY = '{ products(search: "sunscreen", pageSize: 3) { total_count items { sku name } } }'
+
+
+def _event(
+    route_key: str,
+    method: str,
+    path: str,
+    query: str = '',
+    body: Any = None,
+    headers: Optional[dict] = None,
+    n: int = 0,
+    stage: str = '$default'
+) -> dict:
+    headers = {'host': 'api.example.com', 'user-agent': 'bench/1.0', **(headers or {})}
+    data = b''
+    if body is not None:
+        data = body if isinstance(body, bytes) else json.dumps(body).encode('utf-8')
+        headers.setdefault('content-type', 'application/json')
+        headers['content-length'] = str(len(data))
+    raw_path = f'/{stage}{path}' if stage != '$default' else path
+    source_ip = f'10.{n // 65536 % 256}.{n // 256 % 256}.{n % 256}'
+    event = build_event(method, raw_path, query, headers, data, source_ip=source_ip, stage=stage)
+    event['routeKey'] = event['requestContext']['routeKey'] = route_key
+    return event
+
+
+def _preflight(path: str) -> Callable[[int], dict]:
+    return lambda n: _event(f'OPTIONS {path}', 'OPTIONS', path, headers={
+        'origin': 'https://shop.example.com',
+        'access-control-request-method': 'POST',
+        'access-control-request-headers': 'content-type'
+    }, n=n)
+
+
+class Scenario:
+    def __init__(self, name: str, target: str, build: Callable[[int], dict], description: str):
+        self.name = name
+        self.target = target
+        self.build = build
+        self.description = description
+
+    def event(self, n: int = 0) -> dict:
+        return self.build(n)
+
+
+SCENARIOS = [
+    Scenario('chat.options', 'chatbot', _preflight('/api/chat'), 'CORS preflight'),
+    Scenario('chat.message', 'chatbot', lambda n: _event(
+        'POST /api/chat', 'POST', '/api/chat',
+        body={'message': CHAT_MESSAGES[n % len(CHAT_MESSAGES)], 'sessionId': f'sess-{n % 200}'}, n=n
+    ), 'Chat turn with history for one of 200 sessions'),
+    Scenario('chat.empty', 'chatbot', lambda n: _event(
+        'POST /api/chat', 'POST', '/api/chat', body={'message': ''}, n=n
+    ), 'Validation error (400)'),
+    Scenario('skin.analyze', 'skin-analysis', lambda n: _event(
+        'POST /api/skin-analysis', 'POST', '/api/skin-analysis', body={'image': TINY_JPEG}, n=n
+    ), 'Face detection plus model analysis'),
+    Scenario('skin.missing-image', 'skin-analysis', lambda n: _event(
+        'POST /api/skin-analysis', 'POST', '/api/skin-analysis', body={}, n=n
+    ), 'Validation error (400)'),
+    Scenario('skin.batch', 'skin-analysis', lambda n: _event(
+        'POST /api/skin-analysis/batch', 'POST', '/api/skin-analysis/batch',
+        body={'images': [{'image': TINY_JPEG, 'label': label} for label in PROGRESS_LABELS]}, n=n
+    ), 'Progress batch: concurrent face detection, one comparing model call'),
+    Scenario('skin.batch-partial', 'skin-analysis', lambda n: _event(
+        'POST /api/skin-analysis/batch', 'POST', '/api/skin-analysis/batch',
+        body={'images': [TINY_JPEG, '', 'not base64!']}, n=n
+    ), 'Progress batch with invalid images, reported per image'),
+    Scenario('recs.options', 'recommendations', _preflight('/api/recommendations'), 'CORS preflight'),
+    Scenario('recs.personalized', 'recommendations', lambda n: _event(
+        'GET /api/recommendations', 'GET', '/api/recommendations', f'userId=user-{n % 500}&limit=10', n=n
+    ), 'Personalized recommendations for one of 500 users'),
+    Scenario('recs.personalized-filtered', 'recommendations', lambda n: _event(
+        'GET /api/recommendations', 'GET', '/api/recommendations',
+        f'userId=user-{n % 500}&limit=10&storeId=store-{n % 4}&maxPerBrand=2', n=n
+    ), 'Personalized recommendations with eligibility filters'),
+    Scenario('recs.similar', 'recommendations', lambda n: _event(
+        'GET /api/recommendations/similar', 'GET', '/api/recommendations/similar',
+        f'itemId=SKU-{n % 5000:06d}&limit=10', n=n
+    ), 'Similar items'),
+    Scenario('recs.skin-analysis', 'recommendations', lambda n: _event(
+        'POST /api/recommendations/skin-analysis', 'POST', '/api/recommendations/skin-analysis',
+        body={'skinType': SKIN_TYPES[n % 4], 'concerns': SKIN_CONCERNS[n % 4], 'limit': 10}, n=n
+    ), 'Recommendations for a skin analysis result'),
+    Scenario('dev.wake', 'dev-api', lambda n: _event(
+        'POST /wake', 'POST', '/wake', headers={'authorization': WAKE_AUTH}, n=n, stage=DEV_STAGE
+    ), 'Start instance and service'),
+    Scenario('dev.wake-unauthorized', 'dev-api', lambda n: _event(
+        'POST /wake', 'POST', '/wake', n=n, stage=DEV_STAGE
+    ), 'Wake without credentials (401)'),
+    Scenario('dev.touch', 'dev-api', lambda n: _event(
+        'POST /touch', 'POST', '/touch', n=n, stage=DEV_STAGE
+    ), 'Record activity'),
+    Scenario('dev.status', 'dev-api', lambda n: _event(
+        'GET /status', 'GET', '/status', n=n, stage=DEV_STAGE
+    ), 'Instance, service and health status'),
+    Scenario('dev.magento-graphql', 'dev-api', lambda n: _event(
+        'POST /magento/graphql', 'POST', '/magento/graphql',
+        body={'query': GRAPHQL_QUERY}, headers={'store': 'default'}, n=n, stage=DEV_STAGE
+    ), 'GraphQL proxied to the backend'),
+    Scenario('dev.autosleep', 'dev-api', lambda n: {'action': 'autosleep'}, 'Scheduled idle check (EventBridge)'),
+]
+
+SCENARIOS_BY_NAME = {scenario.name: scenario for scenario in SCENARIOS}
+
+
+def select(patterns: Optional[list[str]] = None) -> list[Scenario]:
+    """Scenarios whose name equals or starts with one of `patterns` (e.g. 'recs.' or 'dev')."""
+    if not patterns:
+        return list(SCENARIOS)
+    selected = [s for s in SCENARIOS if any(s.name == p or s.name.startswith(p.rstrip('.') + '.') for p in patterns)]
+    if not selected:
+        raise ValueError(f'No scenarios match {patterns}; choose from {sorted(SCENARIOS_BY_NAME)}')
+    return selected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('scenarios', nargs='*')
+    parser.add_argument('-n', type=int, default=1, help='Events per scenario')
+    args = parser.parse_args()
+
+    if not args.scenarios:
+        for scenario in SCENARIOS:
+            print(f'{scenario.name:28} {scenario.target:16} {scenario.description}')
+        return
+    for scenario in select(args.scenarios):
+        for n in range(args.n):
+            print(json.dumps(scenario.event(n)))
+
+
+if __name__ == '__main__':
+    main()
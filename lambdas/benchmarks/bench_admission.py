@@ -0,0 +1,157 @@
+"""
+Noisy-neighbor load test for chat admission control.
+
+Well-behaved clients (own session and IP, ~1 request/second each) share a
+Bedrock stub that throttles beyond `--bedrock-concurrency` in-flight calls with
+one script hammering the chat route from a single session. Three scenarios:
+
+- baseline:      well-behaved clients only
+- noisy:         noisy neighbor, admission control disabled
+- noisy+admit:   noisy neighbor, admission control enabled
+
+For the well-behaved clients the report shows latency, how many answers were
+the canned fallback (Bedrock throttled) and how many were rejected with 429.
+
+Usage:
+    python bench_admission.py --duration 5 --good-clients 6 --noisy-threads 24
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+LAMBDAS_DIR = os.path.join(BENCH_DIR, '..')
+sys.path[:0] = [BENCH_DIR, LAMBDAS_DIR, os.path.join(LAMBDAS_DIR, 'shared'), os.path.join(LAMBDAS_DIR, 'chatbot')]
+os.environ.setdefault('AWS_DEFAULT_REGION', 'af-south-1')
+# EMF lines would interleave with the report on stdout
+os.environ.setdefault('METRICS_ENABLED', 'false')
+
+import stubs  # noqa: E402
+
+FALLBACK_PREFIX = 'I apologize'
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Tally:
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.ok = 0
+        self.fallback = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def record(self, elapsed_ms: float, result: dict):
+        with self._lock:
+            self.latencies.append(elapsed_ms)
+            if result['statusCode'] == 429:
+                self.rejected += 1
+            elif json.loads(result['body']).get('response', '').startswith(FALLBACK_PREFIX):
+                self.fallback += 1
+            else:
+                self.ok += 1
+
+    def report(self) -> dict:
+        total = max(1, self.ok + self.fallback + self.rejected)
+        return {
+            'requests': self.ok + self.fallback + self.rejected,
+            'p50Ms': round(statistics.median(self.latencies), 2) if self.latencies else 0,
+            'p99Ms': round(percentile(self.latencies, 99), 2),
+            'answeredPct': round(100 * self.ok / total, 1),
+            'fallbackPct': round(100 * self.fallback / total, 1),
+            'rejectedPct': round(100 * self.rejected / total, 1)
+        }
+
+
+def run_scenario(handler, admission, build_event, args, noisy: bool, admit: bool) -> dict:
+    handler.limiter = admission.AdmissionController(
+        client_rate=args.client_rate,
+        client_burst=args.client_burst,
+        priority=admission.INTERACTIVE,
+        backend=admission.MemoryBackend(),
+        budget=admission.ConcurrencyBudget(args.bedrock_concurrency),
+        global_rate=args.global_rate,
+        global_burst=args.global_rate * 2,
+        enabled=admit
+    )
+    good, bad = Tally(), Tally()
+    deadline = time.monotonic() + args.duration
+
+    def call(tally: Tally, session: str, ip: str):
+        body = json.dumps({'message': 'Which sunscreen suits oily skin?', 'sessionId': session}).encode('utf-8')
+        event = build_event('POST', '/api/chat', '', {'content-type': 'application/json'}, body, source_ip=ip)
+        t0 = time.perf_counter()
+        result = handler.lambda_handler(event, None)
+        tally.record((time.perf_counter() - t0) * 1000, result)
+
+    def good_client(index: int):
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            call(good, f'good-{index}', f'10.0.0.{index + 1}')
+            time.sleep(max(0.0, 1.0 / args.good_rate - (time.monotonic() - started)))
+
+    def noisy_client():
+        while time.monotonic() < deadline:
+            call(bad, 'noisy', '203.0.113.9')
+            time.sleep(args.noisy_rtt_ms / 1000)  # network round trip; it never honours Retry-After
+
+    threads = [threading.Thread(target=good_client, args=(i,)) for i in range(args.good_clients)]
+    if noisy:
+        threads += [threading.Thread(target=noisy_client) for _ in range(args.noisy_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    report = {'wellBehaved': good.report()}
+    if noisy:
+        report['noisy'] = bad.report()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--good-clients', type=int, default=6)
+    parser.add_argument('--good-rate', type=float, default=1.0, help='Requests/second per well-behaved client')
+    parser.add_argument('--noisy-threads', type=int, default=24)
+    parser.add_argument('--noisy-rtt-ms', type=float, default=5.0)
+    parser.add_argument('--bedrock-latency-ms', type=float, default=80.0)
+    parser.add_argument('--bedrock-concurrency', type=int, default=8)
+    parser.add_argument('--client-rate', type=float, default=2.0)
+    parser.add_argument('--client-burst', type=float, default=4.0)
+    parser.add_argument('--global-rate', type=float, default=60.0)
+    args = parser.parse_args()
+
+    registry = stubs.StubRegistry({'dynamodb': stubs.Latency(5, 1, seed=2)})
+    registry.clients['bedrock-runtime'] = stubs.StubBedrockRuntime(
+        stubs.Latency(args.bedrock_latency_ms, args.bedrock_latency_ms / 5, seed=1),
+        text='Use a lightweight, oil-free SPF 50 gel.',
+        max_concurrency=args.bedrock_concurrency
+    )
+    stubs.install(registry)
+
+    import admission
+    import handler
+    from service.events import build_event
+
+    print(json.dumps({
+        'config': vars(args),
+        'baseline': run_scenario(handler, admission, build_event, args, noisy=False, admit=False),
+        'noisy': run_scenario(handler, admission, build_event, args, noisy=True, admit=False),
+        'noisy+admit': run_scenario(handler, admission, build_event, args, noisy=True, admit=True)
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Storage benchmark for conversation history: legacy list-of-maps vs. binary codec.
+
+For realistic session lengths it reports DynamoDB item size, read/write
+capacity units and the time to (de)serialize the item the way boto3's resource
+layer does (DynamoDB JSON on the wire, TypeSerializer/TypeDeserializer), plus
+the codec on top.
+
+Usage:
+    python bench_conversation_codec.py --turns 1 5 10 25 50
+"""
+
+import argparse
+import base64
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'chatbot'))
+
+from boto3.dynamodb.types import Binary, TypeDeserializer, TypeSerializer  # noqa: E402
+
+import conversation_codec  # noqa: E402
+
+QUESTIONS = [
+    'Can I use retinol and vitamin C in the same routine?',
+    'What sunscreen would you recommend for oily, acne-prone skin?',
+    'My skin feels tight after cleansing, what should I change?',
+    'Is niacinamide safe during pregnancy?',
+]
+ANSWER_SENTENCES = [
+    'Great question! For {topic}, start slowly and introduce one active at a time.',
+    'Patch test any new product on your inner arm for 48 hours first.',
+    'In the morning use a gentle cleanser, a vitamin C serum and a broad-spectrum SPF 50.',
+    'Heliocare 360 Gel Oil-Free (R 545) works well under make-up and does not feel greasy.',
+    'In the evening cleanse, then apply your retinoid two or three nights a week.',
+    'Follow with a barrier-supporting moisturiser like Lamelle Ceramide Moisturiser.',
+    'Niacinamide at 5% helps with oil control and redness and pairs well with most actives.',
+    'Avoid physical scrubs while your skin barrier is compromised.',
+    'Environ AVST Moisturiser 1 is a gentle way to start vitamin A.',
+    'If irritation persists for more than a week, please see a dermatologist.',
+]
+
+
+def make_session(turns: int, rng: random.Random) -> list[dict]:
+    now = datetime(2024, 6, 1, 9, 30)
+    messages = []
+    for _ in range(turns):
+        now += timedelta(seconds=rng.randint(20, 240), microseconds=rng.randint(0, 999_999))
+        question = rng.choice(QUESTIONS)
+        answer = ' '.join(rng.sample(ANSWER_SENTENCES, rng.randint(3, 6))).format(topic=question.lower()[:40])
+        messages.append({'role': 'user', 'content': question, 'timestamp': now.isoformat()})
+        messages.append({'role': 'assistant', 'content': answer, 'timestamp': now.isoformat()})
+    return messages
+
+
+def attribute_size(value: dict) -> int:
+    """DynamoDB item size rules for a serialized attribute value."""
+    (kind, inner), = value.items()
+    if kind == 'S':
+        return len(inner.encode('utf-8'))
+    if kind == 'N':
+        return len(inner.lstrip('-').replace('.', '')) // 2 + 2
+    if kind == 'B':
+        return len(inner)
+    if kind == 'BOOL' or kind == 'NULL':
+        return 1
+    if kind == 'L':
+        return 3 + sum(1 + attribute_size(v) for v in inner)
+    if kind == 'M':
+        return 3 + sum(1 + len(k.encode('utf-8')) + attribute_size(v) for k, v in inner.items())
+    raise ValueError(kind)
+
+
+def item_size(item: dict) -> int:
+    return sum(len(name.encode('utf-8')) + attribute_size(value) for name, value in item.items())
+
+
+def time_us(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1e6 / repeat
+
+
+def measure(messages: list[dict], codec: str, repeat: int) -> dict:
+    serializer, deserializer = TypeSerializer(), TypeDeserializer()
+    base = {'session_id': 'sess-1234', 'updated_at': datetime(2024, 6, 1).isoformat(), 'ttl': 1718000000}
+    conversation_codec.CONVERSATION_CODEC = codec
+
+    def to_wire(value):
+        if isinstance(value, (bytes, bytearray)):
+            return base64.b64encode(value).decode('ascii')
+        if isinstance(value, Binary):
+            return base64.b64encode(value.value).decode('ascii')
+        raise TypeError(type(value))
+
+    # Both directions include the DynamoDB JSON (de)serialization botocore does on the wire
+    def write() -> str:
+        item = {**base, **conversation_codec.encode_item(messages)}
+        return json.dumps({k: serializer.serialize(v) for k, v in item.items()}, default=to_wire)
+
+    wire_json = write()
+
+    def read():
+        wire = json.loads(wire_json)
+        for value in wire.values():
+            if 'B' in value:
+                value['B'] = base64.b64decode(value['B'])
+        return conversation_codec.decode_item({k: deserializer.deserialize(v) for k, v in wire.items()})
+
+    assert read() == messages
+    wire = json.loads(wire_json)
+    size = item_size({k: ({'B': base64.b64decode(v['B'])} if 'B' in v else v) for k, v in wire.items()})
+    return {
+        'itemBytes': size,
+        'rcuStrong': math.ceil(size / 4096),
+        'wcu': math.ceil(size / 1024),
+        'writeUs': round(time_us(write, repeat), 1),
+        'readUs': round(time_us(read, repeat), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turns', type=int, nargs='+', default=[1, 5, 10, 25, 50])
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--compression', default='zlib', choices=['zlib', 'zstd', 'none'])
+    args = parser.parse_args()
+
+    conversation_codec.COMPRESSION = args.compression
+    rng = random.Random(5)
+    report = {'compression': args.compression, 'sessions': []}
+    for turns in args.turns:
+        messages = make_session(turns, rng)
+        legacy = measure(messages, 'json', args.repeat)
+        binary = measure(messages, 'binary', args.repeat)
+        report['sessions'].append({
+            'turns': turns,
+            'messages': len(messages),
+            'legacy': legacy,
+            'binary': binary,
+            'sizeRatio': round(binary['itemBytes'] / legacy['itemBytes'], 3)
+        })
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
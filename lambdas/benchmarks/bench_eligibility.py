@@ -0,0 +1,132 @@
+"""
+Filtering cost and wasted-result benchmark for recommendation eligibility.
+
+Builds a synthetic 50k-item catalog (some items out of stock, discontinued or
+store-restricted), then compares:
+- baseline: top-N straight from Personalize, frontend drops ineligible items
+- filtered: over-fetch, filter locally, trim to N
+
+It also times the cold start: replaying one feed record per item against
+loading the compacted snapshot of the same state.
+
+Usage:
+    python bench_eligibility.py --items 50000 --requests 20000
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'recommendations'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+
+import eligibility  # noqa: E402
+
+STORES = ['CPT', 'JHB', 'DBN', 'PTA']
+CATEGORIES = ['cleanser', 'serum', 'moisturiser', 'sunscreen', 'toner', 'mask']
+BRANDS = ['Environ', 'Lamelle', 'Heliocare', 'SkinCeuticals', 'Dermalogica', 'La Roche-Posay']
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def build_index(items: int, rng: random.Random, out_of_stock: float, discontinued: float, restricted: float):
+    index = eligibility.EligibilityIndex()
+    start = time.perf_counter()
+    for i in range(items):
+        change = {
+            'seq': i + 1,
+            'itemId': f'SKU-{i:06d}',
+            'inStock': rng.random() >= out_of_stock,
+            'discontinued': rng.random() < discontinued,
+            'category': rng.choice(CATEGORIES),
+            'brand': rng.choice(BRANDS)
+        }
+        if rng.random() < restricted:
+            change['stores'] = rng.sample(STORES, 1)
+        index.apply_change(change)
+    return index, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=50_000)
+    parser.add_argument('--requests', type=int, default=20_000)
+    parser.add_argument('--num-results', type=int, default=10)
+    parser.add_argument('--out-of-stock', type=float, default=0.15)
+    parser.add_argument('--discontinued', type=float, default=0.05)
+    parser.add_argument('--restricted', type=float, default=0.10)
+    parser.add_argument('--max-per-brand', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    index, load_sec = build_index(args.items, rng, args.out_of_stock, args.discontinued, args.restricted)
+    catalog = list(index.ordinals)
+    fetch = eligibility.fetch_size(args.num_results)
+
+    start = time.perf_counter()
+    for store in STORES:
+        index.eligible_mask(store, None)
+    mask_ms = (time.perf_counter() - start) * 1000 / len(STORES)
+
+    filter_us = []
+    baseline_wasted = 0
+    short = 0
+    for _ in range(args.requests):
+        store = rng.choice(STORES)
+        fetched = [{'itemId': item, 'score': 1.0} for item in rng.sample(catalog, fetch)]
+
+        # Baseline: frontend receives the unfiltered top-N and drops what it cannot show
+        shown = index.filter(fetched[:args.num_results], args.num_results, store_id=store)
+        baseline_wasted += args.num_results - len(shown)
+
+        t0 = time.perf_counter_ns()
+        result = index.filter(fetched, args.num_results, store_id=store, max_per_brand=args.max_per_brand)
+        filter_us.append((time.perf_counter_ns() - t0) / 1000)
+        short += args.num_results - len(result)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        saved = index.save(os.path.join(tmp, 'eligibility.snapshot.gz'))
+        start = time.perf_counter()
+        loaded = eligibility.EligibilityIndex.from_snapshot(eligibility.read_snapshot(saved['path']))
+        snapshot_sec = time.perf_counter() - start
+    assert all(loaded.eligible_mask(store) == index.eligible_mask(store) for store in STORES)
+
+    incremental = [{'seq': args.items + i + 1, 'itemId': rng.choice(catalog), 'inStock': False} for i in range(1000)]
+    t0 = time.perf_counter()
+    index.apply_changes(incremental)
+    change_us = (time.perf_counter() - t0) * 1e6 / len(incremental)
+
+    total = args.requests * args.num_results
+    print(json.dumps({
+        'items': args.items,
+        'eligibleItems': {
+            store: int.from_bytes(index.eligible_mask(store), 'little').bit_count() for store in STORES
+        },
+        'initialLoadSeconds': round(load_sec, 3),
+        'snapshotLoadSeconds': round(snapshot_sec, 3),
+        'snapshotBytes': saved['bytes'],
+        'incrementalChangeUs': round(change_us, 2),
+        'maskBuildMs': round(mask_ms, 3),
+        'fetchSize': fetch,
+        'filterUs': {
+            'p50': round(statistics.median(filter_us), 2),
+            'p95': round(percentile(filter_us, 95), 2),
+            'p99': round(percentile(filter_us, 99), 2)
+        },
+        'wastedResults': {
+            'baselinePct': round(100 * baseline_wasted / total, 2),
+            'filteredShortfallPct': round(100 * short / total, 2)
+        }
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Overhead of the EMF instrumentation per request, against its budget.
+
+Runs real handlers against zero-latency stubs (so instrumentation is as large a
+share of the request as it can get) alternating METRICS_ENABLED on and off,
+and reports per scenario:
+
+- the median handler time with and without metrics and their difference;
+- the overhead each invocation reports about itself (InstrumentationOverheadUs);
+- EMF bytes written per request.
+
+Exits 1 if either overhead figure exceeds `instrumentation.OVERHEAD_BUDGET_US`.
+
+Usage:
+    python bench_instrumentation.py --requests 2000
+"""
+
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [BENCH_DIR, os.path.join(BENCH_DIR, '..', 'shared')]
+
+import runner  # noqa: E402
+
+SCENARIOS = ['chat.message', 'skin.analyze', 'recs.personalized', 'recs.similar', 'dev.status', 'dev.magento-graphql']
+
+
+class Capture(io.TextIOBase):
+    """Collects what handlers write to stdout (EMF lines, error prints)."""
+
+    def __init__(self):
+        self.chunks: list[str] = []
+
+    def write(self, text: str) -> int:
+        self.chunks.append(text)
+        return len(text)
+
+    def drain(self) -> str:
+        text = ''.join(self.chunks)
+        self.chunks.clear()
+        return text
+
+
+def set_enabled(env: 'runner.Environment', enabled: bool):
+    import instrumentation
+
+    instrumentation.METRICS_ENABLED = enabled
+    for module in env.modules.values():
+        if hasattr(module, 'METRICS_ENABLED'):  # dev_api carries its own copy
+            module.METRICS_ENABLED = enabled
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=1000, help='Invocations per scenario and mode')
+    parser.add_argument('--scenarios', nargs='*', default=SCENARIOS)
+    args = parser.parse_args()
+
+    import apigw_events
+    import instrumentation
+
+    config = {
+        'latency': {service: '0' for service in runner.DEFAULT_LATENCY},
+        'latencyScale': 1.0,
+        'throttleRate': 0.0,
+        'errorRate': 0.0,
+        'faults': {},
+        'ec2State': 'running',
+        'seed': 1
+    }
+    env = runner.Environment(config)
+    capture = Capture()
+    stdout, sys.stdout = sys.stdout, capture
+    report = {'budgetUs': instrumentation.OVERHEAD_BUDGET_US, 'scenarios': {}}
+    try:
+        for scenario in apigw_events.select(args.scenarios):
+            handler = env.handler(scenario.target)
+            events = [scenario.event(n) for n in range(args.requests)]
+            timings = {True: [], False: []}
+            reported, emf_bytes = [], []
+            for n, event in enumerate(events * 2):
+                enabled = n % 2 == 0  # interleave so drift affects both modes equally
+                set_enabled(env, enabled)
+                start = time.perf_counter()
+                handler(event, None)
+                timings[enabled].append((time.perf_counter() - start) * 1e6)
+                output = capture.drain()
+                if enabled:
+                    documents = [json.loads(line) for line in output.splitlines() if line.startswith('{"_aws"')]
+                    reported.extend(d['InstrumentationOverheadUs'] for d in documents if 'DurationMs' in d)
+                    emf_bytes.append(sum(len(line) + 1 for line in output.splitlines() if line.startswith('{"_aws"')))
+            on, off = statistics.median(timings[True]), statistics.median(timings[False])
+            report['scenarios'][scenario.name] = {
+                'medianOnUs': round(on, 1),
+                'medianOffUs': round(off, 1),
+                'overheadUs': round(on - off, 1),
+                'reportedOverheadP50Us': round(statistics.median(reported), 1) if reported else None,
+                'reportedOverheadP99Us': round(runner.percentile(reported, 99), 1) if reported else None,
+                'emfBytesPerRequest': round(statistics.fmean(emf_bytes)) if emf_bytes else 0
+            }
+    finally:
+        sys.stdout = stdout
+        set_enabled(env, True)
+        env.close()
+
+    over = [
+        name for name, result in report['scenarios'].items()
+        if max(result['overheadUs'], result['reportedOverheadP50Us'] or 0) > report['budgetUs']
+    ]
+    report['withinBudget'] = not over
+    print(json.dumps(report, indent=2))
+    if over:
+        print(f'Over the {report["budgetUs"]} us budget: {", ".join(over)}', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Lookup latency benchmark for the precomputed recommendation store.
+
+Generates synthetic Personalize batch inference output, compiles it and times
+hits and misses against the memory-mapped file. No AWS access required.
+
+It then checks through the recommendations handler (stubbed AWS, eligibility
+index populated so requests over-fetch) that default-limit requests for
+precomputed users make no Personalize calls; exit code 1 if any do.
+
+Usage:
+    python bench_offline_store.py --users 200000 --items 5000 --top-n 25
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'recommendations'))
+
+import offline_store  # noqa: E402
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def write_batch_output(path: str, users: int, items: int, top_n: int, seed: int = 7):
+    rng = random.Random(seed)
+    catalog = [f'SKU-{i:06d}' for i in range(items)]
+    with open(path, 'w', encoding='utf-8') as f:
+        for user in range(users):
+            picks = rng.sample(catalog, top_n)
+            scores = sorted((rng.random() for _ in picks), reverse=True)
+            f.write(json.dumps({
+                'input': {'userId': f'user-{user}'},
+                'output': {'recommendedItems': picks, 'scores': scores},
+                'error': None
+            }) + '\n')
+
+
+def time_lookups(store: offline_store.OfflineStore, keys: list[str], num_results: int) -> list[float]:
+    samples = []
+    for key in keys:
+        start = time.perf_counter_ns()
+        store.lookup_user(key, num_results)
+        samples.append((time.perf_counter_ns() - start) / 1000)
+    return samples
+
+
+def check_handler(path: str, requests: int = 50) -> dict:
+    """Default-limit requests for users in the store, through the handler; Personalize calls must be 0."""
+    import apigw_events
+    import runner
+
+    config = {
+        'latency': runner.DEFAULT_LATENCY, 'latencyScale': 0.0, 'throttleRate': 0.0, 'errorRate': 0.0,
+        'faults': {}, 'ec2State': 'running', 'seed': 1
+    }
+    os.environ['METRICS_ENABLED'] = 'false'
+    env = runner.Environment(config)
+    try:
+        handler = env.handler('recommendations')
+        offline_store.OFFLINE_STORE_PATH = path
+        offline_store.reset_store()
+        # A non-empty index makes the handler over-fetch, past the store's top-n
+        import eligibility
+        eligibility.get_index().apply_changes([{'seq': 1, 'itemId': 'SKU-000000', 'inStock': True}])
+
+        personalize = env.registry.clients['personalize-runtime']
+        calls = personalize.calls
+        served = 0
+        for n in range(requests):
+            response = handler(apigw_events.SCENARIOS_BY_NAME['recs.personalized'].event(n), None)
+            served += json.loads(response['body'])['count']
+        return {'requests': requests, 'results': served, 'personalizeCalls': personalize.calls - calls}
+    finally:
+        offline_store.reset_store()
+        env.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--items', type=int, default=5_000)
+    parser.add_argument('--top-n', type=int, default=25)
+    parser.add_argument('--lookups', type=int, default=50_000)
+    parser.add_argument('--num-results', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'batch.jsonl')
+        out = os.path.join(tmp, 'recommendations.dsrs')
+        write_batch_output(source, args.users, args.items, args.top_n)
+
+        start = time.perf_counter()
+        summary = offline_store.compile_batch_output([source], out, top_n=args.top_n, label='bench')
+        compile_sec = time.perf_counter() - start
+
+        start = time.perf_counter()
+        store = offline_store.OfflineStore(out)
+        open_ms = (time.perf_counter() - start) * 1000
+
+        rng = random.Random(11)
+        hits = [f'user-{rng.randrange(args.users)}' for _ in range(args.lookups)]
+        misses = [f'cold-{i}' for i in range(args.lookups)]
+        hit_us = time_lookups(store, hits, args.num_results)
+        miss_us = time_lookups(store, misses, args.num_results)
+        store.close()
+        handler_check = check_handler(out) if args.users >= 500 else None
+
+    report = {
+        'store': summary,
+        'compileSeconds': round(compile_sec, 3),
+        'openMs': round(open_ms, 3),
+        'bytesPerUser': round(summary['bytes'] / max(summary['keys'], 1), 1)
+    }
+    for name, samples in (('hit', hit_us), ('miss', miss_us)):
+        report[f'{name}Us'] = {
+            'p50': round(statistics.median(samples), 2),
+            'p95': round(percentile(samples, 95), 2),
+            'p99': round(percentile(samples, 99), 2),
+            'mean': round(statistics.fmean(samples), 2)
+        }
+    if handler_check:
+        report['handler'] = handler_check
+    print(json.dumps(report, indent=2))
+    if handler_check and handler_check['personalizeCalls']:
+        print('Precomputed users fell back to Personalize', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
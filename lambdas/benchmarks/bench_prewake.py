@@ -0,0 +1,292 @@
+"""
+Replays developer access traces against the dev API on a simulated clock and
+compares the fixed idle timeout with predictive pre-wake + adaptive timeouts.
+
+The real `dev_api.py` runs against the stateful EC2/ECS/DynamoDB stubs. Boot and
+task placement take simulated time, and the scheduled `autosleep` invocation
+runs every 15 minutes. Each simulated developer arrives, checks `/status`, and
+if needed `POST /wake`s and polls until healthy. They then send GraphQL
+requests until they leave, and re-wake when they get a 503. Reported per
+policy, after the warm-up weeks the predictor learns from:
+
+- arrivals (a 503 mid-session counts as arriving again), how many had to
+  wait, and wake-wait p50/p95/mean/total;
+- instance-hours, of which useful (someone present) and wasted;
+- pre-wakes and unused pre-wakes.
+
+Traces are synthetic office hours (lunch breaks, days off, occasional evening
+and weekend sessions), or a JSON list of [start, end] epoch-second pairs via
+--trace.
+
+Usage:
+    python bench_prewake.py --weeks 8 --devs 3
+    python bench_prewake.py --threshold 0.75 --min-idle-timeout 600
+    python bench_prewake.py --trace sessions.json --warmup-weeks 4
+"""
+
+import argparse
+import heapq
+import json
+import os
+import random
+import statistics
+import sys
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+import runner  # noqa: E402
+
+DAY = 24 * 3600
+WEEK = 7 * DAY
+AUTOSLEEP_SEC = 15 * 60  # EventBridge rate(15 minutes)
+# A Monday, so weekday arithmetic on the trace is simple
+EPOCH = int(datetime(2026, 1, 5, tzinfo=timezone.utc).timestamp())
+
+
+def synthetic_trace(weeks: int, devs: int, seed: int, utc_offset_h: float = 2.0) -> list[tuple[int, int]]:
+    """Office-hours sessions in local time: (start, end) epoch seconds, one list for all developers."""
+    rng = random.Random(seed)
+    local = int(utc_offset_h * 3600)
+    sessions = []
+    for dev in range(devs):
+        usual_start = rng.gauss(8 * 3600, 30 * 60)  # some developers start earlier than others
+        for day in range(weeks * 7):
+            midnight = EPOCH + day * DAY - local
+            if day % 7 >= 5:
+                if rng.random() < 0.05:
+                    start = midnight + rng.randint(9, 17) * 3600
+                    sessions.append((start, start + rng.randint(45, 150) * 60))
+                continue
+            if rng.random() < 0.1:  # day off
+                continue
+            arrive = midnight + int(rng.gauss(usual_start, 15 * 60))
+            lunch = midnight + int(rng.gauss(12.5 * 3600, 15 * 60))
+            back = lunch + rng.randint(30, 60) * 60
+            leave = midnight + int(rng.gauss(17 * 3600, 30 * 60))
+            sessions += [(arrive, lunch), (back, leave)]
+            if rng.random() < 0.05:
+                evening = midnight + int(rng.gauss(20 * 3600, 45 * 60))
+                sessions.append((evening, evening + rng.randint(30, 90) * 60))
+    return sorted(sessions)
+
+
+class SimClock:
+    def __init__(self, t: float):
+        self.t = t
+
+    def now(self) -> float:
+        return self.t
+
+
+def _event(method: str, path: str, body: dict = None) -> dict:
+    import apigw_events
+
+    headers = {'authorization': apigw_events.WAKE_AUTH, 'store': 'default'} if method == 'POST' else {}
+    return apigw_events._event(f'{method} {path}', method, path, body=body, headers=headers, stage='dev')
+
+
+def simulate(sessions: list[tuple[int, int]], end: int, measure_from: int, policy: dict, args) -> dict:
+    """Runs one policy over the trace; only activity from `measure_from` on is reported."""
+    import stubs
+    from service.app import ROUTES, load_module
+
+    clock = SimClock(EPOCH)
+    registry = stubs.install(stubs.StubRegistry(clock=clock.now, ec2_state='stopped'))
+    ec2, ecs = registry.clients['ec2'], registry.clients['ecs']
+    ec2.boot_sec, ecs.placement_sec = args.boot_sec, args.placement_sec
+
+    route = next(route for route in ROUTES if route.name == 'dev-api')
+    dev_api = load_module(route.name, route.module_path)
+    for name, value in policy.items():
+        setattr(dev_api, name, value)
+    dev_api._now = lambda: int(clock.t)
+    emitted: dict[str, float] = {}
+
+    def record_metric(name: str, value: float = 1):
+        if clock.t >= measure_from:
+            emitted[name] = emitted.get(name, 0) + value
+
+    dev_api._metric = record_metric
+
+    transitions = [(EPOCH, 'stopped')]
+    transition = ec2._transition
+
+    def recording_transition(target: str):
+        previous, current = transition(target)
+        if transitions[-1][1] != target:
+            transitions.append((clock.t, target))
+        return previous, current
+
+    ec2._transition = recording_transition
+
+    status_event, wake_event = _event('GET', '/status'), _event('POST', '/wake')
+    graphql_event = _event('POST', '/magento/graphql', {'query': '{ storeConfig { code } }'})
+
+    def call(event) -> dict:
+        return dev_api.lambda_handler(event, None) or {}
+
+    def healthy() -> bool:
+        return json.loads(call(status_event)['body'])['healthy']
+
+    # (time, seq, kind, session index, wait started)
+    queue = [(t, n, 'autosleep', -1, 0.0) for n, t in enumerate(range(EPOCH, end, AUTOSLEEP_SEC))]
+    queue += [(start, len(queue) + n, 'arrive', n, 0.0) for n, (start, _) in enumerate(sessions)]
+    heapq.heapify(queue)
+    seq = len(queue)
+    waits: list[float] = []
+
+    while queue:
+        t, _, kind, index, wait_start = heapq.heappop(queue)
+        clock.t = t
+        follow_up = None
+        if kind == 'autosleep':
+            call({'action': 'autosleep'})
+        elif kind in ('arrive', 'retry'):
+            if healthy():
+                if kind == 'arrive' and t >= measure_from:
+                    waits.append(0.0)
+                follow_up = (t + args.request_interval, 'request', t)
+            else:
+                call(wake_event)
+                follow_up = (t + args.poll_sec, 'poll', t)
+        elif kind == 'poll':
+            if healthy():
+                if wait_start >= measure_from:
+                    waits.append(t - wait_start)
+                follow_up = (t + args.request_interval, 'request', t)
+            else:
+                follow_up = (t + args.poll_sec, 'poll', wait_start)
+        elif kind == 'request' and t < sessions[index][1]:
+            if call(graphql_event).get('statusCode') == 503:  # stopped under them: wake again
+                follow_up = (t, 'retry', t)
+            else:
+                follow_up = (t + args.request_interval, 'request', t)
+        if follow_up and (follow_up[1] != 'request' or follow_up[0] < sessions[index][1]):
+            seq += 1
+            heapq.heappush(queue, (follow_up[0], seq, follow_up[1], index, follow_up[2]))
+
+    running = _intervals([(t, target == 'running') for t, target in transitions], end)
+    present = _union(sessions)
+    window = [(measure_from, end)]
+    running_sec = _length(_intersect(running, window))
+    useful_sec = _length(_intersect(_intersect(running, present), window))
+    waited = [w for w in waits if w > 0]
+    return {
+        'arrivals': len(waits),
+        'arrivalsWaiting': len(waited),
+        'wakeWaitP50Sec': round(runner.percentile(waits, 50), 1),
+        'wakeWaitP95Sec': round(runner.percentile(waits, 95), 1),
+        'wakeWaitMeanSec': round(statistics.fmean(waits), 1) if waits else 0.0,
+        'wakeWaitTotalHours': round(sum(waits) / 3600, 2),
+        'instanceHours': round(running_sec / 3600, 1),
+        'usefulInstanceHours': round(useful_sec / 3600, 1),
+        'wastedInstanceHours': round((running_sec - useful_sec) / 3600, 1),
+        'starts': ec2.starts,
+        'prewakes': int(emitted.get('Prewakes', 0)),
+        'prewakeMisses': int(emitted.get('PrewakeMisses', 0)),
+        'reportedWakeWaitSec': emitted.get('WakeWaitSec', 0),
+        'reportedWastedInstanceSec': emitted.get('WastedInstanceSec', 0)
+    }
+
+
+def _intervals(states: list[tuple[float, bool]], end: float) -> list[tuple[float, float]]:
+    """[(time, on)] state changes -> [(start, end)] on-intervals."""
+    intervals = []
+    for (t, on), (t_next, _) in zip(states, states[1:] + [(end, False)]):
+        if on and t_next > t:
+            intervals.append((t, t_next))
+    return intervals
+
+
+def _union(intervals: list[tuple[float, float]]) -> list[tuple[float, float]]:
+    merged: list[list[float]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def _intersect(a: list[tuple[float, float]], b: list[tuple[float, float]]) -> list[tuple[float, float]]:
+    result, i, j = [], 0, 0
+    while i < len(a) and j < len(b):
+        start, end = max(a[i][0], b[j][0]), min(a[i][1], b[j][1])
+        if start < end:
+            result.append((start, end))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def _length(intervals: list[tuple[float, float]]) -> float:
+    return sum(end - start for start, end in intervals)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--weeks', type=int, default=8)
+    parser.add_argument('--warmup-weeks', type=int, default=4, help='Weeks of history before measuring')
+    parser.add_argument('--devs', type=int, default=3)
+    parser.add_argument('--trace', help='JSON list of [start, end] epoch seconds instead of the synthetic trace')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--boot-sec', type=float, default=90.0)
+    parser.add_argument('--placement-sec', type=float, default=150.0, help='Task placement + Magento start')
+    parser.add_argument('--poll-sec', type=float, default=15.0, help='How often a waiting developer polls /status')
+    parser.add_argument('--request-interval', type=float, default=600.0, help='Seconds between GraphQL requests')
+    parser.add_argument('--idle-timeout', type=int, default=3600)
+    parser.add_argument('--min-idle-timeout', type=int, default=900)
+    parser.add_argument('--threshold', type=float, default=0.5)
+    parser.add_argument('--lead', type=int, default=1800)
+    args = parser.parse_args()
+
+    if args.trace:
+        with open(args.trace) as f:
+            sessions = sorted((int(start), int(end)) for start, end in json.load(f))
+        start = sessions[0][0] - sessions[0][0] % DAY
+        sessions = [(s - start + EPOCH, e - start + EPOCH) for s, e in sessions]  # replay from EPOCH
+        end = max(e for _, e in sessions) + DAY
+    else:
+        sessions = synthetic_trace(args.weeks, args.devs, args.seed)
+        end = EPOCH + args.weeks * WEEK
+    measure_from = EPOCH + args.warmup_weeks * WEEK
+
+    for key, value in runner.BENCH_ENV.items():
+        os.environ.setdefault(key, value)
+    os.environ['METRICS_ENABLED'] = 'false'
+    import stubs
+
+    upstream = stubs.StubUpstream().start()
+    os.environ['ELASTIC_IP'] = upstream.address
+    os.environ['BACKEND_HEALTH_URL'] = f'http://{upstream.address}/'
+    common = {'IDLE_TIMEOUT_SEC': args.idle_timeout, 'PREWAKE_LEAD_SEC': args.lead, 'PREWAKE_THRESHOLD': args.threshold}
+    policies = {
+        'fixed': {**common, 'PREWAKE_ENABLED': False, 'MIN_IDLE_TIMEOUT_SEC': args.idle_timeout},
+        'predictive': {**common, 'PREWAKE_ENABLED': True, 'MIN_IDLE_TIMEOUT_SEC': args.min_idle_timeout},
+    }
+    report = {'config': vars(args), 'sessions': len(sessions), 'policies': {}}
+    stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+    try:
+        for name, policy in policies.items():
+            report['policies'][name] = simulate(sessions, end, measure_from, policy, args)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+        upstream.stop()
+
+    fixed, predictive = report['policies']['fixed'], report['policies']['predictive']
+    report['change'] = {
+        'wakeWaitTotalHours': round(predictive['wakeWaitTotalHours'] - fixed['wakeWaitTotalHours'], 2),
+        'arrivalsWaiting': predictive['arrivalsWaiting'] - fixed['arrivalsWaiting'],
+        'instanceHours': round(predictive['instanceHours'] - fixed['instanceHours'], 1),
+        'wastedInstanceHours': round(predictive['wastedInstanceHours'] - fixed['wastedInstanceHours'], 1)
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
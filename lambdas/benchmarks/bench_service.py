@@ -0,0 +1,278 @@
+"""
+Throughput comparison: per-invocation Lambda mode vs. the shared service mode.
+
+Both modes run the real handlers against stubbed AWS clients with the same
+latencies and the same request mix.
+
+- lambda:  `--concurrency` containers, each cold-starts its own copy of the
+           handler modules and serves one request at a time; events/results
+           are JSON round-tripped like the Lambda runtime API does.
+- service: one ServiceApp behind the asyncio HTTP server, driven over
+           keep-alive HTTP connections at the same concurrency.
+
+Admission control stays on. Requests come from many client addresses: as
+API Gateway's sourceIp in Lambda mode, and as X-Forwarded-For from the
+(trusted, loopback) load balancer in service mode. Per-client buckets then
+apply per client, and 429s show up in the report. The global Bedrock budget is
+raised, since the stubs have no quota.
+
+Usage:
+    python bench_service.py --requests 2000 --concurrency 32 --aws-latency-ms 40
+"""
+
+import argparse
+import asyncio
+import base64
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+LAMBDAS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, LAMBDAS_DIR)
+sys.path.insert(0, os.path.join(LAMBDAS_DIR, 'shared'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'af-south-1')
+# The stubbed Bedrock has no account quota; per-client buckets stay at their defaults
+os.environ.setdefault('ADMISSION_GLOBAL_RATE', '1000000')
+os.environ.setdefault('ADMISSION_GLOBAL_BURST', '1000000')
+os.environ.setdefault('ADMISSION_MAX_CONCURRENCY', '10000')
+# EMF lines would interleave with the report on stdout
+os.environ.setdefault('METRICS_ENABLED', 'false')
+
+import stubs  # noqa: E402
+
+TINY_IMAGE = base64.b64encode(b'\xff\xd8\xff\xe0' + b'\0' * 2048).decode('ascii')
+
+REQUEST_MIX = [
+    ('recommendations', 'GET', '/api/recommendations', 'userId=u{n}&limit=10', None),
+    ('recommendations', 'GET', '/api/recommendations/similar', 'itemId=SKU-{n:06d}&limit=10', None),
+    ('chatbot', 'POST', '/api/chat', '', {'message': 'Is retinol safe with vitamin C?', 'sessionId': 's{n}'}),
+    ('skin-analysis', 'POST', '/api/skin-analysis', '', {'image': TINY_IMAGE}),
+]
+
+HANDLER_DIRS = {
+    'recommendations': 'recommendations',
+    'chatbot': 'chatbot',
+    'skin-analysis': 'skin-analysis',
+}
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summarize(latencies_ms: list[float], wall_sec: float) -> dict:
+    return {
+        'requests': len(latencies_ms),
+        'throughputRps': round(len(latencies_ms) / wall_sec, 1),
+        'p50Ms': round(statistics.median(latencies_ms), 2),
+        'p95Ms': round(percentile(latencies_ms, 95), 2),
+        'p99Ms': round(percentile(latencies_ms, 99), 2)
+    }
+
+
+def client_address(n: int) -> str:
+    """One of 4096 client addresses in the benchmarking range (198.18.0.0/15)."""
+    return f'198.18.{(n // 256) % 16}.{n % 256}'
+
+
+def request_plan(total: int) -> list[tuple]:
+    plan = []
+    for n in range(total):
+        route, method, path, query, body = REQUEST_MIX[n % len(REQUEST_MIX)]
+        plan.append((
+            route, method, path, query.format(n=n % 500),
+            json.dumps({k: (v.format(n=n) if isinstance(v, str) and '{n' in v else v) for k, v in body.items()})
+            if body else '',
+            client_address(n)
+        ))
+    return plan
+
+
+# -----------------------------------------------------------------------------
+# Lambda mode
+# -----------------------------------------------------------------------------
+
+def cold_start(container: int) -> tuple[dict, float]:
+    """Import a private copy of every handler, as a fresh Lambda container would."""
+    from service.events import build_event  # noqa: F401  (warm the shared adapter import)
+
+    start = time.perf_counter()
+    handlers = {}
+    for route, directory in HANDLER_DIRS.items():
+        path = os.path.join(LAMBDAS_DIR, directory, 'handler.py')
+        if os.path.dirname(path) not in sys.path:
+            sys.path.insert(0, os.path.dirname(path))
+        name = f'bench_{route.replace("-", "_")}_{container}'
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        handlers[route] = module.lambda_handler
+    return handlers, (time.perf_counter() - start) * 1000
+
+
+def run_lambda_mode(plan: list[tuple], concurrency: int) -> dict:
+    from service.events import LambdaContext, build_event
+
+    shares = [plan[i::concurrency] for i in range(concurrency)]
+    latencies: list[float] = []
+    errors: list[int] = []
+    throttled: list[int] = []
+    cold_ms: list[float] = []
+    billed_ms = 0.0
+    lock = threading.Lock()
+
+    def container(index: int):
+        nonlocal billed_ms
+        handlers, init_ms = cold_start(index)
+        local, billed = [], init_ms
+        for route, method, path, query, body, address in shares[index]:
+            t0 = time.perf_counter()
+            event = json.loads(json.dumps(build_event(method, path, query, {'content-type': 'application/json'},
+                                                      body.encode('utf-8'), address)))
+            result = json.loads(json.dumps(handlers[route](event, LambdaContext(route, 30))))
+            if result['statusCode'] >= 500:
+                errors.append(result['statusCode'])
+            elif result['statusCode'] == 429:
+                throttled.append(429)
+            elapsed = (time.perf_counter() - t0) * 1000
+            local.append(elapsed)
+            billed += elapsed
+        with lock:
+            latencies.extend(local)
+            cold_ms.append(init_ms)
+            billed_ms += billed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(container, range(concurrency)))
+    wall = time.perf_counter() - start
+
+    report = summarize(latencies, wall)
+    report.update({
+        'containers': concurrency,
+        'coldStarts': len(cold_ms),
+        'coldStartMeanMs': round(statistics.fmean(cold_ms), 2),
+        'billedMsPerRequest': round(billed_ms / len(plan), 2),
+        'errors': len(errors),
+        'throttled': len(throttled)
+    })
+    return report
+
+
+# -----------------------------------------------------------------------------
+# Service mode
+# -----------------------------------------------------------------------------
+
+async def http_worker(port: int, jobs: asyncio.Queue, latencies: list[float], errors: list[int], throttled: list[int]):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        while True:
+            try:
+                _, method, path, query, body, address = jobs.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            target = f'{path}?{query}' if query else path
+            data = body.encode('utf-8')
+            t0 = time.perf_counter()
+            writer.write(
+                f'{method} {target} HTTP/1.1\r\nhost: bench\r\ncontent-type: application/json\r\n'
+                f'x-forwarded-for: {address}\r\ncontent-length: {len(data)}\r\n\r\n'.encode('latin-1') + data
+            )
+            await writer.drain()
+            head = await reader.readuntil(b'\r\n\r\n')
+            status = int(head.split(b' ', 2)[1])
+            if status >= 500:
+                errors.append(status)
+            elif status == 429:
+                throttled.append(status)
+            length = 0
+            for line in head.decode('latin-1').split('\r\n'):
+                if line.lower().startswith('content-length:'):
+                    length = int(line.split(':', 1)[1])
+            await reader.readexactly(length)
+            latencies.append((time.perf_counter() - t0) * 1000)
+    finally:
+        writer.close()
+
+
+def run_service_mode(plan: list[tuple], concurrency: int, cache_ttl: float) -> dict:
+    from service.app import ResponseCache, ServiceApp
+    from service.server import HttpServer
+
+    app = ServiceApp(threads=concurrency, cache=ResponseCache(ttl_sec=cache_ttl))
+    server = HttpServer(app, '127.0.0.1', 0)
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    def serve():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(server.start())
+        ready.set()
+        loop.run_forever()
+
+    t0 = time.perf_counter()
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    ready.wait()
+    startup_ms = (time.perf_counter() - t0) * 1000
+
+    errors: list[int] = []
+    throttled: list[int] = []
+
+    async def drive() -> tuple[list[float], float]:
+        jobs: asyncio.Queue = asyncio.Queue()
+        for job in plan:
+            jobs.put_nowait(job)
+        latencies: list[float] = []
+        start = time.perf_counter()
+        await asyncio.gather(*(http_worker(server.port, jobs, latencies, errors, throttled) for _ in range(concurrency)))
+        return latencies, time.perf_counter() - start
+
+    latencies, wall = asyncio.run(drive())
+    asyncio.run_coroutine_threadsafe(server.shutdown(grace_sec=1), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+
+    report = summarize(latencies, wall)
+    report.update({
+        'processes': 1,
+        'coldStarts': 1,
+        'startupMs': round(startup_ms, 2),
+        'cacheHits': app.cache.hits,
+        'errors': len(errors),
+        'throttled': len(throttled)
+    })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--aws-latency-ms', type=float, default=40.0)
+    parser.add_argument('--cache-ttl', type=float, default=0.0, help='Service response cache TTL (0 = off)')
+    args = parser.parse_args()
+
+    latency = stubs.Latency(args.aws_latency_ms, args.aws_latency_ms / 4, seed=1)
+    stubs.install(stubs.StubRegistry({name: latency for name in
+                                      ('bedrock-runtime', 'rekognition', 'personalize-runtime', 'dynamodb')}))
+
+    plan = request_plan(args.requests)
+    report = {
+        'config': vars(args),
+        'lambda': run_lambda_mode(plan, args.concurrency),
+        'service': run_service_mode(plan, args.concurrency, args.cache_ttl)
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
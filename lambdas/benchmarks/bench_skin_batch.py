@@ -0,0 +1,152 @@
+"""
+Progress-tracking skin analysis: one batch request vs N sequential requests.
+
+For N = 1..--max-images it times, through the real skin-analysis handler and
+the stubbed clients:
+
+- sequential: N `POST /api/skin-analysis` calls one after another, which is
+  what the frontend does without the batch route;
+- batch: one `POST /api/skin-analysis/batch` with N images. DetectFaces runs
+  on the bounded pool, and a single Bedrock call analyzes all N.
+
+The model's time depends on the length of its completion. The Bedrock stub
+therefore waits its base latency (time to first token plus overhead) and then
+--token-ms for each output token. The batch completion holds N per-image
+entries plus a comparison, so one batch call is slower than one single call.
+The benchmark reports the median wall time per N, the speedup, and the
+Bedrock calls and output tokens each mode used.
+
+`--faults rekognition=0.3,0` checks error isolation: failed images come back as
+per-image errors, and the rest of the batch is still analyzed.
+
+Usage:
+    python bench_skin_batch.py --max-images 8 --repeats 5
+    python bench_skin_batch.py --token-ms 25 --latency-scale 1
+    python bench_skin_batch.py --faults rekognition=0.3,0
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+import runner  # noqa: E402
+
+# Base Bedrock latency without generation; output tokens are timed separately
+BEDROCK_BASE_LATENCY = 'lognormal:450,1200'
+
+
+def _texts() -> tuple[str, dict]:
+    """The recorded single-image completion and the recorded batch completion."""
+    import stubs
+
+    entries = stubs.load_fixtures('bedrock-runtime')['invoke_model']
+    single = next(e for e in entries if e.get('when') == 'expert dermatologist')
+    batch = next(e for e in entries if e.get('when') == "tracking one person's skin")
+    return (
+        single['response']['body']['content'][0]['text'],
+        json.loads(batch['response']['body']['content'][0]['text'])
+    )
+
+
+def batch_text(template: dict, n: int) -> str:
+    """Recorded batch completion stretched to `n` images, the length a real one would have."""
+    images = template['images']
+    analysis = dict(template, images=[dict(images[i % len(images)], index=i) for i in range(n)])
+    if n == 1:
+        analysis['comparison'] = None
+    return json.dumps(analysis)  # the prompt asks for unindented JSON
+
+
+def run(env, handler, mode: str, n: int, text: str) -> dict:
+    import apigw_events
+
+    bedrock = env.registry.clients['bedrock-runtime']
+    bedrock.text = text
+    calls = bedrock.calls
+    start = time.perf_counter()
+    if mode == 'sequential':
+        outcomes = []
+        for i in range(n):
+            event = apigw_events.SCENARIOS_BY_NAME['skin.analyze'].event(i)
+            response = handler(event, None)
+            outcomes.append(response['statusCode'] == 200)
+        analyzed = sum(outcomes)
+    else:
+        event = apigw_events._event(
+            'POST /api/skin-analysis/batch', 'POST', '/api/skin-analysis/batch',
+            body={'images': [apigw_events.TINY_JPEG] * n}
+        )
+        response = handler(event, None)
+        analyzed = json.loads(response['body']).get('analyzed', 0)
+    wall_ms = (time.perf_counter() - start) * 1000
+    bedrock_calls = bedrock.calls - calls
+    tokens = bedrock_calls * (len(text) // 4)
+    return {'wallMs': wall_ms, 'analyzed': analyzed, 'bedrockCalls': bedrock_calls, 'outputTokens': tokens}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--max-images', type=int, default=8)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--token-ms', type=float, default=15.0, help='Generation time per output token')
+    parser.add_argument('--latency', nargs='*', default=[], metavar='SERVICE=SPEC')
+    parser.add_argument('--latency-scale', type=float, default=0.25)
+    parser.add_argument('--faults', nargs='*', default=[], metavar='SERVICE=THROTTLE,ERROR')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    for key, value in runner.BENCH_ENV.items():
+        os.environ.setdefault(key, value)
+    os.environ['METRICS_ENABLED'] = 'false'
+    config = {
+        'latency': {**runner.DEFAULT_LATENCY, 'bedrock-runtime': BEDROCK_BASE_LATENCY, **runner.parse_pairs(args.latency)},
+        'latencyScale': args.latency_scale,
+        'throttleRate': 0.0,
+        'errorRate': 0.0,
+        'faults': runner.parse_pairs(args.faults),
+        'ec2State': 'running',
+        'seed': args.seed
+    }
+    env = runner.Environment(config)
+    env.registry.clients['bedrock-runtime'].output_token_ms = args.token_ms
+    single_text, batch_template = _texts()
+
+    rows = []
+    stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')  # handler error prints under faults
+    try:
+        handler = env.handler('skin-analysis')
+        for n in range(1, args.max_images + 1):
+            row = {'images': n}
+            for mode, text in (('sequential', single_text), ('batch', batch_text(batch_template, n))):
+                runs = [run(env, handler, mode, n, text) for _ in range(args.repeats)]
+                row[mode] = {
+                    'wallMs': round(statistics.median(r['wallMs'] for r in runs), 1),
+                    'analyzed': round(statistics.fmean(r['analyzed'] for r in runs), 2),
+                    'bedrockCalls': runs[0]['bedrockCalls'],
+                    'outputTokens': runs[0]['outputTokens']
+                }
+            row['speedup'] = round(row['sequential']['wallMs'] / row['batch']['wallMs'], 2)
+            rows.append(row)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+        env.close()
+
+    print(json.dumps({'config': vars(args), 'results': rows}, indent=2))
+    print(f"\n{'N':>2}  {'sequential ms':>13}  {'batch ms':>9}  {'speedup':>7}  {'analyzed seq/batch':>18}", file=sys.stderr)
+    for row in rows:
+        print(
+            f"{row['images']:>2}  {row['sequential']['wallMs']:>13.1f}  {row['batch']['wallMs']:>9.1f}  "
+            f"{row['speedup']:>6.2f}x  {row['sequential']['analyzed']:>8.2f} / {row['batch']['analyzed']:.2f}",
+            file=sys.stderr
+        )
+
+
+if __name__ == '__main__':
+    main()
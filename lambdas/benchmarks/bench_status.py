@@ -0,0 +1,217 @@
+"""
+Dev API status probing: sequential vs concurrent `/status`, and following a
+wake by fixed-interval polling vs the `/status?waitFor=healthy` long-poll.
+
+1. `probe`: with the backend up, it times the old order (DescribeInstances,
+   then DescribeServices, then the HTTP health check) against the concurrent
+   `_handle_status` under the runner's default latency distributions. The
+   health check has a slow tail (--health-latency), as a busy Magento does.
+2. `wake`: it POSTs /wake to a stopped backend, then follows it until it is
+   healthy, on a simulated clock with the stateful stubs. EC2 boots in
+   --boot-sec, the ECS task is placed --placement-sec later, and Magento
+   answers --app-start-sec after that. The two strategies are the old
+   frontend (GET /status every --poll-sec) and the long-poll loop the
+   frontend now runs. It reports the client requests, the AWS and health-
+   check calls, and how late each client noticed the backend was healthy,
+   averaged over --trials runs with the app start shifted across one poll.
+
+Usage:
+    python bench_status.py --requests 100
+    python bench_status.py --boot-sec 60 --placement-sec 90 --poll-sec 2.5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+import runner  # noqa: E402
+
+
+class SimClock:
+    def __init__(self, t: float = 1_000_000.0):
+        self.t = t
+
+    def now(self) -> float:
+        return self.t
+
+    def sleep(self, seconds: float):
+        self.t += seconds
+
+
+def _load_dev_api():
+    from service.app import ROUTES, load_module
+
+    route = next(route for route in ROUTES if route.name == 'dev-api')
+    return load_module(route.name, route.module_path)
+
+
+def _status_event(query: str = '') -> dict:
+    import apigw_events
+
+    return apigw_events._event('GET /status', 'GET', '/status', query, stage=apigw_events.DEV_STAGE)
+
+
+def sequential_status(dev_api) -> dict:
+    """The probe order `_handle_status` used before: each call waits for the previous one."""
+    state = dev_api._get_instance_state()
+    service = dev_api._get_service()
+    healthy = state == 'running' and service.get('runningCount', 0) > 0 and dev_api._is_healthy()
+    return {'instanceState': state, 'service': service, 'healthy': healthy}
+
+
+def bench_probe(args) -> dict:
+    import stubs
+
+    latencies = {
+        service: stubs.Latency.parse(spec, seed=args.seed + index)
+        for index, (service, spec) in enumerate(sorted(runner.DEFAULT_LATENCY.items()))
+    }
+    upstream = stubs.StubUpstream(health_latency=stubs.Latency.parse(args.health_latency, seed=args.seed)).start()
+    os.environ['BACKEND_HEALTH_URL'] = f'http://{upstream.address}/'
+    stubs.install(stubs.StubRegistry(latencies, ec2_state='running'))
+    dev_api = _load_dev_api()
+    event = _status_event()
+    report = {}
+    try:
+        for name, probe in (
+            ('sequential', lambda: sequential_status(dev_api)),
+            ('concurrent', lambda: json.loads(dev_api.lambda_handler(event, None)['body']))
+        ):
+            timings, healthy = [], 0
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                healthy += probe()['healthy']
+                timings.append((time.perf_counter() - start) * 1000)
+            report[name] = {
+                'p50Ms': round(runner.percentile(timings, 50), 1),
+                'p95Ms': round(runner.percentile(timings, 95), 1),
+                'p99Ms': round(runner.percentile(timings, 99), 1),
+                'meanMs': round(statistics.fmean(timings), 1),
+                'healthyShare': round(healthy / args.requests, 3)
+            }
+    finally:
+        upstream.stop()
+    return report
+
+
+def follow_wake(args, strategy: str, app_start_sec: float) -> dict:
+    import apigw_events
+    import stubs
+
+    clock = SimClock()
+    registry = stubs.install(stubs.StubRegistry(clock=clock.now, ec2_state='stopped'))
+    ec2, ecs = registry.clients['ec2'], registry.clients['ecs']
+    ec2.boot_sec, ecs.placement_sec = args.boot_sec, args.placement_sec
+
+    def healthy_at() -> float:
+        running_since = ec2.running_since()
+        if running_since is None or not ecs.desired_count:
+            return float('inf')
+        return max(running_since, ecs._desired_since) + ecs.placement_sec + app_start_sec
+
+    upstream = stubs.StubUpstream(healthy=lambda: clock.t >= healthy_at()).start()
+    os.environ['BACKEND_HEALTH_URL'] = f'http://{upstream.address}/'
+    dev_api = _load_dev_api()
+    dev_api._now = lambda: int(clock.t)
+    dev_api._monotonic = clock.now
+    dev_api._sleep = clock.sleep
+
+    try:
+        wake = apigw_events.SCENARIOS_BY_NAME['dev.wake'].event()
+        dev_api.lambda_handler(wake, None)
+        woke_at = clock.t
+        calls_before = {name: client.calls for name, client in registry.clients.items()}
+        checks_before = upstream.requests
+        requests, phases, since = 0, [], None
+        while requests < 10000:
+            if strategy == 'poll':
+                if requests:
+                    clock.sleep(args.poll_sec)
+                body = json.loads(dev_api.lambda_handler(_status_event(), None)['body'])
+            else:
+                query = 'waitFor=healthy' + (f'&since={since}' if since else '')
+                body = json.loads(dev_api.lambda_handler(_status_event(query), None)['body'])
+                since = body['phase']
+                phases += [phase['phase'] for phase in body['phases'] if not phases or phase['phase'] != phases[-1]]
+            requests += 1
+            if body['healthy']:
+                break
+        seen_at = clock.t
+    finally:
+        upstream.stop()
+
+    calls = {name: client.calls - calls_before[name] for name, client in registry.clients.items()}
+    result = {
+        'clientRequests': requests,
+        'ec2Calls': calls['ec2'],
+        'ecsCalls': calls['ecs'],
+        'dynamodbCalls': calls['dynamodb'],
+        'healthChecks': upstream.requests - checks_before,
+        'healthyAfterSec': round(healthy_at() - woke_at, 1),
+        'seenAfterSec': round(seen_at - woke_at, 1),
+        'detectionDelaySec': round(seen_at - healthy_at(), 2)
+    }
+    if phases:
+        result['phases'] = phases
+    return result
+
+
+def bench_wake(args) -> dict:
+    """Runs each strategy `--trials` times, shifting when Magento comes up across one poll interval."""
+    report = {}
+    for strategy in ('poll', 'longpoll'):
+        runs = [
+            follow_wake(args, strategy, args.app_start_sec + trial * args.poll_sec / args.trials)
+            for trial in range(args.trials)
+        ]
+        delays = [run['detectionDelaySec'] for run in runs]
+        report[strategy] = {
+            **{key: round(statistics.fmean(run[key] for run in runs), 1)
+               for key in ('clientRequests', 'ec2Calls', 'ecsCalls', 'dynamodbCalls', 'healthChecks')},
+            'detectionDelaySecMean': round(statistics.fmean(delays), 2),
+            'detectionDelaySecMax': round(max(delays), 2),
+            **({'phases': runs[0]['phases']} if 'phases' in runs[0] else {})
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('part', nargs='*', metavar='{probe,wake}', help='Parts to run (default: both)')
+    parser.add_argument('--requests', type=int, default=60, help='Status requests per probe mode')
+    parser.add_argument('--health-latency', default='lognormal:40,900', help='Health check latency spec')
+    parser.add_argument('--boot-sec', type=float, default=60.0)
+    parser.add_argument('--placement-sec', type=float, default=45.0)
+    parser.add_argument('--app-start-sec', type=float, default=30.0)
+    parser.add_argument('--poll-sec', type=float, default=2.5, help='Old frontend poll interval')
+    parser.add_argument('--trials', type=int, default=10, help='Wake runs per strategy')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    args.part = args.part or ['probe', 'wake']
+    if set(args.part) - {'probe', 'wake'}:
+        parser.error(f'unknown part: {", ".join(sorted(set(args.part) - {"probe", "wake"}))}')
+
+    for key, value in runner.BENCH_ENV.items():
+        os.environ.setdefault(key, value)
+    os.environ['METRICS_ENABLED'] = 'false'
+    report = {'config': vars(args)}
+    stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+    try:
+        if 'probe' in args.part:
+            report['probe'] = bench_probe(args)
+        if 'wake' in args.part:
+            report['wake'] = bench_wake(args)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Chat turn latency with synchronous vs write-behind conversation persistence.
+
+Runs the `chat.message` scenario through the real chatbot handler against the
+stubbed AWS clients (runner defaults: Bedrock ~900 ms p50, DynamoDB ~6 ms p50,
+lognormal) in both write modes and reports p50/p99 per turn and the reduction.
+For write-behind it also checks:
+
+- read-your-writes: every turn saw all earlier turns of its session, even when
+  they had not been persisted yet (history length == 2 * earlier turns; only
+  enforced without faults, since a failed GetItem starts a history over);
+- no loss: after `drain()` each session's item decodes to the last history
+  saved for it, also with DynamoDB faults injected (`--faults`).
+
+Usage:
+    python bench_write_behind.py --requests 2000 --concurrency 16 --latency-scale 0.2
+    python bench_write_behind.py --latency bedrock-runtime=0     # DynamoDB share without the model
+    python bench_write_behind.py --faults 0.2,0.05                # throttle, error rate for DynamoDB
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [BENCH_DIR, os.path.join(BENCH_DIR, '..', 'shared'), os.path.join(BENCH_DIR, '..', 'chatbot')]
+
+os.environ.setdefault('METRICS_ENABLED', 'false')
+
+import runner  # noqa: E402
+
+
+def run_mode(env: 'runner.Environment', module, mode: str, requests: int, concurrency: int) -> dict:
+    import apigw_events
+    import conversation_codec
+    import write_behind
+
+    for index, latency in enumerate(env.latencies.values()):
+        latency._rng.seed(env.config['seed'] + index)  # both modes draw the same latencies
+    table = env.registry.resources['dynamodb'].Table(module.CONVERSATIONS_TABLE)
+    with table._lock:
+        table.items.clear()
+    module.conversation_writer = write_behind.WriteBehind(module._write_batch) if mode == 'behind' else None
+
+    scenario = apigw_events.SCENARIOS_BY_NAME['chat.message']
+    handler = module.lambda_handler
+    lock = threading.Lock()
+    turns: dict[str, int] = {}  # turns started per session
+    last_saved: dict[str, list] = {}
+    stale_reads = 0
+    original_save = module.save_conversation
+
+    session_locks: dict[str, threading.Lock] = {}
+
+    def recording_save(session_id: str, messages: list):
+        nonlocal stale_reads
+        with lock:
+            if len(messages) != 2 * turns[session_id]:
+                stale_reads += 1
+            session_lock = session_locks.setdefault(session_id, threading.Lock())
+        # Overlapping turns of one session race in either mode; record them in the order they are saved
+        with session_lock:
+            last_saved[session_id] = list(messages)
+            original_save(session_id, messages)
+
+    def turn(n: int) -> float:
+        event = scenario.event(n)
+        session_id = json.loads(event['body'])['sessionId']
+        with lock:
+            turns[session_id] = turns.get(session_id, 0) + 1
+        elapsed, outcome = runner.invoke(handler, event, scenario.target)
+        if outcome != '200':
+            raise RuntimeError(f'{mode}: turn {n} returned {outcome}')
+        return elapsed
+
+    # Sessions are sess-{n % 200}: a session's next turn starts long after its previous one finished
+    module.save_conversation = recording_save
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            start = time.perf_counter()
+            latencies = list(pool.map(turn, range(requests)))
+            wall = time.perf_counter() - start
+        drain_start = time.perf_counter()
+        drained = module.drain(60)
+        drain_ms = (time.perf_counter() - drain_start) * 1000
+    finally:
+        module.save_conversation = original_save
+
+    lost = 0
+    for session_id, messages in last_saved.items():
+        item = table.items.get(table._key({'session_id': session_id}))
+        if item is None or conversation_codec.decode_item(item) != messages:
+            lost += 1
+
+    result = {
+        'p50Ms': round(runner.percentile(latencies, 50), 2),
+        'p99Ms': round(runner.percentile(latencies, 99), 2),
+        'meanMs': round(statistics.fmean(latencies), 2),
+        'throughputRps': round(requests / wall, 1),
+        'staleReads': stale_reads,
+        'sessionsLost': lost,
+        'drained': drained,
+        'drainMs': round(drain_ms, 1)
+    }
+    if module.conversation_writer:
+        result['writer'] = module.conversation_writer.stats()
+    module.conversation_writer = None
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--latency', nargs='*', default=[], metavar='SERVICE=SPEC')
+    parser.add_argument('--latency-scale', type=float, default=0.2)
+    parser.add_argument('--faults', default='0,0', metavar='THROTTLE,ERROR', help='DynamoDB fault rates')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    config = {
+        'latency': {**runner.DEFAULT_LATENCY, **runner.parse_pairs(args.latency)},
+        'latencyScale': args.latency_scale,
+        'throttleRate': 0.0,
+        'errorRate': 0.0,
+        'faults': {'dynamodb': args.faults},
+        'ec2State': 'running',
+        'seed': args.seed
+    }
+    env = runner.Environment(config)
+    stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')  # handler error prints under faults
+    try:
+        env.handler('chatbot')
+        module = env.modules['chatbot']
+        report = {'config': {k: v for k, v in vars(args).items()}, 'modes': {}}
+        for mode in ('sync', 'behind'):
+            report['modes'][mode] = run_mode(env, module, mode, args.requests, args.concurrency)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+        env.close()
+
+    sync, behind = report['modes']['sync'], report['modes']['behind']
+    report['reduction'] = {
+        'p50Ms': round(sync['p50Ms'] - behind['p50Ms'], 2),
+        'p99Ms': round(sync['p99Ms'] - behind['p99Ms'], 2),
+        'p50Pct': round(100 * (sync['p50Ms'] - behind['p50Ms']) / sync['p50Ms'], 1) if sync['p50Ms'] else 0.0,
+        'p99Pct': round(100 * (sync['p99Ms'] - behind['p99Ms']) / sync['p99Ms'], 1) if sync['p99Ms'] else 0.0
+    }
+    print(json.dumps(report, indent=2))
+    # Under injected faults a failed GetItem starts the history over, in either mode
+    stale = behind['staleReads'] if args.faults.strip('0,.') == '' else 0
+    if stale or behind['sessionsLost'] or not behind['drained']:
+        print('Write-behind lost or reordered conversation writes', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,398 @@
+"""
+Offline load test for every Lambda handler and dev_api.
+
+Drives each scenario from `apigw_events` through the real `lambda_handler`
+against the stubs in `stubs.py` (recorded responses, latency distributions
+per service, optional throttling/error injection) and writes one JSON report:
+
+- per scenario: throughput, p50/p95/p99/max latency, status codes, handler
+  exceptions, AWS calls per request and allocations per request (tracemalloc,
+  measured in a separate sequential pass so tracing does not skew latency);
+- per handler: cold start measured in fresh interpreter processes (module
+  import including the SDK, first invocation, second invocation).
+
+Warm invocations share one imported module across `--concurrency` threads,
+like one container per thread with shared module state. Compare two reports
+(e.g. from two commits) with `--baseline`; `--max-regression` turns the
+comparison into a failing exit code for CI.
+
+Usage:
+    python runner.py --concurrency 16 --requests 200 --output bench-results.json
+    python runner.py --scenarios recs dev.status --latency bedrock-runtime=lognormal:900,2600
+    python runner.py --latency-scale 0.1 --baseline main.json --max-regression 25
+"""
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+LAMBDAS_DIR = os.path.dirname(BENCH_DIR)
+sys.path[:0] = [BENCH_DIR, LAMBDAS_DIR]
+
+# Median and p99 per service, roughly what these APIs show from af-south-1 Lambdas
+DEFAULT_LATENCY = {
+    'bedrock-runtime': 'lognormal:900,2600',
+    'rekognition': 'lognormal:180,450',
+    'personalize-runtime': 'lognormal:35,120',
+    'dynamodb': 'lognormal:6,25',
+    'ec2': 'lognormal:90,300',
+    'ecs': 'lognormal:70,250',
+    'upstream': 'lognormal:120,600',
+}
+
+BENCH_ENV = {
+    'AWS_DEFAULT_REGION': 'af-south-1',
+    'AWS_REGION': 'af-south-1',
+    'PERSONALIZE_CAMPAIGN_ARN': 'arn:aws:personalize:af-south-1:123456789012:campaign/bench',
+    'EC2_INSTANCE_ID': 'i-0123456789abcdef0',
+    'ECS_CLUSTER_ARN': 'arn:aws:ecs:af-south-1:123456789012:cluster/dev-ecs-lite',
+    'ECS_SERVICE_NAME': 'dev-backend',
+    'DDB_TABLE_NAME': 'dev-idle',
+    # Benchmark traffic would exhaust per-client admission buckets; measure the handlers themselves
+    'ADMISSION_ENABLED': 'false',
+    # No precomputed store, so recommendation routes exercise Personalize
+    'OFFLINE_STORE_PATH': os.path.join(tempfile.gettempdir(), 'bench-no-offline-store.dsrs'),
+    'ELIGIBILITY_SNAPSHOT_PATH': os.path.join(tempfile.gettempdir(), 'bench-no-eligibility.snapshot.gz'),
+}
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def parse_pairs(values: list[str]) -> dict[str, str]:
+    pairs = {}
+    for value in values or []:
+        key, sep, spec = value.partition('=')
+        if not sep:
+            raise SystemExit(f'Expected service=value, got {value!r}')
+        pairs[key] = spec
+    return pairs
+
+
+def build_config(args: argparse.Namespace) -> dict:
+    return {
+        'latency': {**DEFAULT_LATENCY, **parse_pairs(args.latency)},
+        'latencyScale': args.latency_scale,
+        'throttleRate': args.throttle_rate,
+        'errorRate': args.error_rate,
+        'faults': parse_pairs(args.faults),
+        'ec2State': args.ec2_state,
+        'seed': args.seed,
+    }
+
+
+class Environment:
+    """Stubbed AWS, a stub Magento upstream and the handler modules, set up once per process."""
+
+    def __init__(self, config: dict):
+        import stubs
+
+        self.config = config
+        seed = config['seed']
+        latencies = {}
+        for index, (service, spec) in enumerate(sorted(config['latency'].items())):
+            latencies[service] = stubs.Latency.parse(spec, seed=seed + index)
+            latencies[service].scale = config['latencyScale']
+        faults = {}
+        for index, service in enumerate(stubs.SERVICE_ERRORS):
+            throttle, error = config['throttleRate'], config['errorRate']
+            if service in config['faults']:
+                throttle, _, error = config['faults'][service].partition(',')
+                throttle, error = float(throttle or 0), float(error or 0)
+            faults[service] = stubs.Faults(throttle, error, seed=seed + 100 + index)
+
+        self.upstream = stubs.StubUpstream(latencies.get('upstream')).start()
+        for key, value in BENCH_ENV.items():
+            os.environ.setdefault(key, value)
+        # Always this process's upstream: cold-start probes inherit the environment
+        os.environ['ELASTIC_IP'] = self.upstream.address
+        os.environ['BACKEND_HEALTH_URL'] = f'http://{self.upstream.address}/'
+        self.latencies = latencies
+        self.registry = stubs.install(stubs.StubRegistry(latencies, faults, ec2_state=config['ec2State']))
+        self.modules = {}
+
+    def handler(self, target: str):
+        if target not in self.modules:
+            from service.app import ROUTES, load_module
+
+            route = next(route for route in ROUTES if route.name == target)
+            self.modules[target] = load_module(route.name, route.module_path)
+        return self.modules[target].lambda_handler
+
+    @contextlib.contextmanager
+    def without_latency(self):
+        for latency in self.latencies.values():
+            latency.scale = 0.0
+        try:
+            yield
+        finally:
+            for latency in self.latencies.values():
+                latency.scale = self.config['latencyScale']
+
+    def aws_calls(self) -> dict[str, int]:
+        return {name: stats['calls'] for name, stats in self.registry.stats().items()}
+
+    def close(self):
+        self.upstream.stop()
+
+
+def invoke(handler, event: dict, target: str) -> tuple[float, str]:
+    """One invocation through the Lambda runtime's JSON round trip: (latency ms, outcome)."""
+    from service.events import LambdaContext
+
+    payload = json.loads(json.dumps(event))
+    start = time.perf_counter()
+    try:
+        result = handler(payload, LambdaContext(target, 30))
+        json.dumps(result)
+        outcome = str(result.get('statusCode', 200)) if isinstance(result, dict) else 'null'
+    except Exception as e:
+        outcome = f'exception:{type(e).__name__}'
+    return (time.perf_counter() - start) * 1000, outcome
+
+
+def run_scenario(env: Environment, scenario, requests: int, concurrency: int, alloc_samples: int) -> dict:
+    handler = env.handler(scenario.target)
+    events = [scenario.event(n) for n in range(requests)]
+    invoke(handler, events[0], scenario.target)  # warm up module state and caches
+
+    latencies: list[float] = []
+    outcomes: dict[str, int] = {}
+    lock = threading.Lock()
+    calls_before = env.aws_calls()
+
+    def worker(event: dict):
+        elapsed, outcome = invoke(handler, event, scenario.target)
+        with lock:
+            latencies.append(elapsed)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, events))
+    wall = time.perf_counter() - start
+
+    calls_after = env.aws_calls()
+    aws_calls = {
+        service: round((calls - calls_before.get(service, 0)) / requests, 2)
+        for service, calls in calls_after.items() if calls != calls_before.get(service, 0)
+    }
+
+    return {
+        'target': scenario.target,
+        'requests': requests,
+        'concurrency': concurrency,
+        'throughputRps': round(requests / wall, 1),
+        'meanMs': round(statistics.fmean(latencies), 2),
+        'p50Ms': round(percentile(latencies, 50), 2),
+        'p95Ms': round(percentile(latencies, 95), 2),
+        'p99Ms': round(percentile(latencies, 99), 2),
+        'maxMs': round(max(latencies), 2),
+        'outcomes': dict(sorted(outcomes.items())),
+        'exceptions': sum(count for outcome, count in outcomes.items() if outcome.startswith('exception')),
+        'awsCallsPerRequest': aws_calls,
+        **measure_allocations(env, handler, scenario, alloc_samples)
+    }
+
+
+def measure_allocations(env: Environment, handler, scenario, samples: int) -> dict:
+    """Median peak and retained traced memory per invocation, sequentially and without stub latency."""
+    if samples <= 0:
+        return {}
+    peaks, retained = [], []
+    with env.without_latency():
+        tracemalloc.start()
+        try:
+            for n in range(samples):
+                event = scenario.event(n)
+                tracemalloc.reset_peak()
+                before, _ = tracemalloc.get_traced_memory()
+                invoke(handler, event, scenario.target)
+                after, peak = tracemalloc.get_traced_memory()
+                peaks.append(peak - before)
+                retained.append(after - before)
+        finally:
+            tracemalloc.stop()
+    return {
+        'allocPeakKiB': round(statistics.median(peaks) / 1024, 1),
+        'allocRetainedKiB': round(statistics.median(retained) / 1024, 2)
+    }
+
+
+def cold_probe(config: dict, target: str, scenario_name: str) -> dict:
+    """Runs in a fresh interpreter: what a new Lambda container pays before and during its first request."""
+    start = time.perf_counter()
+    import boto3  # noqa: F401  # The handlers' first import, and most of their init time
+
+    sdk_ms = (time.perf_counter() - start) * 1000
+    env = Environment(config)
+    import apigw_events
+
+    scenario = apigw_events.SCENARIOS_BY_NAME[scenario_name]
+    start = time.perf_counter()
+    handler = env.handler(target)
+    import_ms = (time.perf_counter() - start) * 1000
+    first_ms, _ = invoke(handler, scenario.event(0), target)
+    second_ms, _ = invoke(handler, scenario.event(1), target)
+    env.close()
+    return {'sdkImportMs': sdk_ms, 'handlerImportMs': import_ms, 'firstInvokeMs': first_ms, 'warmInvokeMs': second_ms}
+
+
+def measure_cold_start(config: dict, target: str, scenario_name: str, runs: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--probe', json.dumps([config, target, scenario_name])],
+            capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    report = {key: round(statistics.median(s[key] for s in samples), 2) for key in samples[0]}
+    report['coldPenaltyMs'] = round(
+        report['sdkImportMs'] + report['handlerImportMs'] + report['firstInvokeMs'] - report['warmInvokeMs'], 2
+    )
+    return {'scenario': scenario_name, 'runs': runs, **report}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+COMPARED_METRICS = (('p50Ms', 1), ('p95Ms', 1), ('p99Ms', 1), ('throughputRps', -1), ('allocPeakKiB', 1))
+
+
+def compare(report: dict, baseline: dict) -> list[dict]:
+    """Percentage change per metric; positive `regressionPct` means worse than the baseline."""
+    rows = []
+    for name, current in report['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+        for metric, direction in COMPARED_METRICS:
+            if not previous.get(metric) or metric not in current:
+                continue
+            change = (current[metric] - previous[metric]) / previous[metric] * 100
+            rows.append({
+                'scenario': name,
+                'metric': metric,
+                'baseline': previous[metric],
+                'current': current[metric],
+                'regressionPct': round(change * direction, 1)
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', nargs='*', help='Scenario names or prefixes (default: all)')
+    parser.add_argument('--requests', type=int, default=100, help='Requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', nargs='*', default=[], metavar='SERVICE=SPEC',
+                        help='Override a latency distribution, e.g. dynamodb=normal:8,2 (see stubs.Latency.parse)')
+    parser.add_argument('--latency-scale', type=float, default=1.0, help='Multiply every stubbed latency')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fraction of AWS calls throttled')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of AWS calls failing with 5xx')
+    parser.add_argument('--faults', nargs='*', default=[], metavar='SERVICE=THROTTLE,ERROR',
+                        help='Per-service fault rates, e.g. bedrock-runtime=0.05,0.01')
+    parser.add_argument('--ec2-state', default='running', choices=['running', 'stopped'],
+                        help='Initial dev backend state for dev.* scenarios')
+    parser.add_argument('--alloc-samples', type=int, default=20, help='Sequential invocations traced for allocations')
+    parser.add_argument('--cold-runs', type=int, default=3, help='Fresh processes per handler (0 to skip)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='bench-results.json')
+    parser.add_argument('--baseline', help='Earlier report to compare against')
+    parser.add_argument('--max-regression', type=float, help='Exit 1 if any compared metric regresses more (percent)')
+    parser.add_argument('--show-logs', action='store_true', help='Let handler output (EMF metrics, errors) through')
+    parser.add_argument('--probe', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if not args.show_logs:
+        sys.stdout = open(os.devnull, 'w')
+    if args.probe:
+        print(json.dumps(cold_probe(*json.loads(args.probe))), file=sys.__stdout__)
+        return
+
+    import apigw_events
+
+    config = build_config(args)
+    scenarios = apigw_events.select(args.scenarios)
+    env = Environment(config)
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'requestsPerScenario': args.requests,
+            'concurrency': args.concurrency,
+            'config': config
+        },
+        'scenarios': {},
+        'coldStart': {}
+    }
+    try:
+        for scenario in scenarios:
+            result = report['scenarios'][scenario.name] = run_scenario(
+                env, scenario, args.requests, args.concurrency, args.alloc_samples
+            )
+            print(f"{scenario.name:28} p50 {result['p50Ms']:>9} ms  p99 {result['p99Ms']:>9} ms"
+                  f"  {result['throughputRps']:>8} req/s", file=sys.stderr)
+    finally:
+        env.close()
+    report['aws'] = env.registry.stats()
+
+    if args.cold_runs > 0:
+        # Per handler, probe the selected scenario doing the most AWS calls (its main path)
+        probes = {}
+        for scenario in scenarios:
+            calls = sum(report['scenarios'][scenario.name]['awsCallsPerRequest'].values())
+            if scenario.target not in probes or calls > probes[scenario.target][0]:
+                probes[scenario.target] = (calls, scenario.name)
+        for target, (_, name) in probes.items():
+            report['coldStart'][target] = measure_cold_start(config, target, name, args.cold_runs)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report['comparison'] = {
+            'baselineCommit': baseline.get('meta', {}).get('commit', ''),
+            'metrics': compare(report, baseline)
+        }
+        if args.max_regression is not None:
+            regressions = [row for row in report['comparison']['metrics'] if row['regressionPct'] > args.max_regression]
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f'Wrote {args.output}', file=sys.stderr)
+
+    for row in regressions:
+        print(f"REGRESSION {row['scenario']} {row['metric']}: {row['baseline']} -> {row['current']}"
+              f" ({row['regressionPct']:+}%)", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
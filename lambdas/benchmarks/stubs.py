@@ -0,0 +1,837 @@
+"""
+Offline stand-ins for the AWS clients used by the Lambda handlers and dev_api.
+
+Each stub sleeps for a latency drawn from a configurable distribution (blocking,
+like a boto3 call), optionally fails a fraction of calls with the service's
+throttling or internal-error ClientError, and answers with responses replayed
+from `fixtures/<service>.json`. `install()` routes boto3.client /
+boto3.resource (and Session equivalents) to the stubs, so handlers can be
+imported and exercised without credentials or network access.
+
+Fixture files map operation name to a list of recorded entries:
+
+    {"detect_faces": [{"response": {...}}, {"when": "Attributes", "response": {...}}]}
+
+An entry with `when` is used if that substring occurs in the JSON of the call
+arguments; otherwise entries without `when` are replayed round-robin. Record
+new fixtures against a real account with `install_recorder()`.
+
+DynamoDB, EC2 and ECS are stateful: tables keep what was written, and the
+instance/service move through pending -> running -> task placed on a clock, so
+wake/status flows behave like the real thing.
+"""
+
+import base64
+import copy
+import datetime
+import io
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Optional
+
+from botocore.exceptions import ClientError
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# service -> (throttling error code, internal error code), as the real APIs return them
+SERVICE_ERRORS = {
+    'bedrock-runtime': ('ThrottlingException', 'InternalServerException'),
+    'rekognition': ('ThrottlingException', 'InternalServerError'),
+    'personalize-runtime': ('ThrottlingException', 'InternalFailure'),
+    'dynamodb': ('ProvisionedThroughputExceededException', 'InternalServerError'),
+    'ec2': ('RequestLimitExceeded', 'InternalError'),
+    'ecs': ('ThrottlingException', 'ServerException'),
+}
+
+
+class Latency:
+    """Normal-ish latency in milliseconds, clipped at zero. `scale` stretches every sample."""
+
+    def __init__(self, mean_ms: float = 0.0, jitter_ms: float = 0.0, seed: Optional[int] = None):
+        self.mean_ms = mean_ms
+        self.jitter_ms = jitter_ms
+        self.scale = 1.0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _sample(self) -> float:
+        if not self.jitter_ms:
+            return self.mean_ms
+        return self._rng.gauss(self.mean_ms, self.jitter_ms)
+
+    def sample_ms(self) -> float:
+        with self._lock:
+            return max(0.0, self._sample()) * self.scale
+
+    def wait(self):
+        delay = self.sample_ms()
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    @staticmethod
+    def parse(spec: Any, seed: Optional[int] = None) -> 'Latency':
+        """
+        Build a distribution from a spec string (or a number, meaning fixed):
+
+            40                    fixed 40 ms
+            normal:40,10          mean 40, standard deviation 10
+            lognormal:40,250      p50 40, p99 250 (long tail, like most AWS APIs)
+            uniform:10,50         anywhere between 10 and 50
+            empirical:12,15,40    resample recorded latencies (or a JSON file of them)
+        """
+        if isinstance(spec, (int, float)):
+            return Latency(float(spec), seed=seed)
+        kind, _, params = str(spec).partition(':')
+        if not params:
+            return Latency(float(kind), seed=seed)
+        if kind == 'empirical':
+            if os.path.exists(params):
+                with open(params) as f:
+                    return EmpiricalLatency([float(v) for v in json.load(f)], seed=seed)
+            return EmpiricalLatency([float(v) for v in params.split(',')], seed=seed)
+        values = [float(v) for v in params.split(',')]
+        if kind == 'normal':
+            return Latency(values[0], values[1] if len(values) > 1 else 0.0, seed=seed)
+        if kind == 'lognormal':
+            return LogNormalLatency(values[0], values[1], seed=seed)
+        if kind == 'uniform':
+            return UniformLatency(values[0], values[1], seed=seed)
+        raise ValueError(f'Unknown latency distribution {spec!r}')
+
+
+class LogNormalLatency(Latency):
+    """Log-normal latency fitted to a median and a 99th percentile."""
+
+    Z99 = 2.3263
+
+    def __init__(self, p50_ms: float, p99_ms: float, seed: Optional[int] = None):
+        super().__init__(p50_ms, seed=seed)
+        self.mu = math.log(max(p50_ms, 1e-6))
+        self.sigma = max(0.0, math.log(max(p99_ms, p50_ms, 1e-6) / max(p50_ms, 1e-6)) / self.Z99)
+
+    def _sample(self) -> float:
+        return self._rng.lognormvariate(self.mu, self.sigma)
+
+
+class UniformLatency(Latency):
+    def __init__(self, low_ms: float, high_ms: float, seed: Optional[int] = None):
+        super().__init__((low_ms + high_ms) / 2, seed=seed)
+        self.low_ms = low_ms
+        self.high_ms = high_ms
+
+    def _sample(self) -> float:
+        return self._rng.uniform(self.low_ms, self.high_ms)
+
+
+class EmpiricalLatency(Latency):
+    """Resamples latencies observed in production (e.g. exported from X-Ray or CloudWatch)."""
+
+    def __init__(self, samples_ms: list[float], seed: Optional[int] = None):
+        if not samples_ms:
+            raise ValueError('Empirical latency needs at least one sample')
+        super().__init__(sum(samples_ms) / len(samples_ms), seed=seed)
+        self.samples_ms = list(samples_ms)
+
+    def _sample(self) -> float:
+        return self._rng.choice(self.samples_ms)
+
+
+class Faults:
+    """Fraction of calls that fail with a throttling or an internal-error ClientError."""
+
+    def __init__(self, throttle_rate: float = 0.0, error_rate: float = 0.0, seed: Optional[int] = None):
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self) -> Optional[str]:
+        """'throttle', 'error' or None for this call."""
+        if not self.throttle_rate and not self.error_rate:
+            return None
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.throttle_rate:
+            return 'throttle'
+        if roll < self.throttle_rate + self.error_rate:
+            return 'error'
+        return None
+
+
+def client_error(service: str, operation: str, kind: str) -> ClientError:
+    throttle_code, error_code = SERVICE_ERRORS.get(service, ('ThrottlingException', 'InternalFailure'))
+    code = throttle_code if kind == 'throttle' else error_code
+    status = 400 if kind == 'throttle' else 500
+    return ClientError(
+        {
+            'Error': {'Code': code, 'Message': 'Rate exceeded' if kind == 'throttle' else 'Internal error'},
+            'ResponseMetadata': {'HTTPStatusCode': status}
+        },
+        operation
+    )
+
+
+def _pascal(operation: str) -> str:
+    return ''.join(part.capitalize() for part in operation.split('_'))
+
+
+def load_fixtures(service: str, fixtures_dir: str = FIXTURES_DIR) -> dict[str, list[dict]]:
+    path = os.path.join(fixtures_dir, f'{service}.json')
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+class StubClient:
+    """
+    Base stub: latency, injected faults, call counters and fixture replay.
+
+    With `max_concurrency`, calls beyond that many in flight are throttled,
+    like a service quota being exhausted.
+    """
+
+    service = 'stub'
+
+    def __init__(
+        self,
+        latency: Optional[Latency] = None,
+        max_concurrency: int = 0,
+        faults: Optional[Faults] = None,
+        fixtures: Optional[dict[str, list[dict]]] = None
+    ):
+        self.latency = latency or Latency()
+        self.max_concurrency = max_concurrency
+        self.faults = faults or Faults()
+        self.fixtures = load_fixtures(self.service) if fixtures is None else fixtures
+        self.calls = 0
+        self.throttled = 0
+        self.errors = 0
+        self.inflight = 0
+        self.operations: dict[str, int] = {}
+        self._cursor: dict[str, int] = {}
+        self._state_lock = threading.Lock()
+
+    def _call(self, operation: str = 'call'):
+        with self._state_lock:
+            self.calls += 1
+            self.operations[operation] = self.operations.get(operation, 0) + 1
+            if self.max_concurrency and self.inflight >= self.max_concurrency:
+                self.throttled += 1
+                raise client_error(self.service, _pascal(operation), 'throttle')
+            self.inflight += 1
+        try:
+            self.latency.wait()
+        finally:
+            with self._state_lock:
+                self.inflight -= 1
+        fault = self.faults.draw()
+        if fault:
+            with self._state_lock:
+                if fault == 'throttle':
+                    self.throttled += 1
+                else:
+                    self.errors += 1
+            raise client_error(self.service, _pascal(operation), fault)
+
+    def _replay(self, operation: str, kwargs: dict) -> dict:
+        entries = self.fixtures.get(operation)
+        if not entries:
+            raise NotImplementedError(f'No recorded {self.service}.{operation} responses in {FIXTURES_DIR}')
+        conditional = [entry for entry in entries if entry.get('when')]
+        if conditional:
+            request = json.dumps(kwargs, default=str)
+            for entry in conditional:
+                if entry['when'] in request:
+                    return copy.deepcopy(entry['response'])
+        fallback = [entry for entry in entries if not entry.get('when')] or entries
+        with self._state_lock:
+            index = self._cursor.get(operation, 0)
+            self._cursor[operation] = index + 1
+        return copy.deepcopy(fallback[index % len(fallback)]['response'])
+
+    def __getattr__(self, operation: str) -> Callable[..., dict]:
+        if operation.startswith('_') or operation not in self.__dict__.get('fixtures', {}):
+            raise AttributeError(operation)
+
+        def call(**kwargs) -> dict:
+            self._call(operation)
+            return self._replay(operation, kwargs)
+
+        return call
+
+    def stats(self) -> dict:
+        return {'calls': self.calls, 'throttled': self.throttled, 'errors': self.errors, 'operations': dict(self.operations)}
+
+
+SKIN_ANALYSIS = {
+    'skin_type': 'Combination',
+    'concerns': [{'name': 'Hyperpigmentation', 'severity': 'medium'}],
+    'recommendations': ['Use SPF 50 daily', 'Add a vitamin C serum in the morning'],
+    'overall_score': 78,
+    'details': {'hydration': 65, 'oiliness': 55, 'sensitivity': 30, 'texture': 72, 'pores': 60}
+}
+
+
+class StubBedrockRuntime(StubClient):
+    """
+    Replays recorded model responses; `text` pins the completion text instead.
+
+    `output_token_ms` adds generation time per output token on top of `latency`
+    (scaled like it), for comparing calls whose completions differ in length.
+    """
+
+    service = 'bedrock-runtime'
+
+    def __init__(
+        self,
+        latency: Optional[Latency] = None,
+        text: Optional[str] = None,
+        max_concurrency: int = 0,
+        faults: Optional[Faults] = None,
+        fixtures: Optional[dict[str, list[dict]]] = None,
+        output_token_ms: float = 0.0
+    ):
+        super().__init__(latency, max_concurrency, faults, fixtures)
+        self.text = text
+        self.output_token_ms = output_token_ms
+        if not self.fixtures.get('invoke_model'):
+            self.text = self.text or json.dumps(SKIN_ANALYSIS)
+
+    def invoke_model(self, **kwargs) -> dict:
+        self._call('invoke_model')
+        request = json.loads(kwargs.get('body') or '{}')
+        if self.text is not None:
+            body = {
+                'content': [{'type': 'text', 'text': self.text}],
+                'usage': {
+                    'input_tokens': len(json.dumps(request.get('messages', []))) // 4,
+                    'output_tokens': len(self.text) // 4
+                },
+                'stop_reason': 'end_turn'
+            }
+            response = {'contentType': 'application/json'}
+        else:
+            response = self._replay('invoke_model', request)
+            body = response.pop('body')
+        if self.output_token_ms:
+            time.sleep(body.get('usage', {}).get('output_tokens', 0) * self.output_token_ms * self.latency.scale / 1000)
+        response['body'] = io.BytesIO(json.dumps(body).encode('utf-8'))
+        return response
+
+
+class StubRekognition(StubClient):
+    service = 'rekognition'
+
+
+class StubPersonalizeRuntime(StubClient):
+    """Replays a recorded item list, trimmed to `numResults`."""
+
+    service = 'personalize-runtime'
+
+    def get_recommendations(self, **kwargs) -> dict:
+        self._call('get_recommendations')
+        response = self._replay('get_recommendations', kwargs)
+        response['itemList'] = response.get('itemList', [])[:int(kwargs.get('numResults', 25))]
+        response['recommendationId'] = f"RID-{kwargs.get('userId') or kwargs.get('itemId') or ''}"
+        return response
+
+
+KEY_ATTRIBUTES = ('session_id', 'id', 'feed', 'seq', 'pk', 'sk')
+
+
+class StubTable:
+    """In-memory DynamoDB Table (resource API) keyed on the known key attributes."""
+
+    def __init__(self, name: str, owner: 'StubDynamoDBResource'):
+        self.name = name
+        self.owner = owner
+        self.items: dict[Any, dict] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(key: dict) -> tuple:
+        return tuple(sorted(key.items()))
+
+    def get_item(self, Key: dict, **kwargs) -> dict:
+        self.owner._call('get_item')
+        with self._lock:
+            item = self.items.get(self._key(Key))
+        return {'Item': copy.deepcopy(item)} if item else {}
+
+    def put_item(self, Item: dict, **kwargs) -> dict:
+        self.owner._call('put_item')
+        key = {k: Item[k] for k in KEY_ATTRIBUTES if k in Item}
+        with self._lock:
+            self.items[self._key(key)] = copy.deepcopy(Item)
+        return {}
+
+    def query(self, **kwargs) -> dict:
+        self.owner._call('query')
+        return {'Items': [], 'Count': 0}
+
+
+class StubDynamoDBResource(StubClient):
+    service = 'dynamodb'
+
+    def __init__(self, latency: Optional[Latency] = None, faults: Optional[Faults] = None):
+        super().__init__(latency, faults=faults, fixtures={})
+        self.tables: dict[str, StubTable] = {}
+        self._lock = threading.Lock()
+
+    def Table(self, name: str) -> StubTable:
+        with self._lock:
+            if name not in self.tables:
+                self.tables[name] = StubTable(name, self)
+            return self.tables[name]
+
+    def batch_write_item(self, RequestItems: dict, **kwargs) -> dict:
+        self._call('batch_write_item')
+        for name, requests in RequestItems.items():
+            table = self.Table(name)
+            with table._lock:
+                for request in requests:
+                    key = {k: v for k, v in request['PutRequest']['Item'].items() if k in KEY_ATTRIBUTES}
+                    if any(v == '' or v is None or isinstance(v, (dict, list, bool)) for v in key.values()):
+                        # Like DynamoDB, one invalid key fails the whole call and writes nothing
+                        raise ClientError({
+                            'Error': {'Code': 'ValidationException', 'Message': 'Invalid key attribute value'},
+                            'ResponseMetadata': {'HTTPStatusCode': 400}
+                        }, 'BatchWriteItem')
+                for request in requests:
+                    item = request['PutRequest']['Item']
+                    key = {k: item[k] for k in KEY_ATTRIBUTES if k in item}
+                    table.items[table._key(key)] = copy.deepcopy(item)
+        return {'UnprocessedItems': {}}
+
+
+class StubDynamoDBClient(StubClient):
+    """In-memory low-level DynamoDB client (typed attribute values), as dev_api uses."""
+
+    service = 'dynamodb'
+
+    def __init__(self, latency: Optional[Latency] = None, faults: Optional[Faults] = None):
+        super().__init__(latency, faults=faults, fixtures={})
+        self.tables: dict[str, dict[tuple, dict]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(item: dict) -> tuple:
+        return tuple(sorted((k, json.dumps(v, sort_keys=True)) for k, v in item.items() if k in KEY_ATTRIBUTES))
+
+    def get_item(self, TableName: str, Key: dict, **kwargs) -> dict:
+        self._call('get_item')
+        with self._lock:
+            item = self.tables.get(TableName, {}).get(self._key(Key))
+        return {'Item': copy.deepcopy(item)} if item else {}
+
+    def put_item(self, TableName: str, Item: dict, **kwargs) -> dict:
+        self._call('put_item')
+        with self._lock:
+            self.tables.setdefault(TableName, {})[self._key(Item)] = copy.deepcopy(Item)
+        return {}
+
+    def update_item(
+        self,
+        TableName: str,
+        Key: dict,
+        UpdateExpression: str,
+        ExpressionAttributeNames: Optional[dict] = None,
+        ExpressionAttributeValues: Optional[dict] = None,
+        ConditionExpression: Optional[str] = None,
+        ReturnValues: str = 'NONE',
+        **kwargs
+    ) -> dict:
+        """
+        The subset of update expressions the handlers use: SET a = :v,
+        SET a = if_not_exists(a, :v), ADD a :n (numbers), REMOVE a, and the
+        conditions attribute_exists(a) / attribute_not_exists(a).
+        """
+        self._call('update_item')
+        names = ExpressionAttributeNames or {}
+        values = ExpressionAttributeValues or {}
+
+        def name(path: str) -> str:
+            return names.get(path.strip(), path.strip())
+
+        with self._lock:
+            table = self.tables.setdefault(TableName, {})
+            current = table.get(self._key(Key))
+            if ConditionExpression:
+                function, path = re.fullmatch(r'\s*(attribute_exists|attribute_not_exists)\((.+)\)\s*', ConditionExpression).groups()
+                if (name(path) in (current or {})) != (function == 'attribute_exists'):
+                    raise ClientError({
+                        'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'The conditional request failed'},
+                        'ResponseMetadata': {'HTTPStatusCode': 400}
+                    }, 'UpdateItem')
+            item = copy.deepcopy(current) if current else copy.deepcopy(Key)
+            touched = set()
+            parts = re.split(r'\b(SET|ADD|REMOVE)\b', UpdateExpression)
+            for action, clauses in zip(parts[1::2], parts[2::2]):
+                for clause in _split_clauses(clauses):
+                    if action == 'REMOVE':
+                        touched.add(name(clause))
+                        item.pop(name(clause), None)
+                    elif action == 'ADD':
+                        path, value = clause.split()
+                        target = name(path)
+                        total = Decimal(item.get(target, {'N': '0'})['N']) + Decimal(values[value]['N'])
+                        item[target] = {'N': str(total)}
+                        touched.add(target)
+                    else:
+                        path, expression = (part.strip() for part in clause.split('=', 1))
+                        target = name(path)
+                        fallback = re.fullmatch(r'if_not_exists\((.+),\s*(:\w+)\)', expression)
+                        if fallback:
+                            if name(fallback.group(1)) not in item:
+                                item[target] = values[fallback.group(2)]
+                        else:
+                            item[target] = values[expression]
+                        touched.add(target)
+            table[self._key(Key)] = item
+        response = {}
+        if ReturnValues == 'ALL_NEW':
+            response['Attributes'] = copy.deepcopy(item)
+        elif ReturnValues == 'ALL_OLD' and current:
+            response['Attributes'] = copy.deepcopy(current)
+        elif ReturnValues == 'UPDATED_OLD' and current:
+            response['Attributes'] = {k: copy.deepcopy(v) for k, v in current.items() if k in touched}
+        return response
+
+
+def _split_clauses(text: str) -> list[str]:
+    """Split update expression clauses on commas outside parentheses."""
+    clauses, depth, start = [], 0, 0
+    for index, char in enumerate(text):
+        depth += {'(': 1, ')': -1}.get(char, 0)
+        if char == ',' and depth == 0:
+            clauses.append(text[start:index].strip())
+            start = index + 1
+    clauses.append(text[start:].strip())
+    return [clause for clause in clauses if clause]
+
+
+SETTLED_SEC = 24 * 3600
+
+
+class StubEC2(StubClient):
+    """
+    One instance that really starts and stops: `start_instances` moves it to
+    pending and, `boot_sec` later, running. describe_instances replays the
+    recorded instance with the current state patched in.
+    """
+
+    service = 'ec2'
+    STATE_CODES = {'pending': 0, 'running': 16, 'stopping': 64, 'stopped': 80}
+
+    def __init__(
+        self,
+        latency: Optional[Latency] = None,
+        faults: Optional[Faults] = None,
+        boot_sec: float = 40.0,
+        stop_sec: float = 20.0,
+        initial_state: str = 'stopped',
+        clock: Callable[[], float] = time.monotonic
+    ):
+        super().__init__(latency, faults=faults)
+        self.boot_sec = boot_sec
+        self.stop_sec = stop_sec
+        self.clock = clock
+        self._target = 'running' if initial_state in ('pending', 'running') else 'stopped'
+        # Settled states started long ago, so tasks are already placed on a running instance
+        self._since = clock() - SETTLED_SEC if initial_state in ('running', 'stopped') else clock()
+        self.starts = 0
+
+    def state(self) -> str:
+        elapsed = self.clock() - self._since
+        if self._target == 'running':
+            return 'running' if elapsed >= self.boot_sec else 'pending'
+        return 'stopped' if elapsed >= self.stop_sec else 'stopping'
+
+    def running_since(self) -> Optional[float]:
+        """Clock time the instance became running, or None."""
+        return self._since + self.boot_sec if self.state() == 'running' else None
+
+    def _transition(self, target: str) -> tuple[str, str]:
+        with self._state_lock:
+            previous = self.state()
+            if self._target != target:
+                self._target = target
+                self._since = self.clock()
+                self.starts += target == 'running'
+            return previous, self.state()
+
+    def describe_instances(self, **kwargs) -> dict:
+        self._call('describe_instances')
+        response = self._replay('describe_instances', kwargs)
+        state = self.state()
+        for reservation in response.get('Reservations', []):
+            for instance in reservation.get('Instances', []):
+                instance['InstanceId'] = (kwargs.get('InstanceIds') or [instance.get('InstanceId')])[0]
+                instance['State'] = {'Code': self.STATE_CODES[state], 'Name': state}
+        return response
+
+    def _change(self, operation: str, target: str, kwargs: dict) -> dict:
+        self._call(operation)
+        previous, current = self._transition(target)
+        key = 'StartingInstances' if target == 'running' else 'StoppingInstances'
+        return {key: [{
+            'InstanceId': instance_id,
+            'CurrentState': {'Code': self.STATE_CODES[current], 'Name': current},
+            'PreviousState': {'Code': self.STATE_CODES[previous], 'Name': previous}
+        } for instance_id in kwargs.get('InstanceIds', [])]}
+
+    def start_instances(self, **kwargs) -> dict:
+        return self._change('start_instances', 'running', kwargs)
+
+    def stop_instances(self, **kwargs) -> dict:
+        return self._change('stop_instances', 'stopped', kwargs)
+
+
+class StubECS(StubClient):
+    """
+    One service on the stub instance: tasks are placed `placement_sec` after
+    both the desired count is raised and the instance is running.
+    """
+
+    service = 'ecs'
+
+    def __init__(
+        self,
+        ec2: StubEC2,
+        latency: Optional[Latency] = None,
+        faults: Optional[Faults] = None,
+        placement_sec: float = 25.0,
+        desired_count: int = 0
+    ):
+        super().__init__(latency, faults=faults)
+        self.ec2 = ec2
+        self.placement_sec = placement_sec
+        self.desired_count = desired_count
+        self._desired_since = ec2.clock() - SETTLED_SEC
+
+    def running_count(self) -> int:
+        running_since = self.ec2.running_since()
+        if not self.desired_count or running_since is None:
+            return 0
+        if self.ec2.clock() - max(running_since, self._desired_since) < self.placement_sec:
+            return 0
+        return self.desired_count
+
+    def describe_services(self, **kwargs) -> dict:
+        self._call('describe_services')
+        response = self._replay('describe_services', kwargs)
+        for service in response.get('services', []):
+            service['desiredCount'] = self.desired_count
+            service['runningCount'] = self.running_count()
+            service['pendingCount'] = self.desired_count - service['runningCount']
+        return response
+
+    def update_service(self, **kwargs) -> dict:
+        self._call('update_service')
+        desired = int(kwargs.get('desiredCount', self.desired_count))
+        with self._state_lock:
+            if desired != self.desired_count:
+                self.desired_count = desired
+                self._desired_since = self.ec2.clock()
+        return {'service': {'serviceName': kwargs.get('service'), 'desiredCount': desired, 'status': 'ACTIVE'}}
+
+
+class StubUpstream:
+    """
+    Local HTTP server standing in for the Magento backend behind the Elastic IP:
+    `/graphql` replays `fixtures/upstream.json`, anything else is a health check
+    (answered after `health_latency`, 503 while `healthy()` is false).
+    """
+
+    def __init__(
+        self,
+        latency: Optional[Latency] = None,
+        healthy: Callable[[], bool] = lambda: True,
+        health_latency: Optional[Latency] = None
+    ):
+        self.latency = latency or Latency()
+        self.health_latency = health_latency or Latency()
+        self.healthy = healthy
+        self.requests = 0
+        self.response = json.dumps(load_fixtures('upstream').get('graphql', [{}])[0].get('response', {})).encode('utf-8')
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _reply(self, status: int, body: bytes):
+                self.send_response(status)
+                self.send_header('content-type', 'application/json')
+                self.send_header('content-length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                stub.requests += 1
+                stub.health_latency.wait()
+                self._reply(200 if stub.healthy() else 503, b'{}')
+
+            def do_POST(self):
+                stub.requests += 1
+                self.rfile.read(int(self.headers.get('content-length') or 0))
+                stub.latency.wait()
+                self._reply(200, stub.response)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def address(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'{host}:{port}'
+
+    def start(self) -> 'StubUpstream':
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class StubRegistry:
+    """
+    Hands out one stub per service so call counts and state are shared.
+    `latencies` / `faults` are keyed by service name.
+    """
+
+    def __init__(
+        self,
+        latencies: Optional[dict[str, Latency]] = None,
+        faults: Optional[dict[str, Faults]] = None,
+        clock: Callable[[], float] = time.monotonic,
+        ec2_state: str = 'stopped'
+    ):
+        latencies = latencies or {}
+        faults = faults or {}
+        ec2 = StubEC2(latencies.get('ec2'), faults.get('ec2'), initial_state=ec2_state, clock=clock)
+        self.clients: dict[str, Any] = {
+            'bedrock-runtime': StubBedrockRuntime(latencies.get('bedrock-runtime'), faults=faults.get('bedrock-runtime')),
+            'rekognition': StubRekognition(latencies.get('rekognition'), faults=faults.get('rekognition')),
+            'personalize-runtime': StubPersonalizeRuntime(
+                latencies.get('personalize-runtime'), faults=faults.get('personalize-runtime')
+            ),
+            'dynamodb': StubDynamoDBClient(latencies.get('dynamodb'), faults.get('dynamodb')),
+            'ec2': ec2,
+            'ecs': StubECS(
+                ec2, latencies.get('ecs'), faults.get('ecs'),
+                desired_count=1 if ec2_state in ('pending', 'running') else 0
+            ),
+        }
+        self.resources: dict[str, Any] = {
+            'dynamodb': StubDynamoDBResource(latencies.get('dynamodb'), faults.get('dynamodb')),
+        }
+
+    def client(self, service: str, *args, **kwargs) -> Any:
+        if service not in self.clients:
+            self.clients[service] = StubClient(Latency())
+        return self.clients[service]
+
+    def resource(self, service: str, *args, **kwargs) -> Any:
+        if service not in self.resources:
+            raise ValueError(f'No stub resource for {service}')
+        return self.resources[service]
+
+    def stats(self) -> dict:
+        stubs = {**self.clients, **{f'{name} (resource)': r for name, r in self.resources.items()}}
+        return {name: stub.stats() for name, stub in stubs.items() if stub.calls}
+
+
+def install(registry: Optional[StubRegistry] = None) -> StubRegistry:
+    """Route boto3 client/resource creation to stubs for the rest of the process."""
+    import boto3
+    import boto3.session
+
+    registry = registry or StubRegistry()
+    boto3.client = registry.client
+    boto3.resource = registry.resource
+    boto3.session.Session.client = lambda self, service, *a, **kw: registry.client(service)
+    boto3.session.Session.resource = lambda self, service, *a, **kw: registry.resource(service)
+    return registry
+
+
+def _to_fixture(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _to_fixture(v) for k, v in value.items() if k != 'ResponseMetadata'}
+    if isinstance(value, list):
+        return [_to_fixture(v) for v in value]
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode('ascii')
+    return value
+
+
+class RecordingClient:
+    """Wraps a real boto3 client and appends every response to its fixture file on `save()`."""
+
+    def __init__(self, client: Any, service: str, fixtures_dir: str = FIXTURES_DIR):
+        self._client = client
+        self._service = service
+        self._fixtures_dir = fixtures_dir
+        self._recorded: dict[str, list[dict]] = {}
+
+    def __getattr__(self, operation: str) -> Any:
+        method = getattr(self._client, operation)
+        if not callable(method) or operation.startswith(('get_paginator', 'get_waiter', 'can_paginate')):
+            return method
+
+        def call(**kwargs) -> Any:
+            response = method(**kwargs)
+            recorded = dict(response)
+            if hasattr(response.get('body'), 'read'):  # Bedrock StreamingBody: record and re-wrap
+                raw = response['body'].read()
+                recorded['body'] = json.loads(raw)
+                response['body'] = io.BytesIO(raw)
+            self._recorded.setdefault(operation, []).append({'response': _to_fixture(recorded)})
+            return response
+
+        return call
+
+    def save(self):
+        fixtures = load_fixtures(self._service, self._fixtures_dir)
+        for operation, entries in self._recorded.items():
+            fixtures.setdefault(operation, []).extend(entries)
+        os.makedirs(self._fixtures_dir, exist_ok=True)
+        with open(os.path.join(self._fixtures_dir, f'{self._service}.json'), 'w') as f:
+            json.dump(fixtures, f, indent=2)
+        self._recorded.clear()
+
+
+def install_recorder(fixtures_dir: str = FIXTURES_DIR) -> list[RecordingClient]:
+    """
+    Wrap every boto3 client created from now on in a RecordingClient. Call
+    `save()` on the returned clients after exercising a handler against a
+    real (dev) account to refresh the fixtures.
+    """
+    import boto3
+
+    real_client = boto3.client
+    recorders: list[RecordingClient] = []
+
+    def client(service: str, *args, **kwargs) -> RecordingClient:
+        recorder = RecordingClient(real_client(service, *args, **kwargs), service, fixtures_dir)
+        recorders.append(recorder)
+        return recorder
+
+    boto3.client = client
+    return recorders
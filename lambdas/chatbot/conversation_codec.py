@@ -0,0 +1,253 @@
+"""
+Compact binary storage format for chatbot conversation history.
+
+Instead of a DynamoDB list of maps with `role`/`content`/`timestamp` strings,
+the history is stored as one Binary attribute (`messages_bin`):
+
+    byte 0        format version (FORMAT_VERSION)
+    byte 1        compression (0 = none, 1 = zlib, 2 = zstd)
+    rest          payload, compressed as indicated
+
+Payload (varints are unsigned LEB128, signed values zigzag-encoded):
+
+    varint        message count
+    zigzag varint base timestamp, microseconds since epoch (first timestamped message)
+    per message:
+      byte        flags: bits 0-2 role code, bits 3-4 timestamp mode,
+                  bit 5 custom role string follows, bit 6 extra JSON fields follow
+      [varint len + utf-8]   custom role (bit 5)
+      [zigzag varint]        timestamp delta in microseconds from the previous one (mode 1)
+      [varint len + utf-8]   raw timestamp string (mode 2)
+      varint len + utf-8     content
+      [varint len + utf-8]   JSON object of any other fields (bit 6)
+
+Items written before this format only have the `messages` list; `decode_item`
+reads both, so existing sessions migrate on their next save.
+"""
+
+import json
+import os
+import zlib
+from datetime import datetime, timedelta
+from typing import Any
+
+try:
+    import zstandard  # Optional dependency, only needed for CONVERSATION_COMPRESSION=zstd
+except ImportError:  # pragma: no cover - depends on the deployment package
+    zstandard = None
+
+FORMAT_VERSION = 1
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_ZSTD = 2
+
+BINARY_ATTRIBUTE = 'messages_bin'
+LEGACY_ATTRIBUTE = 'messages'
+
+CONVERSATION_CODEC = os.environ.get('CONVERSATION_CODEC', 'binary')  # binary | json
+# zstd is opt-in: every reader must have `zstandard` installed before writers switch to it
+COMPRESSION = os.environ.get('CONVERSATION_COMPRESSION', 'zlib')  # zlib | zstd | none
+COMPRESS_MIN_BYTES = int(os.environ.get('CONVERSATION_COMPRESS_MIN_BYTES', '256'))
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+ROLES = ('user', 'assistant', 'system')
+ROLE_CODES = {role: code for code, role in enumerate(ROLES)}
+ROLE_CUSTOM = 7
+
+TS_NONE = 0
+TS_DELTA = 1
+TS_RAW = 2
+
+FLAG_CUSTOM_ROLE = 1 << 5
+FLAG_EXTRA = 1 << 6
+
+KNOWN_FIELDS = ('role', 'content', 'timestamp')
+EPOCH = datetime(1970, 1, 1)
+
+
+def _write_varint(out: bytearray, value: int):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    byte = data[pos]
+    if byte < 0x80:  # Fast path: lengths/deltas below 128 are one byte
+        return byte, pos + 1
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) if value >= 0 else ((-value << 1) - 1)
+
+
+def _unzigzag(value: int) -> int:
+    return (value >> 1) if not value & 1 else -((value + 1) >> 1)
+
+
+def _write_str(out: bytearray, value: str):
+    encoded = value.encode('utf-8')
+    _write_varint(out, len(encoded))
+    out += encoded
+
+
+def _read_str(data: bytes, pos: int) -> tuple[str, int]:
+    length, pos = _read_varint(data, pos)
+    end = pos + length
+    return data[pos:end].decode('utf-8'), end
+
+
+def _timestamp_micros(value: Any) -> Any:
+    """Epoch microseconds for an isoformat() timestamp that round-trips exactly, else None."""
+    if not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None or parsed.isoformat() != value:
+        return None
+    delta = parsed - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _timestamp_string(micros: int) -> str:
+    return (EPOCH + timedelta(microseconds=micros)).isoformat()
+
+
+def encode_messages(messages: list[dict]) -> bytes:
+    """Serialize (and compress) a message list."""
+    micros = [_timestamp_micros(message.get('timestamp')) for message in messages]
+    base = next((m for m in micros if m is not None), 0)
+
+    out = bytearray()
+    _write_varint(out, len(messages))
+    _write_varint(out, _zigzag(base))
+
+    previous = base
+    for message, ts in zip(messages, micros):
+        role = message.get('role', '')
+        code = ROLE_CODES.get(role, ROLE_CUSTOM)
+        flags = code
+        if code == ROLE_CUSTOM:
+            flags |= FLAG_CUSTOM_ROLE
+
+        timestamp = message.get('timestamp')
+        if ts is not None:
+            flags |= TS_DELTA << 3
+        elif timestamp is not None:
+            flags |= TS_RAW << 3
+
+        extra = {k: v for k, v in message.items() if k not in KNOWN_FIELDS}
+        if extra:
+            flags |= FLAG_EXTRA
+
+        out.append(flags)
+        if flags & FLAG_CUSTOM_ROLE:
+            _write_str(out, str(role))
+        if ts is not None:
+            _write_varint(out, _zigzag(ts - previous))
+            previous = ts
+        elif timestamp is not None:
+            _write_str(out, str(timestamp))
+        _write_str(out, str(message.get('content', '')))
+        if extra:
+            _write_str(out, json.dumps(extra, separators=(',', ':'), default=str))
+
+    return _compress(bytes(out))
+
+
+def decode_messages(blob: bytes) -> list[dict]:
+    """Inverse of `encode_messages`."""
+    data = _decompress(bytes(blob))
+    count, pos = _read_varint(data, 0)
+    base, pos = _read_varint(data, pos)
+    previous = _unzigzag(base)
+
+    messages = []
+    timestamp_cache = (None, None)
+    for _ in range(count):
+        flags = data[pos]
+        pos += 1
+
+        if flags & FLAG_CUSTOM_ROLE:
+            role, pos = _read_str(data, pos)
+        else:
+            role = ROLES[flags & 0x07]
+
+        message = {'role': role}
+        ts_mode = (flags >> 3) & 0x03
+        if ts_mode == TS_DELTA:
+            delta, pos = _read_varint(data, pos)
+            previous += _unzigzag(delta)
+            # A user message and its reply usually share one timestamp
+            if timestamp_cache[0] != previous:
+                timestamp_cache = (previous, _timestamp_string(previous))
+            timestamp = timestamp_cache[1]
+        elif ts_mode == TS_RAW:
+            timestamp, pos = _read_str(data, pos)
+        else:
+            timestamp = None
+
+        message['content'], pos = _read_str(data, pos)
+        if timestamp is not None:
+            message['timestamp'] = timestamp
+        if flags & FLAG_EXTRA:
+            extra, pos = _read_str(data, pos)
+            message.update(json.loads(extra))
+        messages.append(message)
+    return messages
+
+
+def _compress(payload: bytes) -> bytes:
+    if len(payload) >= COMPRESS_MIN_BYTES:
+        if COMPRESSION == 'zstd' and zstandard is not None:
+            compressed = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(payload)
+            if len(compressed) < len(payload):
+                return bytes((FORMAT_VERSION, COMPRESSION_ZSTD)) + compressed
+        elif COMPRESSION in ('zlib', 'zstd'):
+            compressed = zlib.compress(payload, ZLIB_LEVEL)
+            if len(compressed) < len(payload):
+                return bytes((FORMAT_VERSION, COMPRESSION_ZLIB)) + compressed
+    return bytes((FORMAT_VERSION, COMPRESSION_NONE)) + payload
+
+
+def _decompress(blob: bytes) -> bytes:
+    if len(blob) < 2 or blob[0] != FORMAT_VERSION:
+        raise ValueError(f'Unsupported conversation format {blob[:1]!r}')
+    method, payload = blob[1], blob[2:]
+    if method == COMPRESSION_NONE:
+        return payload
+    if method == COMPRESSION_ZLIB:
+        return zlib.decompress(payload)
+    if method == COMPRESSION_ZSTD:
+        if zstandard is None:
+            raise ValueError('zstd-compressed conversation but zstandard is not installed')
+        return zstandard.ZstdDecompressor().decompress(payload)
+    raise ValueError(f'Unknown compression {method}')
+
+
+def decode_item(item: dict) -> list[dict]:
+    """Messages from a stored item in either the binary or the legacy list format."""
+    blob = item.get(BINARY_ATTRIBUTE)
+    if blob is not None:
+        # boto3 resources return Binary wrappers; the low-level client returns bytes
+        return decode_messages(getattr(blob, 'value', blob))
+    return list(item.get(LEGACY_ATTRIBUTE, []))
+
+
+def encode_item(messages: list[dict]) -> dict:
+    """Attributes to store for a message list, in the configured format."""
+    if CONVERSATION_CODEC == 'json':
+        return {LEGACY_ATTRIBUTE: messages}
+    return {BINARY_ATTRIBUTE: encode_messages(messages), 'codec': f'v{FORMAT_VERSION}'}
@@ -6,10 +6,16 @@ Provides skincare advice and product recommendations through conversational AI.
 import json
 import boto3
 import os
+from botocore.exceptions import ClientError
 from typing import Any, Optional
 from datetime import datetime
 from dataclasses import dataclass, asdict
 
+import admission
+import conversation_codec
+import instrumentation
+import write_behind
+
 # Initialize AWS clients
 bedrock = boto3.client('bedrock-runtime')
 dynamodb = boto3.resource('dynamodb')
@@ -18,6 +24,19 @@ dynamodb = boto3.resource('dynamodb')
 MODEL_ID = os.environ.get('BEDROCK_MODEL_ID', 'anthropic.claude-3-sonnet-20240229-v1:0')
 CONVERSATIONS_TABLE = os.environ.get('CONVERSATIONS_TABLE', 'dermastore-conversations')
 MAX_TOKENS = 1024
+CONVERSATION_TTL_SEC = 7 * 24 * 60 * 60  # 7 days
+# 'sync' writes history before replying; 'behind' replies first and persists from a
+# background queue (one long-lived process per session only, see write_behind.py)
+CONVERSATION_WRITE_MODE = os.environ.get('CONVERSATION_WRITE_MODE', 'sync').lower()
+MAX_SESSION_ID_LENGTH = 256
+# DynamoDB errors worth retrying; any other client error (validation, size) fails the same way every time
+RETRYABLE_ERROR_CODES = {
+    'ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded',
+    'InternalServerError', 'ServiceUnavailable'
+}
+
+# Per-session and per-IP token buckets (see shared/admission.py); chat is interactive priority
+limiter = admission.from_env('CHAT', admission.INTERACTIVE, rate=0.5, burst=6)
 
 # System prompt for the skincare assistant
 SYSTEM_PROMPT = """You are Derma, an expert AI skincare assistant for Dermastore, South Africa's leading online skincare retailer. Your role is to:
@@ -48,14 +67,63 @@ class ConversationMessage:
     timestamp: str
 
 
+def _write_batch(batch: list[tuple[str, dict]]) -> list[str]:
+    """BatchWriteItem for the write-behind queue; returns the session ids left unprocessed."""
+    response = dynamodb.batch_write_item(RequestItems={
+        CONVERSATIONS_TABLE: [{'PutRequest': {'Item': item}} for _, item in batch]
+    })
+    unprocessed = response.get('UnprocessedItems', {}).get(CONVERSATIONS_TABLE, [])
+    return [request['PutRequest']['Item']['session_id'] for request in unprocessed]
+
+
+def _permanent_error(error: Exception) -> bool:
+    """Client errors other than throttling and 5xx; network errors are retried."""
+    if not isinstance(error, ClientError):
+        return False
+    code = error.response.get('Error', {}).get('Code', '')
+    status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+    return code not in RETRYABLE_ERROR_CODES and status < 500
+
+
+def _conversation_writer() -> Optional[write_behind.WriteBehind]:
+    if CONVERSATION_WRITE_MODE != 'behind':
+        return None
+    if os.environ.get('AWS_LAMBDA_RUNTIME_API'):
+        # A frozen or recycled container would silently drop queued writes
+        print('CONVERSATION_WRITE_MODE=behind is not supported in Lambda, writing synchronously')
+        return None
+    if int(os.environ.get('SERVICE_WORKERS', '1')) > 1:
+        # The queued history is only visible to this process. A session's next turn on
+        # another worker would read a stale history, and its snapshot would overwrite this one.
+        print('CONVERSATION_WRITE_MODE=behind needs a single service worker, writing synchronously')
+        return None
+    return write_behind.WriteBehind(_write_batch, name='conversation-writer', permanent=_permanent_error)
+
+
+conversation_writer = _conversation_writer()
+
+
+def drain(timeout_sec: float = 10.0) -> bool:
+    """Persist queued conversation writes (service mode calls this on shutdown)."""
+    return conversation_writer.drain(timeout_sec) if conversation_writer else True
+
+
 def get_conversation_history(session_id: str) -> list[dict]:
-    """Retrieve conversation history from DynamoDB."""
+    """Retrieve conversation history, preferring a write still queued in this process."""
+    if conversation_writer:
+        pending = conversation_writer.pending(session_id)
+        instrumentation.cache('conversation-writer', hit=pending is not None)
+        if pending is not None:
+            return list(pending)
     try:
         table = dynamodb.Table(CONVERSATIONS_TABLE)
-        response = table.get_item(Key={'session_id': session_id})
+        with instrumentation.span('dynamodb', 'GetItem') as span:
+            response = table.get_item(Key={'session_id': session_id})
+            blob = response.get('Item', {}).get(conversation_codec.BINARY_ATTRIBUTE)
+            span.set(ResponseBytes=len(getattr(blob, 'value', blob) or b''))
         
         if 'Item' in response:
-            return response['Item'].get('messages', [])
+            return conversation_codec.decode_item(response['Item'])
         return []
     except Exception as e:
         print(f'DynamoDB error: {str(e)}')
@@ -63,15 +131,23 @@ def get_conversation_history(session_id: str) -> list[dict]:
 
 
 def save_conversation(session_id: str, messages: list[dict]):
-    """Save conversation history to DynamoDB."""
+    """Save conversation history to DynamoDB, or queue it when writing behind."""
     try:
-        table = dynamodb.Table(CONVERSATIONS_TABLE)
-        table.put_item(Item={
+        encoded = conversation_codec.encode_item(messages)
+        now = datetime.utcnow()
+        item = {
             'session_id': session_id,
-            'messages': messages,
-            'updated_at': datetime.utcnow().isoformat(),
-            'ttl': int(datetime.utcnow().timestamp()) + (7 * 24 * 60 * 60)  # 7 days
-        })
+            **encoded,
+            'updated_at': now.isoformat(),
+            'ttl': int(now.timestamp()) + CONVERSATION_TTL_SEC
+        }
+        if conversation_writer and conversation_writer.submit(session_id, list(messages), item):
+            instrumentation.metric('ConversationWritesDeferred')
+            return
+        table = dynamodb.Table(CONVERSATIONS_TABLE)
+        with instrumentation.span('dynamodb', 'PutItem') as span:
+            table.put_item(Item=item)
+            span.set(RequestBytes=len(encoded.get(conversation_codec.BINARY_ATTRIBUTE, b'')))
     except Exception as e:
         print(f'DynamoDB save error: {str(e)}')
 
@@ -108,20 +184,30 @@ def generate_response(
     })
     
     try:
-        response = bedrock.invoke_model(
-            modelId=MODEL_ID,
-            body=body,
-            contentType='application/json'
-        )
-        
-        response_body = json.loads(response['body'].read())
+        with instrumentation.span('bedrock', 'InvokeModel') as span:
+            response = bedrock.invoke_model(
+                modelId=MODEL_ID,
+                body=body,
+                contentType='application/json'
+            )
+            raw = response['body'].read()
+            response_body = json.loads(raw)
+            usage = response_body.get('usage', {})
+            span.set(
+                RequestBytes=len(body),
+                ResponseBytes=len(raw),
+                InputTokens=usage.get('input_tokens', 0),
+                OutputTokens=usage.get('output_tokens', 0)
+            )
         return response_body['content'][0]['text']
         
     except Exception as e:
         print(f'Bedrock error: {str(e)}')
+        instrumentation.metric('FallbackResponses')
         return "I apologize, but I'm having trouble processing your request right now. Please try again in a moment, or contact our customer support team for assistance."
 
 
+@instrumentation.instrument('chatbot')
 def lambda_handler(event: dict, context: Any) -> dict:
     """
     Main Lambda handler for chatbot.
@@ -155,6 +241,18 @@ def lambda_handler(event: dict, context: Any) -> dict:
         session_id = body.get('sessionId', 'default')
         user_context = body.get('context', {})  # Optional skin profile, etc.
         
+        if not isinstance(session_id, str) or not session_id.strip() or len(session_id) > MAX_SESSION_ID_LENGTH:
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({
+                    'error': f'sessionId must be a non-empty string of at most {MAX_SESSION_ID_LENGTH} characters'
+                })
+            }
+        
         if not message:
             return {
                 'statusCode': 400,
@@ -167,11 +265,23 @@ def lambda_handler(event: dict, context: Any) -> dict:
                 })
             }
         
-        # Get conversation history
-        history = get_conversation_history(session_id)
+        client_keys = [f'ip:{admission.source_ip(event)}']
+        if 'sessionId' in body:
+            # Without one every request shares session 'default'; only the IP tells those clients apart
+            client_keys.insert(0, f'session:{session_id}')
+        decision = limiter.admit(client_keys)
+        if not decision.allowed:
+            instrumentation.metric('AdmissionRejected')
+            return admission.throttled_response(decision)
         
-        # Generate response
-        ai_response = generate_response(message, history, user_context)
+        try:
+            # Get conversation history
+            history = get_conversation_history(session_id)
+            
+            # Generate response
+            ai_response = generate_response(message, history, user_context)
+        finally:
+            limiter.release(decision)
         
         # Update conversation history
         timestamp = datetime.utcnow().isoformat()
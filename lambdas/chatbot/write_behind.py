@@ -0,0 +1,208 @@
+"""
+Write-behind queue for conversation snapshots.
+
+`save_conversation` can hand the new history to a `WriteBehind` queue and return
+the chat reply without waiting for DynamoDB. A background thread then persists
+queued snapshots in `BatchWriteItem` batches of up to 25.
+
+Each write is a full snapshot of a session, so:
+
+- Per-session ordering: at most one write per session is in flight. A newer
+  snapshot that arrives meanwhile replaces the queued one (latest wins), so an
+  older snapshot can never land after a newer one.
+- Read-your-writes: `pending(session_id)` returns the newest snapshot that is
+  queued or in flight. The next turn in the same process reads that instead of
+  the table.
+- No loss on errors: throttled, unprocessed or failed writes are re-queued and
+  retried with capped exponential backoff, unless a newer snapshot has
+  superseded them. Errors that retrying cannot fix (`permanent`, e.g. a
+  ValidationException for a bad key) fail the whole batch call, so such a
+  batch is written again item by item; only the bad items are dropped. `submit` refuses new sessions when `max_pending` is reached,
+  so the caller can write synchronously instead. `drain()` flushes what is left
+  at shutdown.
+
+Only use this in a long-lived process (service mode). Lambda freezes the
+container as soon as the handler returns, and may discard it without notice.
+Read-your-writes also only holds within the process: all turns of a session
+must reach the same one. With several workers or tasks, a turn served
+elsewhere reads a stale history, and its full snapshot overwrites the one
+queued here, which loses a turn. Synchronous writes do not have this problem.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Optional
+
+MAX_BATCH = 25  # BatchWriteItem limit
+
+
+class WriteBehind:
+    """
+    Latest-wins, per-key write queue drained by one daemon thread.
+
+    `write_batch` receives [(key, payload), ...] (distinct keys, at most
+    `max_batch`) and returns the keys that were not written. Raising counts
+    the whole batch as failed: it is retried with backoff, or, when
+    `permanent(error)` says retrying cannot help, split into single writes so
+    the offending keys are found and dropped.
+    """
+
+    def __init__(
+        self,
+        write_batch: Callable[[list[tuple[str, Any]]], list[str]],
+        max_batch: int = MAX_BATCH,
+        max_pending: int = 10000,
+        retry_base_sec: float = 0.05,
+        retry_max_sec: float = 5.0,
+        name: str = 'write-behind',
+        permanent: Callable[[Exception], bool] = lambda error: False
+    ):
+        self.write_batch = write_batch
+        self.max_batch = max(1, min(max_batch, MAX_BATCH))
+        self.max_pending = max_pending
+        self.retry_base_sec = retry_base_sec
+        self.retry_max_sec = retry_max_sec
+        self.name = name
+        self.permanent = permanent
+        # key -> (snapshot, payload); insertion order is write order
+        self._queued: dict[str, tuple[Any, Any]] = {}
+        self._inflight: dict[str, tuple[Any, Any]] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._failures = 0
+        self._retry_at = 0.0
+        self.submitted = 0
+        self.superseded = 0
+        self.written = 0
+        self.batches = 0
+        self.retries = 0
+        self.dropped = 0
+
+    def submit(self, key: str, snapshot: Any, payload: Any) -> bool:
+        """
+        Queue `payload` for `key`, replacing any queued, not yet written one.
+        `snapshot` is what `pending()` hands back for reads. Returns False,
+        queueing nothing, if the queue is full and `key` has nothing pending.
+        The caller must then write synchronously. Because the key has no
+        older write in the queue, the synchronous write cannot be overtaken.
+        """
+        with self._cond:
+            if key in self._queued:
+                self.superseded += 1
+            elif key not in self._inflight and len(self._queued) + len(self._inflight) >= self.max_pending:
+                return False
+            self._queued.pop(key, None)  # move to the back: newest write goes last
+            self._queued[key] = (snapshot, payload)
+            self.submitted += 1
+            self._ensure_thread()
+            self._cond.notify()
+        return True
+
+    def pending(self, key: str) -> Optional[Any]:
+        """Newest snapshot for `key` that is not yet known to be persisted."""
+        with self._cond:
+            entry = self._queued.get(key) or self._inflight.get(key)
+        return entry[0] if entry else None
+
+    def backlog(self) -> int:
+        with self._cond:
+            return len(self._queued) + len(self._inflight)
+
+    def drain(self, timeout_sec: float = 10.0) -> bool:
+        """Wait until everything submitted is written (retries included); False on timeout."""
+        deadline = time.monotonic() + timeout_sec
+        with self._cond:
+            self._retry_at = 0.0  # shutting down: don't sit out the backoff
+            self._cond.notify_all()
+            while self._queued or self._inflight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print(f'{self.name}: {len(self._queued) + len(self._inflight)} writes not drained')
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                'submitted': self.submitted,
+                'superseded': self.superseded,
+                'written': self.written,
+                'batches': self.batches,
+                'retries': self.retries,
+                'dropped': self.dropped,
+                'backlog': len(self._queued) + len(self._inflight)
+            }
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _next_batch(self) -> list[tuple[str, Any]]:
+        """Caller holds the lock. Moves up to max_batch writable keys to in-flight."""
+        batch = []
+        for key in list(self._queued):
+            if key in self._inflight:  # its previous write is still out
+                continue
+            entry = self._queued.pop(key)
+            self._inflight[key] = entry
+            batch.append((key, entry[1]))
+            if len(batch) == self.max_batch:
+                break
+        return batch
+
+    def _write(self, batch: list[tuple[str, Any]]) -> tuple[set[str], set[str]]:
+        """Write one batch; returns (keys to retry, keys dropped for good)."""
+        with self._cond:
+            self.batches += 1
+        try:
+            return set(self.write_batch(batch)), set()
+        except Exception as e:
+            if not self.permanent(e):
+                print(f'{self.name}: batch write error: {str(e)}')
+                return {key for key, _ in batch}, set()
+            if len(batch) == 1:
+                print(f'{self.name}: dropping write for {batch[0][0]!r}: {str(e)}')
+                return set(), {batch[0][0]}
+        # A permanent error fails the whole call: isolate the offending items
+        failed, dropped = set(), set()
+        for entry in batch:
+            entry_failed, entry_dropped = self._write([entry])
+            failed |= entry_failed
+            dropped |= entry_dropped
+        return failed, dropped
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    wait = self._retry_at - time.monotonic()
+                    batch = self._next_batch() if wait <= 0 else []
+                    if batch:
+                        break
+                    self._cond.wait(wait if wait > 0 else None)
+
+            failed, dropped = self._write(batch)
+
+            with self._cond:
+                for key, _ in batch:
+                    entry = self._inflight.pop(key)
+                    if key in dropped:
+                        self.dropped += 1
+                    elif key not in failed:
+                        self.written += 1
+                    elif key in self._queued:
+                        self.superseded += 1  # a newer snapshot replaces the failed one
+                    else:
+                        # To the back: a key that keeps failing must not hold up the others.
+                        # Per-key order is safe, nothing newer for this key is queued.
+                        self._queued[key] = entry
+                        self.retries += 1
+                if failed:
+                    self._failures += 1
+                    backoff = min(self.retry_max_sec, self.retry_base_sec * 2 ** (self._failures - 1))
+                    self._retry_at = time.monotonic() + backoff
+                else:
+                    self._failures = 0
+                self._cond.notify_all()
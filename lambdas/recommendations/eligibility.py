@@ -0,0 +1,448 @@
+"""
+In-Lambda availability and eligibility filtering for recommendation results.
+
+Every catalog item gets a dense ordinal; stock, lifecycle, store and category
+eligibility are kept as bitsets indexed by that ordinal. A request combines the
+relevant bitsets once (cached per store/category until the next change) and then
+tests each over-fetched Personalize result with a single byte lookup.
+
+Changes arrive incrementally from a feed table (hash key `feed`, numeric range
+key `seq`). Each record carries the fields that changed:
+
+    {"feed": "items", "seq": 1042, "itemId": "SKU-1", "inStock": false}
+    {"feed": "items", "seq": 1043, "itemId": "SKU-2", "discontinued": true}
+    {"feed": "items", "seq": 1044, "itemId": "SKU-3", "stores": ["CPT", "JHB"], "category": "serum", "brand": "Environ"}
+
+`stores` restricts an item to the listed stores (an empty list lifts the
+restriction). Items the index has never seen are treated as eligible (unless a
+category is requested) so new products are not hidden while the feed catches up.
+
+A cold start does not replay the feed from the beginning. It loads a compacted
+snapshot (the bitsets plus the feed cursor they include), downloaded from
+ELIGIBILITY_SNAPSHOT_S3_URI or shipped in the deployment package. Only the
+records after that cursor are then queried, at most ELIGIBILITY_MAX_PAGES pages
+per request until the index has caught up. Rebuild the snapshot regularly so
+the catch-up stays short:
+
+    python eligibility.py snapshot --table dermastore-eligibility-feed --base eligibility.snapshot.gz --out eligibility.snapshot.gz
+    python eligibility.py inspect eligibility.snapshot.gz
+
+In service mode one index serves concurrent requests. Reads and feed updates
+take the index lock; one thread at a time runs a refresh, and the others keep
+filtering against the current state instead of waiting for DynamoDB.
+"""
+
+import argparse
+import base64
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Iterable, Optional
+
+import instrumentation
+import offline_store
+
+ELIGIBILITY_FEED_TABLE = os.environ.get('ELIGIBILITY_FEED_TABLE', '')
+ELIGIBILITY_FEED_NAME = os.environ.get('ELIGIBILITY_FEED_NAME', 'items')
+ELIGIBILITY_REFRESH_SEC = int(os.environ.get('ELIGIBILITY_REFRESH_SEC', '30'))
+ELIGIBILITY_MAX_PAGES = int(os.environ.get('ELIGIBILITY_MAX_PAGES', '2'))
+ELIGIBILITY_SNAPSHOT_PATH = os.environ.get('ELIGIBILITY_SNAPSHOT_PATH', '/tmp/eligibility.snapshot.gz')
+ELIGIBILITY_SNAPSHOT_S3_URI = os.environ.get('ELIGIBILITY_SNAPSHOT_S3_URI', '')
+PACKAGED_SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'eligibility.snapshot.gz')
+SNAPSHOT_FORMAT = 1
+OVERFETCH_FACTOR = int(os.environ.get('RECOMMENDATIONS_OVERFETCH_FACTOR', '3'))
+MAX_FETCH = 100
+MAX_CACHED_MASKS = 256
+
+
+class Bitset:
+    """Growable bitset backed by a bytearray."""
+
+    __slots__ = ('bits',)
+
+    def __init__(self, size: int = 0):
+        self.bits = bytearray((size + 7) // 8)
+
+    def _ensure(self, ordinal: int):
+        needed = (ordinal >> 3) + 1
+        if needed > len(self.bits):
+            self.bits.extend(bytes(max(needed - len(self.bits), len(self.bits))))
+
+    def add(self, ordinal: int):
+        self._ensure(ordinal)
+        self.bits[ordinal >> 3] |= 1 << (ordinal & 7)
+
+    def discard(self, ordinal: int):
+        if (ordinal >> 3) < len(self.bits):
+            self.bits[ordinal >> 3] &= ~(1 << (ordinal & 7)) & 0xFF
+
+    def set(self, ordinal: int, value: bool):
+        if value:
+            self.add(ordinal)
+        else:
+            self.discard(ordinal)
+
+    def __contains__(self, ordinal: int) -> bool:
+        index = ordinal >> 3
+        return index < len(self.bits) and bool(self.bits[index] & (1 << (ordinal & 7)))
+
+    def to_int(self) -> int:
+        return int.from_bytes(self.bits, 'little')
+
+    def count(self) -> int:
+        return self.to_int().bit_count()
+
+
+class EligibilityIndex:
+    """Bitset index of which items may be shown, refreshed from a change feed."""
+
+    def __init__(self):
+        self.ordinals: dict[str, int] = {}
+        self.brands: list[Optional[str]] = []
+        self.in_stock = Bitset()
+        self.discontinued = Bitset()
+        self.restricted = Bitset()
+        self.stores: dict[str, Bitset] = {}
+        self.categories: dict[str, Bitset] = {}
+        self.item_categories: list[Optional[str]] = []
+        self.cursor = 0
+        self.version = 0
+        self.last_refresh = 0.0
+        self.caught_up = False
+        self._masks: dict[tuple, tuple[int, bytearray]] = {}
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ordinals)
+
+    def ordinal(self, item_id: str) -> int:
+        ordinal = self.ordinals.get(item_id)
+        if ordinal is None:
+            ordinal = self.ordinals[item_id] = len(self.ordinals)
+            self.brands.append(None)
+            self.item_categories.append(None)
+            self.in_stock.add(ordinal)
+        return ordinal
+
+    def apply_change(self, change: dict):
+        """Apply one feed record. Fields that are absent are left unchanged. Caller holds the lock."""
+        ordinal = self.ordinal(str(change['itemId']))
+
+        if 'inStock' in change:
+            self.in_stock.set(ordinal, bool(change['inStock']))
+        if 'discontinued' in change:
+            self.discontinued.set(ordinal, bool(change['discontinued']))
+        if 'stores' in change:
+            stores = change['stores'] or []
+            self.restricted.set(ordinal, bool(stores))
+            for store_id, bitset in self.stores.items():
+                if store_id not in stores:
+                    bitset.discard(ordinal)
+            for store_id in stores:
+                self.stores.setdefault(store_id, Bitset()).add(ordinal)
+        if 'category' in change:
+            previous = self.item_categories[ordinal]
+            if previous is not None:
+                self.categories[previous].discard(ordinal)
+            category = change['category']
+            self.item_categories[ordinal] = category
+            if category is not None:
+                self.categories.setdefault(category, Bitset()).add(ordinal)
+        if 'brand' in change:
+            self.brands[ordinal] = change['brand']
+
+        self.cursor = max(self.cursor, int(change.get('seq', 0)))
+        self.version += 1
+
+    def apply_changes(self, changes: Iterable[dict]) -> int:
+        applied = 0
+        with self._lock:
+            for change in changes:
+                self.apply_change(change)
+                applied += 1
+        return applied
+
+    def eligible_mask(self, store_id: Optional[str] = None, category: Optional[str] = None) -> bytearray:
+        """Combined eligibility bitset for a store/category, cached until the next change."""
+        with self._lock:
+            return self._eligible_mask(store_id, category)
+
+    def _eligible_mask(self, store_id: Optional[str], category: Optional[str]) -> bytearray:
+        cache_key = (store_id, category)
+        cached = self._masks.get(cache_key)
+        hit = bool(cached) and cached[0] == self.version
+        instrumentation.cache('eligibility-mask', hit=hit)
+        if hit:
+            return cached[1]
+
+        size = len(self.ordinals)
+        full = (1 << size) - 1
+        mask = self.in_stock.to_int() & ~self.discontinued.to_int() & full
+        if store_id is not None:
+            allowed = self.stores.get(store_id)
+            mask &= ~self.restricted.to_int() | (allowed.to_int() if allowed else 0)
+        if category is not None:
+            members = self.categories.get(category)
+            mask &= members.to_int() if members else 0
+
+        bits = bytearray(mask.to_bytes((size + 7) // 8, 'little'))
+        if len(self._masks) >= MAX_CACHED_MASKS:
+            self._masks.clear()
+        self._masks[cache_key] = (self.version, bits)
+        return bits
+
+    def filter(
+        self,
+        recommendations: list[dict],
+        num_results: int,
+        store_id: Optional[str] = None,
+        category: Optional[str] = None,
+        max_per_brand: int = 0
+    ) -> list[dict]:
+        """
+        Drop ineligible items and trim to `num_results`.
+        With `max_per_brand`, items beyond the per-brand cap are pushed behind the
+        rest (and only used if there are not enough other eligible items).
+        """
+        with self._lock:
+            return self._filter(recommendations, num_results, store_id, category, max_per_brand)
+
+    def _filter(
+        self,
+        recommendations: list[dict],
+        num_results: int,
+        store_id: Optional[str],
+        category: Optional[str],
+        max_per_brand: int
+    ) -> list[dict]:
+        if not self.ordinals:
+            return recommendations[:num_results]
+
+        mask = self._eligible_mask(store_id, category)
+        mask_len = len(mask)
+        ordinals = self.ordinals
+        eligible = []
+        for rec in recommendations:
+            ordinal = ordinals.get(rec['itemId'])
+            if ordinal is None:
+                if category is None:
+                    eligible.append(rec)
+                continue
+            if (ordinal >> 3) < mask_len and mask[ordinal >> 3] & (1 << (ordinal & 7)):
+                eligible.append(rec)
+
+        if max_per_brand <= 0:
+            return eligible[:num_results]
+        return self._diversify(eligible, num_results, max_per_brand)
+
+    def _diversify(self, recommendations: list[dict], num_results: int, max_per_brand: int) -> list[dict]:
+        selected, deferred = [], []
+        per_brand: dict[str, int] = {}
+        for rec in recommendations:
+            ordinal = self.ordinals.get(rec['itemId'])
+            brand = self.brands[ordinal] if ordinal is not None else None
+            if brand is not None:
+                if per_brand.get(brand, 0) >= max_per_brand:
+                    deferred.append(rec)
+                    continue
+                per_brand[brand] = per_brand.get(brand, 0) + 1
+            selected.append(rec)
+            if len(selected) == num_results:
+                return selected
+        return (selected + deferred)[:num_results]
+
+    def refresh(
+        self,
+        table: Any,
+        feed: str = ELIGIBILITY_FEED_NAME,
+        force: bool = False,
+        max_pages: Optional[int] = ELIGIBILITY_MAX_PAGES
+    ) -> int:
+        """
+        Pull feed records newer than `cursor` from a DynamoDB Table resource.
+
+        At most `max_pages` query pages are read (None reads to the end). While
+        the index is behind, the next call continues without waiting for
+        ELIGIBILITY_REFRESH_SEC. Returns 0 without waiting while another thread
+        is refreshing.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            return 0
+        try:
+            now = time.time()
+            if not force and self.caught_up and now - self.last_refresh < ELIGIBILITY_REFRESH_SEC:
+                return 0
+            self.last_refresh = now
+            return self._pull(table, feed, max_pages)
+        finally:
+            self._refresh_lock.release()
+
+    def _pull(self, table: Any, feed: str, max_pages: Optional[int]) -> int:
+        from boto3.dynamodb.conditions import Key
+
+        # Only the refreshing thread advances the cursor, so it is read without the index lock
+        applied, pages = 0, 0
+        params = {
+            'KeyConditionExpression': Key('feed').eq(feed) & Key('seq').gt(self.cursor),
+            'ScanIndexForward': True
+        }
+        while True:
+            with instrumentation.span('dynamodb', 'Query') as span:
+                response = table.query(**params)
+                span.set(Items=len(response.get('Items', [])))
+            applied += self.apply_changes(response.get('Items', []))
+            pages += 1
+            self.caught_up = 'LastEvaluatedKey' not in response
+            if self.caught_up or (max_pages is not None and pages >= max_pages):
+                return applied
+            params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def to_snapshot(self, feed: str = ELIGIBILITY_FEED_NAME) -> dict:
+        """Compacted state: one entry per item and the feed cursor it includes."""
+        with self._lock:
+            return {
+                'format': SNAPSHOT_FORMAT,
+                'feed': feed,
+                'cursor': self.cursor,
+                'builtAt': int(time.time()),
+                'items': list(self.ordinals),  # dicts preserve insertion order == ordinal order
+                'brands': list(self.brands),
+                'categories': list(self.item_categories),
+                'inStock': _encode_bits(self.in_stock),
+                'discontinued': _encode_bits(self.discontinued),
+                'restricted': _encode_bits(self.restricted),
+                'stores': {store_id: _encode_bits(bitset) for store_id, bitset in self.stores.items()}
+            }
+
+    @classmethod
+    def from_snapshot(cls, snapshot: dict) -> 'EligibilityIndex':
+        if snapshot.get('format') != SNAPSHOT_FORMAT:
+            raise ValueError(f"snapshot format {snapshot.get('format')}, expected {SNAPSHOT_FORMAT}")
+
+        index = cls()
+        index.ordinals = {item_id: ordinal for ordinal, item_id in enumerate(snapshot['items'])}
+        index.brands = list(snapshot['brands'])
+        index.item_categories = list(snapshot['categories'])
+        index.in_stock = _decode_bits(snapshot['inStock'])
+        index.discontinued = _decode_bits(snapshot['discontinued'])
+        index.restricted = _decode_bits(snapshot['restricted'])
+        index.stores = {store_id: _decode_bits(bits) for store_id, bits in snapshot['stores'].items()}
+        for ordinal, category in enumerate(index.item_categories):
+            if category is not None:
+                index.categories.setdefault(category, Bitset()).add(ordinal)
+        index.cursor = int(snapshot['cursor'])
+        return index
+
+    def save(self, path: str, feed: str = ELIGIBILITY_FEED_NAME) -> dict:
+        snapshot = self.to_snapshot(feed)
+        tmp_path = f'{path}.tmp'
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(snapshot, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+        return {'path': path, 'items': len(snapshot['items']), 'cursor': snapshot['cursor'], 'bytes': os.path.getsize(path)}
+
+
+def _encode_bits(bitset: Bitset) -> str:
+    return base64.b64encode(bytes(bitset.bits)).decode('ascii')
+
+
+def _decode_bits(encoded: str) -> Bitset:
+    bitset = Bitset()
+    bitset.bits = bytearray(base64.b64decode(encoded))
+    return bitset
+
+
+def read_snapshot(path: str) -> dict:
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+# -----------------------------------------------------------------------------
+# Runtime loading
+# -----------------------------------------------------------------------------
+
+_index: Optional[EligibilityIndex] = None
+_index_lock = threading.Lock()
+
+
+def _open_snapshot(path: str, feed: str) -> EligibilityIndex:
+    snapshot = read_snapshot(path)
+    if snapshot.get('feed') != feed:
+        raise ValueError(f"snapshot of feed {snapshot.get('feed')!r}, expected {feed!r}")
+    return EligibilityIndex.from_snapshot(snapshot)
+
+
+def load_index(feed: str = ELIGIBILITY_FEED_NAME) -> EligibilityIndex:
+    """
+    Start from the newest usable snapshot: ELIGIBILITY_SNAPSHOT_PATH (kept in
+    sync with ELIGIBILITY_SNAPSHOT_S3_URI like the offline store), then the
+    packaged file. Without one the index starts empty and catches up from the
+    start of the feed.
+    """
+    index = offline_store.open_first(
+        [ELIGIBILITY_SNAPSHOT_PATH, PACKAGED_SNAPSHOT_PATH],
+        ELIGIBILITY_SNAPSHOT_S3_URI,
+        lambda path: _open_snapshot(path, feed)
+    )
+    return index or EligibilityIndex()
+
+
+def get_index() -> EligibilityIndex:
+    """The container's index, loaded from the snapshot on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = load_index()
+    return _index
+
+
+def fetch_size(num_results: int) -> int:
+    """How many results to request upstream so enough survive filtering."""
+    return min(MAX_FETCH, max(num_results, num_results * OVERFETCH_FACTOR))
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Build or inspect an eligibility snapshot.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    snapshot_cmd = sub.add_parser('snapshot', help='Compact the feed into a snapshot')
+    snapshot_cmd.add_argument('--table', required=True, help='Feed table name')
+    snapshot_cmd.add_argument('--feed', default=ELIGIBILITY_FEED_NAME)
+    snapshot_cmd.add_argument('--base', help='Existing snapshot to extend (only newer records are read)')
+    snapshot_cmd.add_argument('--out', required=True, help='Output snapshot path')
+
+    inspect_cmd = sub.add_parser('inspect', help='Print the cursor and size of a snapshot')
+    inspect_cmd.add_argument('path')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'snapshot':
+        import boto3
+
+        index = EligibilityIndex()
+        if args.base and os.path.exists(args.base):
+            index = EligibilityIndex.from_snapshot(read_snapshot(args.base))
+        applied = index.refresh(boto3.resource('dynamodb').Table(args.table), args.feed, force=True, max_pages=None)
+        print(json.dumps({**index.save(args.out, args.feed), 'applied': applied}, indent=2))
+        return 0
+
+    snapshot = read_snapshot(args.path)
+    index = EligibilityIndex.from_snapshot(snapshot)
+    print(json.dumps({
+        'path': args.path,
+        'feed': snapshot['feed'],
+        'cursor': index.cursor,
+        'items': len(index),
+        'builtAt': snapshot['builtAt'],
+        'ageSeconds': int(time.time()) - snapshot['builtAt']
+    }, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,6 +9,10 @@ import os
 from typing import Any, Optional
 from datetime import datetime
 
+import eligibility
+import instrumentation
+import offline_store
+
 # Initialize AWS clients
 personalize_runtime = boto3.client('personalize-runtime')
 dynamodb = boto3.resource('dynamodb')
@@ -16,16 +20,32 @@ dynamodb = boto3.resource('dynamodb')
 # Configuration
 CAMPAIGN_ARN = os.environ.get('PERSONALIZE_CAMPAIGN_ARN', '')
 RECOMMENDATIONS_TABLE = os.environ.get('RECOMMENDATIONS_TABLE', 'dermastore-recommendations')
+ELIGIBILITY_FEED_TABLE = eligibility.ELIGIBILITY_FEED_TABLE
+
+# Load the eligibility snapshot during init, not on the first request
+if ELIGIBILITY_FEED_TABLE:
+    eligibility.get_index()
 
 
 def get_personalized_recommendations(
     user_id: str,
     num_results: int = 10,
-    filter_arn: Optional[str] = None
+    filter_arn: Optional[str] = None,
+    required: Optional[int] = None
 ) -> list[dict]:
     """
-    Get personalized recommendations for a user from Amazon Personalize.
+    Get personalized recommendations for a user.
+    Served from the precomputed offline store when the user was part of the
+    last batch inference run; Amazon Personalize is only called for cold/unknown
+    users or when a filter is requested (batch output is unfiltered).
+    `required` of the `num_results` must be served (see offline_store.lookup).
     """
+    if not filter_arn:
+        precomputed = offline_store.lookup_user(user_id, num_results, required)
+        instrumentation.cache('offline-store', hit=precomputed is not None)
+        if precomputed is not None:
+            return precomputed
+
     try:
         params = {
             'campaignArn': CAMPAIGN_ARN,
@@ -36,7 +56,9 @@ def get_personalized_recommendations(
         if filter_arn:
             params['filterArn'] = filter_arn
         
-        response = personalize_runtime.get_recommendations(**params)
+        with instrumentation.span('personalize', 'GetRecommendations') as span:
+            response = personalize_runtime.get_recommendations(**params)
+            span.set(Items=len(response.get('itemList', [])))
         
         return [
             {
@@ -52,17 +74,26 @@ def get_personalized_recommendations(
 
 def get_similar_items(
     item_id: str,
-    num_results: int = 10
+    num_results: int = 10,
+    required: Optional[int] = None
 ) -> list[dict]:
     """
     Get similar items based on a given product.
+    Uses the precomputed offline store first, then Amazon Personalize.
     """
+    precomputed = offline_store.lookup_item(item_id, num_results, required)
+    instrumentation.cache('offline-store', hit=precomputed is not None)
+    if precomputed is not None:
+        return precomputed
+
     try:
-        response = personalize_runtime.get_recommendations(
-            campaignArn=CAMPAIGN_ARN,
-            itemId=item_id,
-            numResults=num_results
-        )
+        with instrumentation.span('personalize', 'GetRecommendations') as span:
+            response = personalize_runtime.get_recommendations(
+                campaignArn=CAMPAIGN_ARN,
+                itemId=item_id,
+                numResults=num_results
+            )
+            span.set(Items=len(response.get('itemList', [])))
         
         return [
             {
@@ -121,6 +152,50 @@ def get_skin_based_recommendations(
     ]
 
 
+def refresh_eligibility() -> eligibility.EligibilityIndex:
+    """Apply any new inventory/eligibility changes (throttled inside the index)."""
+    index = eligibility.get_index()
+    if ELIGIBILITY_FEED_TABLE:
+        try:
+            index.refresh(dynamodb.Table(ELIGIBILITY_FEED_TABLE))
+        except Exception as e:
+            print(f'Eligibility refresh error: {str(e)}')
+    return index
+
+
+def fetch_size(num_results: int) -> int:
+    """
+    How many results to request upstream. Refreshes the index first and only
+    over-fetches when it has data, since an empty index cannot drop anything.
+    """
+    index = refresh_eligibility()
+    return eligibility.fetch_size(num_results) if len(index) else num_results
+
+
+def filter_recommendations(
+    recommendations: list[dict],
+    num_results: int,
+    query_params: dict
+) -> list[dict]:
+    """
+    Drop out-of-stock, discontinued and store/category-ineligible items from an
+    over-fetched result list, optionally limiting how many items share a brand.
+    The index was refreshed by `fetch_size` for this request.
+    """
+    index = eligibility.get_index()
+    with instrumentation.span('eligibility', 'Filter') as span:
+        eligible = index.filter(
+            recommendations,
+            num_results,
+            store_id=query_params.get('storeId'),
+            category=query_params.get('category'),
+            max_per_brand=int(query_params.get('maxPerBrand', 0))
+        )
+        span.set(Candidates=len(recommendations), Dropped=len(recommendations) - len(eligible))
+    return eligible
+
+
+@instrumentation.instrument('recommendations')
 def lambda_handler(event: dict, context: Any) -> dict:
     """
     Main Lambda handler for product recommendations.
@@ -129,6 +204,9 @@ def lambda_handler(event: dict, context: Any) -> dict:
     - GET /recommendations?userId=xxx - Get personalized recommendations
     - GET /recommendations/similar?itemId=xxx - Get similar products
     - POST /recommendations/skin-analysis - Get recommendations based on skin analysis
+
+    Both GET endpoints accept optional storeId, category and maxPerBrand
+    parameters; results are over-fetched and filtered for eligibility locally.
     """
     try:
         # Parse request
@@ -155,7 +233,11 @@ def lambda_handler(event: dict, context: Any) -> dict:
                 return error_response(400, 'itemId parameter required')
             
             num_results = int(query_params.get('limit', 10))
-            recommendations = get_similar_items(item_id, num_results)
+            recommendations = filter_recommendations(
+                get_similar_items(item_id, fetch_size(num_results), required=num_results),
+                num_results,
+                query_params
+            )
             
         elif 'skin-analysis' in path and http_method == 'POST':
             # Skin-based recommendations
@@ -172,7 +254,11 @@ def lambda_handler(event: dict, context: Any) -> dict:
             # Default personalized recommendations
             user_id = query_params.get('userId', 'anonymous')
             num_results = int(query_params.get('limit', 10))
-            recommendations = get_personalized_recommendations(user_id, num_results)
+            recommendations = filter_recommendations(
+                get_personalized_recommendations(user_id, fetch_size(num_results), required=num_results),
+                num_results,
+                query_params
+            )
         
         return {
             'statusCode': 200,
@@ -0,0 +1,503 @@
+"""
+Precomputed recommendation store compiled from Amazon Personalize batch inference output.
+
+Batch inference jobs write JSON Lines such as:
+
+    {"input": {"userId": "42"}, "output": {"recommendedItems": ["a", "b"], "scores": [0.9, 0.4]}, "error": null}
+
+`compile_batch_output` turns those lines into a single binary file that is
+memory-mapped at runtime. Keys (`u:<userId>` / `i:<itemId>`) are stored sorted
+by a stable 64-bit hash so a lookup is one binary search plus a fixed-width read
+of the top-N item ordinals and float32 scores - no JSON parsing and no
+Personalize call.
+
+File layout (little-endian, every section 8-byte aligned):
+
+    header        64 bytes (see HEADER)
+    key_hashes    uint64[num_keys]          sorted ascending
+    key_offsets   uint32[num_keys + 1]      into key_blob
+    counts        uint16[num_keys]          valid entries per row
+    ordinals      uint32[num_keys * top_n]  into item table, padded with EMPTY_ORDINAL
+    scores        float32[num_keys * top_n]
+    item_offsets  uint32[num_items + 1]     into item_blob
+    key_blob      utf-8 keys
+    item_blob     utf-8 item ids
+
+Usage:
+    python offline_store.py compile batch-output/*.jsonl --out recommendations.dsrs
+    python offline_store.py inspect recommendations.dsrs
+"""
+
+import argparse
+import bisect
+import glob
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+MAGIC = b'DSRS'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHIIQ40s')  # magic, version, top_n, num_keys, num_items, built_at, label
+EMPTY_ORDINAL = 0xFFFFFFFF
+DEFAULT_TOP_N = 25
+
+USER_PREFIX = 'u:'
+ITEM_PREFIX = 'i:'
+
+# Runtime configuration
+OFFLINE_STORE_PATH = os.environ.get('OFFLINE_STORE_PATH', '/tmp/recommendations.dsrs')
+OFFLINE_STORE_S3_URI = os.environ.get('OFFLINE_STORE_S3_URI', '')
+OFFLINE_STORE_MAX_AGE_SEC = int(os.environ.get('OFFLINE_STORE_MAX_AGE_SEC', str(2 * 24 * 60 * 60)))
+OFFLINE_STORE_CHECK_SEC = int(os.environ.get('OFFLINE_STORE_CHECK_SEC', '600'))
+PACKAGED_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'recommendations.dsrs')
+
+T = TypeVar('T')
+
+
+def key_hash(key: str) -> int:
+    """Stable 64-bit hash of a store key (Python's hash() is salted per process)."""
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _padding(size: int) -> bytes:
+    return b'\0' * (-size % 8)
+
+
+def _le_bytes(values: array) -> bytes:
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class OfflineStore:
+    """Read-only view over a compiled store file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.source = (path, stat.st_ino, stat.st_mtime_ns)
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mmap) < HEADER.size:
+            raise ValueError(f'{path}: file too small for header')
+        magic, version, top_n, num_keys, num_items, built_at, label = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path}: not a recommendation store')
+        if version != FORMAT_VERSION:
+            raise ValueError(f'{path}: format version {version}, expected {FORMAT_VERSION}')
+        if sys.byteorder != 'little':
+            raise ValueError('Offline store can only be memory-mapped on little-endian hosts')
+
+        self.version = version
+        self.top_n = top_n
+        self.num_keys = num_keys
+        self.num_items = num_items
+        self.built_at = built_at
+        self.label = label.rstrip(b'\0').decode('utf-8')
+
+        view = self._view = memoryview(self._mmap)
+        offset = HEADER.size
+
+        def section(count: int, fmt: str, width: int) -> memoryview:
+            nonlocal offset
+            size = count * width
+            data = view[offset:offset + size].cast(fmt)
+            offset += size + (-size % 8)
+            return data
+
+        self._hashes = section(num_keys, 'Q', 8)
+        self._key_offsets = section(num_keys + 1, 'I', 4)
+        self._counts = section(num_keys, 'H', 2)
+        self._ordinals = section(num_keys * top_n, 'I', 4)
+        self._scores = section(num_keys * top_n, 'f', 4)
+        self._item_offsets = section(num_items + 1, 'I', 4)
+        self._key_blob = view[offset:offset + self._key_offsets[num_keys]]
+        offset += self._key_offsets[num_keys]
+        self._item_blob = view[offset:offset + self._item_offsets[num_items]]
+
+    def age_seconds(self, now: Optional[float] = None) -> float:
+        return (now if now is not None else time.time()) - self.built_at
+
+    def is_fresh(self, max_age_sec: int = OFFLINE_STORE_MAX_AGE_SEC, now: Optional[float] = None) -> bool:
+        """A store older than `max_age_sec` is ignored so stale batches fall back to realtime."""
+        return max_age_sec <= 0 or self.age_seconds(now) <= max_age_sec
+
+    def _find(self, key: str) -> int:
+        h = key_hash(key)
+        encoded = key.encode('utf-8')
+        row = bisect.bisect_left(self._hashes, h)
+        # Rows are sorted by (hash, key); walk the (almost always single) collision run.
+        while row < self.num_keys and self._hashes[row] == h:
+            start, end = self._key_offsets[row], self._key_offsets[row + 1]
+            if self._key_blob[start:end] == encoded:
+                return row
+            row += 1
+        return -1
+
+    def item_id(self, ordinal: int) -> str:
+        start, end = self._item_offsets[ordinal], self._item_offsets[ordinal + 1]
+        return bytes(self._item_blob[start:end]).decode('utf-8')
+
+    def lookup(self, key: str, num_results: int = 10, required: Optional[int] = None) -> Optional[list[dict]]:
+        """
+        Return up to `num_results` `[{'itemId', 'score'}, ...]` for a key, or
+        None if it was not precomputed.
+
+        `required` is how many the caller actually needs (default: all of
+        `num_results`), e.g. the limit before an eligibility over-fetch. The
+        rest is best-effort. When more than `top_n` are required and the row was
+        cut to `top_n` at compile time, this also returns None: a short answer
+        would look complete, so the caller falls back to realtime instead.
+        """
+        row = self._find(key)
+        if row < 0:
+            return None
+        required = num_results if required is None else required
+        if required > self.top_n and self._counts[row] >= self.top_n:
+            return None
+
+        base = row * self.top_n
+        count = min(self._counts[row], num_results)
+        return [
+            {
+                'itemId': self.item_id(self._ordinals[base + i]),
+                'score': round(self._scores[base + i], 6)
+            }
+            for i in range(count)
+        ]
+
+    def lookup_user(self, user_id: str, num_results: int = 10, required: Optional[int] = None) -> Optional[list[dict]]:
+        return self.lookup(USER_PREFIX + user_id, num_results, required)
+
+    def lookup_item(self, item_id: str, num_results: int = 10, required: Optional[int] = None) -> Optional[list[dict]]:
+        return self.lookup(ITEM_PREFIX + item_id, num_results, required)
+
+    def keys(self) -> Iterator[str]:
+        for row in range(self.num_keys):
+            start, end = self._key_offsets[row], self._key_offsets[row + 1]
+            yield bytes(self._key_blob[start:end]).decode('utf-8')
+
+    def close(self):
+        for name in ('_hashes', '_key_offsets', '_counts', '_ordinals', '_scores',
+                     '_item_offsets', '_key_blob', '_item_blob', '_view'):
+            getattr(self, name).release()
+        self._mmap.close()
+
+
+# -----------------------------------------------------------------------------
+# Compilation
+# -----------------------------------------------------------------------------
+
+def parse_batch_line(line: str) -> Optional[tuple[str, list[str], list[float]]]:
+    """Parse one batch inference record into (key, item ids, scores); None for errors/blank lines."""
+    line = line.strip()
+    if not line:
+        return None
+
+    record = json.loads(line)
+    if record.get('error'):
+        return None
+
+    source = record.get('input') or {}
+    if source.get('userId'):
+        key = USER_PREFIX + str(source['userId'])
+    elif source.get('itemId'):
+        key = ITEM_PREFIX + str(source['itemId'])
+    else:
+        return None
+
+    output = record.get('output') or {}
+    items = [str(item) for item in output.get('recommendedItems') or []]
+    scores = [float(score) for score in output.get('scores') or []]
+    # Some recipes omit scores; keep the ranking order as a descending pseudo-score.
+    if len(scores) < len(items):
+        scores.extend(1.0 - (i / max(len(items), 1)) for i in range(len(scores), len(items)))
+    return key, items, scores[:len(items)]
+
+
+def compile_records(
+    records: Iterable[tuple[str, list[str], list[float]]],
+    out_path: str,
+    top_n: int = DEFAULT_TOP_N,
+    label: str = '',
+    built_at: Optional[int] = None
+) -> dict:
+    """Write a store file from (key, items, scores) records. Later records for a key win."""
+    rows: dict[str, tuple[list[str], list[float]]] = {}
+    for key, items, scores in records:
+        rows[key] = (items[:top_n], scores[:top_n])
+
+    item_ordinals: dict[str, int] = {}
+    for items, _ in rows.values():
+        for item in items:
+            if item not in item_ordinals:
+                item_ordinals[item] = len(item_ordinals)
+
+    entries = sorted(
+        ((key_hash(key), key.encode('utf-8'), items, scores) for key, (items, scores) in rows.items()),
+        key=lambda entry: (entry[0], entry[1])
+    )
+
+    hashes = array('Q')
+    key_offsets = array('I', [0])
+    counts = array('H')
+    ordinals = array('I')
+    score_values = array('f')
+    key_blob = bytearray()
+
+    for h, encoded, items, scores in entries:
+        hashes.append(h)
+        key_blob += encoded
+        key_offsets.append(len(key_blob))
+        counts.append(len(items))
+        padding = top_n - len(items)
+        ordinals.extend(item_ordinals[item] for item in items)
+        ordinals.extend([EMPTY_ORDINAL] * padding)
+        score_values.extend(scores)
+        score_values.extend([0.0] * padding)
+
+    item_offsets = array('I', [0])
+    item_blob = bytearray()
+    for item in item_ordinals:  # dicts preserve insertion order == ordinal order
+        item_blob += item.encode('utf-8')
+        item_offsets.append(len(item_blob))
+
+    built_at = int(built_at if built_at is not None else time.time())
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, top_n, len(entries), len(item_ordinals), built_at,
+        label.encode('utf-8')[:40]
+    )
+
+    tmp_path = f'{out_path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        for section in (hashes, key_offsets, counts, ordinals, score_values, item_offsets):
+            data = _le_bytes(section)
+            f.write(data)
+            f.write(_padding(len(data)))
+        f.write(key_blob)
+        f.write(item_blob)
+    os.replace(tmp_path, out_path)
+
+    return {
+        'path': out_path,
+        'keys': len(entries),
+        'items': len(item_ordinals),
+        'topN': top_n,
+        'builtAt': built_at,
+        'label': label,
+        'bytes': os.path.getsize(out_path)
+    }
+
+
+def _read_lines(source: str) -> Iterator[str]:
+    if source.startswith('s3://'):
+        import boto3  # Only needed when compiling straight from S3
+
+        bucket, _, prefix = source[len('s3://'):].partition('/')
+        s3 = boto3.client('s3')
+        paginator = s3.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                if obj['Key'].endswith('.out') or obj['Key'].endswith('.jsonl') or obj['Key'].endswith('.json'):
+                    body = s3.get_object(Bucket=bucket, Key=obj['Key'])['Body']
+                    for line in body.iter_lines():
+                        yield line.decode('utf-8')
+        return
+
+    for path in sorted(glob.glob(source)) or [source]:
+        with open(path, encoding='utf-8') as f:
+            yield from f
+
+
+def compile_batch_output(
+    sources: list[str],
+    out_path: str,
+    top_n: int = DEFAULT_TOP_N,
+    label: str = ''
+) -> dict:
+    """Compile Personalize batch inference JSON Lines (local paths, globs or s3:// prefixes)."""
+    skipped = 0
+
+    def records():
+        nonlocal skipped
+        for source in sources:
+            for line in _read_lines(source):
+                parsed = parse_batch_line(line)
+                if parsed is None:
+                    skipped += 1 if line.strip() else 0
+                    continue
+                yield parsed
+
+    summary = compile_records(records(), out_path, top_n=top_n, label=label)
+    summary['skipped'] = skipped
+    return summary
+
+
+# -----------------------------------------------------------------------------
+# Runtime loading
+# -----------------------------------------------------------------------------
+
+_store: Optional[OfflineStore] = None
+_retired: Optional[OfflineStore] = None
+_checked_at: Optional[float] = None
+_store_lock = threading.Lock()
+
+
+def sync_from_s3(uri: str, path: str) -> bool:
+    """
+    Keep `path` a copy of the S3 object at `uri`. Downloads when the file is
+    missing or the object's ETag differs from the one recorded in
+    `<path>.etag`, then swaps it in atomically. Returns True when replaced.
+    """
+    import boto3
+
+    bucket, _, key = uri[len('s3://'):].partition('/')
+    s3 = boto3.client('s3')
+    etag = s3.head_object(Bucket=bucket, Key=key)['ETag']
+    etag_path = f'{path}.etag'
+    if os.path.exists(path) and os.path.exists(etag_path):
+        with open(etag_path, encoding='utf-8') as f:
+            if f.read() == etag:
+                return False
+
+    # If the object changes mid-download the recorded ETag is the older one, so the next check fetches it again
+    tmp_path = f'{path}.download'
+    s3.download_file(bucket, key, tmp_path)
+    os.replace(tmp_path, path)
+    with open(etag_path, 'w', encoding='utf-8') as f:
+        f.write(etag)
+    return True
+
+
+def open_first(candidates: list[str], s3_uri: str, opener: Callable[[str], T], current: Optional[T] = None) -> Optional[T]:
+    """
+    Open the first usable candidate with `opener`. The first candidate is
+    synced from `s3_uri` (when set) before it is tried; later ones are
+    fallbacks such as a file shipped in the deployment package. Errors are
+    logged and the next candidate tried. When the chosen file is the one
+    `current` was opened from (same path, inode and mtime), `current` is
+    returned as is.
+    """
+    for index, candidate in enumerate(candidates):
+        try:
+            if index == 0 and s3_uri:
+                sync_from_s3(s3_uri, candidate)
+            if not os.path.exists(candidate):
+                continue
+            if current is not None and getattr(current, 'source', None) == file_identity(candidate):
+                return current
+            return opener(candidate)
+        except Exception as e:
+            print(f'Error loading {candidate}: {str(e)}')
+    return current
+
+
+def file_identity(path: str) -> tuple:
+    stat = os.stat(path)
+    return path, stat.st_ino, stat.st_mtime_ns
+
+
+def load_store(path: Optional[str] = None) -> Optional[OfflineStore]:
+    """
+    The container's store, re-checked every OFFLINE_STORE_CHECK_SEC.
+
+    Looks at OFFLINE_STORE_PATH (default /tmp), kept in sync with
+    OFFLINE_STORE_S3_URI by ETag, then falls back to a file shipped in the
+    deployment package. When a check finds a new file it is opened and
+    swapped in; the replaced store is closed at the next swap, long after
+    lookups still using it have finished. Returns None when no usable store
+    exists. With `path`, opens just that file, uncached.
+    """
+    global _store, _retired, _checked_at
+    if path is not None:
+        return open_first([path], '', OfflineStore)
+
+    if _checked_at is not None and time.monotonic() - _checked_at < OFFLINE_STORE_CHECK_SEC:
+        return _store
+    with _store_lock:
+        if _checked_at is not None and time.monotonic() - _checked_at < OFFLINE_STORE_CHECK_SEC:
+            return _store
+        if _checked_at is not None:
+            # Other requests keep using the current store while this one checks
+            _checked_at = time.monotonic()
+        store = open_first([OFFLINE_STORE_PATH, PACKAGED_STORE_PATH], OFFLINE_STORE_S3_URI, OfflineStore, _store)
+        if store is not _store:
+            if _retired is not None:
+                _retired.close()
+            _retired, _store = _store, store
+        _checked_at = time.monotonic()
+        return _store
+
+
+def reset_store():
+    """Drop the cached store so the next lookup opens the file again."""
+    global _store, _retired, _checked_at
+    with _store_lock:
+        for store in (_store, _retired):
+            if store is not None:
+                store.close()
+        _store, _retired, _checked_at = None, None, None
+
+
+def lookup_user(user_id: str, num_results: int = 10, required: Optional[int] = None) -> Optional[list[dict]]:
+    store = load_store()
+    if store is None or not store.is_fresh():
+        return None
+    return store.lookup_user(user_id, num_results, required)
+
+
+def lookup_item(item_id: str, num_results: int = 10, required: Optional[int] = None) -> Optional[list[dict]]:
+    store = load_store()
+    if store is None or not store.is_fresh():
+        return None
+    return store.lookup_item(item_id, num_results, required)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Compile or inspect a precomputed recommendation store.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    compile_cmd = sub.add_parser('compile', help='Compile batch inference output')
+    compile_cmd.add_argument('sources', nargs='+', help='JSON Lines files, globs or s3:// prefixes')
+    compile_cmd.add_argument('--out', required=True, help='Output store path')
+    compile_cmd.add_argument('--top-n', type=int, default=DEFAULT_TOP_N)
+    compile_cmd.add_argument('--label', default='', help='Free-form version label (e.g. batch job name)')
+
+    inspect_cmd = sub.add_parser('inspect', help='Print header and freshness of a store')
+    inspect_cmd.add_argument('path')
+    inspect_cmd.add_argument('--max-age', type=int, default=OFFLINE_STORE_MAX_AGE_SEC)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'compile':
+        print(json.dumps(compile_batch_output(args.sources, args.out, args.top_n, args.label), indent=2))
+        return 0
+
+    store = OfflineStore(args.path)
+    fresh = store.is_fresh(args.max_age)
+    print(json.dumps({
+        'path': args.path,
+        'formatVersion': store.version,
+        'label': store.label,
+        'keys': store.num_keys,
+        'items': store.num_items,
+        'topN': store.top_n,
+        'builtAt': store.built_at,
+        'ageSeconds': int(store.age_seconds()),
+        'fresh': fresh
+    }, indent=2))
+    return 0 if fresh else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Long-running container mode hosting every Lambda handler behind one HTTP server."""
@@ -0,0 +1,401 @@
+"""
+ASGI application that mounts the existing Lambda handlers behind one HTTP service.
+
+Each `lambda_handler` is imported once per worker process and called with an
+API Gateway v2 event built from the HTTP request, on a bounded thread pool so
+the asyncio loop never blocks on boto3. The AWS clients the handler modules
+create at import time are replaced with pooled clients shared by every route,
+and module-level caches (offline recommendation store, eligibility index) live
+for the lifetime of the process instead of one Lambda container.
+
+Run with the bundled server (`python -m service.server`) or any ASGI server:
+    uvicorn service.app:app --workers 4
+"""
+
+import asyncio
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import ModuleType
+from typing import Any, Callable, Optional
+
+from .events import LambdaContext, build_event, client_ip, parse_networks, parse_result
+
+LAMBDAS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Modules shipped in the shared Lambda layer (/opt/python in Lambda)
+SHARED_DIR = os.path.join(LAMBDAS_DIR, 'shared')
+DEV_API_PATH = os.environ.get(
+    'DEV_API_PATH',
+    os.path.join(LAMBDAS_DIR, '..', 'infrastructure', 'modules', 'dev-ecs-lite', 'lambda', 'dev_api.py')
+)
+
+SERVICE_THREADS = int(os.environ.get('SERVICE_THREADS', '32'))
+SERVICE_MAX_POOL_CONNECTIONS = int(os.environ.get('SERVICE_MAX_POOL_CONNECTIONS', '50'))
+SERVICE_CACHE_TTL_SEC = float(os.environ.get('SERVICE_CACHE_TTL_SEC', '30'))
+SERVICE_CACHE_MAX_ENTRIES = int(os.environ.get('SERVICE_CACHE_MAX_ENTRIES', '10000'))
+SERVICE_DRAIN_SEC = float(os.environ.get('SERVICE_DRAIN_SEC', '10'))
+SERVICE_MAX_BODY_BYTES = int(os.environ.get('SERVICE_MAX_BODY_BYTES', str(10 * 1024 * 1024)))
+# Peers whose X-Forwarded-For is believed: the load balancer sits in the VPC's private ranges
+SERVICE_TRUSTED_PROXIES = parse_networks(os.environ.get(
+    'SERVICE_TRUSTED_PROXIES', '10.0.0.0/8,172.16.0.0/12,192.168.0.0/16,127.0.0.0/8,::1/128'
+))
+
+
+class Route:
+    """One mounted handler: path matching, Lambda-equivalent timeout and pooled clients."""
+
+    def __init__(
+        self,
+        name: str,
+        module_path: str,
+        paths: tuple[str, ...],
+        prefix: bool = False,
+        timeout_sec: float = 30,
+        clients: Optional[dict[str, tuple[str, str]]] = None,
+        cacheable: bool = False,
+        required_env: tuple[str, ...] = (),
+        env: Optional[dict[str, str]] = None
+    ):
+        self.name = name
+        self.module_path = module_path
+        self.paths = paths
+        self.prefix = prefix
+        self.timeout_sec = timeout_sec
+        self.clients = clients or {}
+        self.cacheable = cacheable
+        self.required_env = required_env
+        self.env = env or {}
+        self.module: Optional[ModuleType] = None
+        self.handler: Optional[Callable[[dict, Any], Any]] = None
+
+    def matches(self, path: str) -> bool:
+        if self.prefix:
+            return any(path == p or path.startswith(p + '/') for p in self.paths)
+        return path in self.paths
+
+    @property
+    def enabled(self) -> bool:
+        return all(os.environ.get(name) for name in self.required_env) and os.path.exists(self.module_path)
+
+
+# Module attribute -> ('client' | 'resource', service name), matching what each handler creates at import.
+ROUTES = [
+    Route(
+        'skin-analysis',
+        os.path.join(LAMBDAS_DIR, 'skin-analysis', 'handler.py'),
+        ('/api/skin-analysis', '/api/skin-analysis/batch'),
+        timeout_sec=30,
+        clients={'rekognition': ('client', 'rekognition'), 'bedrock': ('client', 'bedrock-runtime')}
+    ),
+    Route(
+        'recommendations',
+        os.path.join(LAMBDAS_DIR, 'recommendations', 'handler.py'),
+        ('/api/recommendations',),
+        prefix=True,
+        timeout_sec=10,
+        clients={'personalize_runtime': ('client', 'personalize-runtime'), 'dynamodb': ('resource', 'dynamodb')},
+        cacheable=True
+    ),
+    Route(
+        'chatbot',
+        os.path.join(LAMBDAS_DIR, 'chatbot', 'handler.py'),
+        ('/api/chat',),
+        timeout_sec=60,
+        clients={'bedrock': ('client', 'bedrock-runtime'), 'dynamodb': ('resource', 'dynamodb')},
+        # The process outlives requests and drains on SIGTERM, so history is persisted off the reply path
+        env={'CONVERSATION_WRITE_MODE': 'behind'}
+    ),
+    Route(
+        'dev-api',
+        os.path.abspath(DEV_API_PATH),
+        ('/wake', '/touch', '/status', '/magento/graphql'),
+        timeout_sec=30,
+        clients={'_ec2': ('client', 'ec2'), '_ecs': ('client', 'ecs'), '_ddb': ('client', 'dynamodb')},
+        required_env=('EC2_INSTANCE_ID', 'ECS_CLUSTER_ARN', 'ECS_SERVICE_NAME', 'DDB_TABLE_NAME')
+    ),
+]
+
+
+class ThreadLocalResource:
+    """
+    boto3 resources are not thread-safe, so each executor thread gets its own
+    resource object. The pool of threads is bounded, and so is the number of
+    resources.
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._local = threading.local()
+
+    def __getattr__(self, name: str) -> Any:
+        resource = getattr(self._local, 'resource', None)
+        if resource is None:
+            resource = self._local.resource = self._factory()
+        return getattr(resource, name)
+
+
+class ClientPool:
+    """One botocore client per service (thread-safe, connection pooled) shared by all routes."""
+
+    def __init__(self, max_pool_connections: int = SERVICE_MAX_POOL_CONNECTIONS):
+        self.max_pool_connections = max_pool_connections
+        self._clients: dict[str, Any] = {}
+        self._resources: dict[str, ThreadLocalResource] = {}
+        self._lock = threading.Lock()
+
+    def _config(self):
+        from botocore.config import Config
+
+        return Config(
+            max_pool_connections=self.max_pool_connections,
+            retries={'max_attempts': 3, 'mode': 'adaptive'},
+            tcp_keepalive=True
+        )
+
+    def client(self, service: str) -> Any:
+        with self._lock:
+            if service not in self._clients:
+                import boto3
+
+                self._clients[service] = boto3.client(service, config=self._config())
+            return self._clients[service]
+
+    def resource(self, service: str) -> Any:
+        with self._lock:
+            if service not in self._resources:
+                import boto3
+
+                config = self._config()
+                self._resources[service] = ThreadLocalResource(
+                    lambda: boto3.session.Session().resource(service, config=config)
+                )
+            return self._resources[service]
+
+
+class ResponseCache:
+    """Small TTL cache for idempotent GET responses of cacheable routes."""
+
+    def __init__(self, ttl_sec: float = SERVICE_CACHE_TTL_SEC, max_entries: int = SERVICE_CACHE_MAX_ENTRIES):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self._entries: dict[tuple, tuple[float, tuple]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> Optional[tuple]:
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+        if entry:
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: tuple, value: tuple):
+        if self.ttl_sec <= 0:
+            return
+        if len(self._entries) >= self.max_entries:
+            now = time.monotonic()
+            self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+        self._entries[key] = (time.monotonic() + self.ttl_sec, value)
+
+
+def load_module(name: str, path: str) -> ModuleType:
+    """
+    Import a handler file under a unique module name. Its directory is put on
+    sys.path so sibling modules (e.g. `offline_store`) resolve like in Lambda.
+    """
+    for directory in (SHARED_DIR, os.path.dirname(path)):
+        if directory not in sys.path:
+            sys.path.insert(0, directory)
+
+    module_name = name.replace('-', '_') + '_handler'
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+class ServiceApp:
+    """ASGI 3 application dispatching HTTP requests to Lambda handlers."""
+
+    def __init__(
+        self,
+        routes: Optional[list[Route]] = None,
+        threads: int = SERVICE_THREADS,
+        clients: Optional[ClientPool] = None,
+        cache: Optional[ResponseCache] = None
+    ):
+        self.routes = routes if routes is not None else ROUTES
+        self.threads = threads
+        self.clients = clients or ClientPool()
+        self.cache = cache or ResponseCache()
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.inflight = 0
+        self.started = False
+        self.draining = False
+        self.requests = 0
+
+    def startup(self):
+        if self.started:
+            return
+        self.executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='handler')
+        for route in self.routes:
+            if not route.enabled:
+                continue
+            for name, value in route.env.items():
+                os.environ.setdefault(name, value)
+            route.module = load_module(route.name, route.module_path)
+            for attribute, (kind, service) in route.clients.items():
+                if hasattr(route.module, attribute):
+                    pooled = self.clients.client(service) if kind == 'client' else self.clients.resource(service)
+                    setattr(route.module, attribute, pooled)
+            route.handler = route.module.lambda_handler
+        self.started = True
+
+    def drain(self, timeout_sec: float) -> bool:
+        """Let handler modules flush background work (e.g. queued conversation writes)."""
+        deadline = time.monotonic() + timeout_sec
+        drained = True
+        for route in self.routes:
+            drain = getattr(route.module, 'drain', None)
+            if callable(drain):
+                drained = drain(max(0.0, deadline - time.monotonic())) and drained
+        return drained
+
+    def shutdown(self, wait: bool = True):
+        self.draining = True
+        if self.executor:
+            self.executor.shutdown(wait=wait, cancel_futures=not wait)
+            self.executor = None
+        self.started = False
+
+    def match(self, path: str) -> Optional[Route]:
+        for route in self.routes:
+            if route.handler and route.matches(path):
+                return route
+        return None
+
+    def health(self) -> dict:
+        return {
+            'status': 'draining' if self.draining else 'ok',
+            'routes': [route.name for route in self.routes if route.handler],
+            'inflight': self.inflight,
+            'requests': self.requests,
+            'cache': {'hits': self.cache.hits, 'misses': self.cache.misses}
+        }
+
+    async def invoke(self, route: Route, event: dict) -> tuple[int, list[tuple[str, str]], bytes]:
+        """Run a handler on the thread pool with its Lambda timeout."""
+        context = LambdaContext(route.name, route.timeout_sec)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, route.handler, event, context)
+        try:
+            result = await asyncio.wait_for(future, timeout=route.timeout_sec)
+        except asyncio.TimeoutError:
+            return _json_error(504, 'Handler timed out')
+        except Exception as e:
+            print(f'Error: {route.name}: {str(e)}')
+            return _json_error(502, 'Handler failed')
+        return parse_result(result)
+
+    async def handle(
+        self,
+        method: str,
+        path: str,
+        query: str,
+        headers: dict,
+        body: bytes,
+        peer_ip: str = '127.0.0.1'
+    ) -> tuple[int, list[tuple[str, str]], bytes]:
+        if path == '/healthz':
+            status = 503 if self.draining else 200
+            return status, [('content-type', 'application/json')], json.dumps(self.health()).encode('utf-8')
+
+        route = self.match(path)
+        if route is None:
+            return _json_error(404, 'Not found')
+        if len(body) > SERVICE_MAX_BODY_BYTES:
+            return _json_error(413, 'Request body too large')
+
+        cache_key = (route.name, path, query) if route.cacheable and method == 'GET' else None
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached:
+                return cached
+
+        # Admission keys clients by sourceIp; behind the load balancer the peer is the balancer itself
+        source_ip = client_ip(peer_ip, headers, SERVICE_TRUSTED_PROXIES)
+        self.inflight += 1
+        self.requests += 1
+        try:
+            response = await self.invoke(route, build_event(method, path, query, headers, body, source_ip))
+        finally:
+            self.inflight -= 1
+
+        if cache_key and response[0] == 200:
+            self.cache.put(cache_key, response)
+        return response
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    self.startup()
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    self.draining = True
+                    await asyncio.to_thread(self.drain, SERVICE_DRAIN_SEC)
+                    self.shutdown()
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+
+        if scope['type'] != 'http':
+            return
+        if not self.started:
+            self.startup()
+
+        body = bytearray()
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        headers: dict[str, str] = {}
+        for raw_name, raw_value in scope.get('headers', []):
+            name, value = raw_name.decode('latin-1').lower(), raw_value.decode('latin-1')
+            headers[name] = f'{headers[name]},{value}' if name in headers else value
+
+        client = scope.get('client') or ('127.0.0.1', 0)
+        status, response_headers, data = await self.handle(
+            scope['method'],
+            scope['path'],
+            scope.get('query_string', b'').decode('latin-1'),
+            headers,
+            bytes(body),
+            client[0]
+        )
+
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(k.encode('latin-1'), v.encode('latin-1')) for k, v in response_headers]
+        })
+        await send({'type': 'http.response.body', 'body': data})
+
+
+def _json_error(status: int, message: str) -> tuple[int, list[tuple[str, str]], bytes]:
+    return status, [('content-type', 'application/json')], json.dumps({'error': message}).encode('utf-8')
+
+
+app = ServiceApp()
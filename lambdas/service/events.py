@@ -0,0 +1,146 @@
+"""
+Adapters between plain HTTP requests and the API Gateway HTTP API (payload v2.0)
+events/results that the Lambda handlers expect.
+"""
+
+import base64
+import ipaddress
+import json
+import time
+import uuid
+from typing import Any, Optional
+from urllib.parse import parse_qsl
+
+TEXT_CONTENT_TYPES = ('application/json', 'application/graphql', 'application/x-www-form-urlencoded', 'text/')
+
+
+class LambdaContext:
+    """Minimal stand-in for the Lambda context object."""
+
+    def __init__(self, function_name: str, timeout_sec: float, memory_limit_in_mb: int = 512):
+        self.function_name = function_name
+        self.function_version = '$LATEST'
+        self.invoked_function_arn = f'arn:aws:lambda:local:000000000000:function:{function_name}'
+        self.memory_limit_in_mb = memory_limit_in_mb
+        self.aws_request_id = str(uuid.uuid4())
+        self.log_group_name = f'/service/{function_name}'
+        self.log_stream_name = 'service'
+        self._deadline = time.monotonic() + timeout_sec
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
+
+
+def parse_networks(spec: str) -> tuple:
+    """Comma-separated CIDRs/addresses, e.g. SERVICE_TRUSTED_PROXIES."""
+    return tuple(ipaddress.ip_network(part.strip(), strict=False) for part in spec.split(',') if part.strip())
+
+
+def _trusted(address: str, trusted: tuple) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted)
+
+
+def client_ip(peer_ip: str, headers: dict, trusted: tuple) -> str:
+    """
+    The address API Gateway would report as sourceIp. Behind the load balancer
+    the TCP peer is the proxy, so when it is `trusted` the client comes from
+    X-Forwarded-For. Each proxy appends the address it saw, so the hops are read
+    right to left, skipping trusted proxies: entries further left were supplied
+    by the client and could be forged. When every hop is trusted, the first hop wins.
+    """
+    forwarded = headers.get('x-forwarded-for', '')
+    if not forwarded or not _trusted(peer_ip, trusted):
+        return peer_ip
+    hops = [hop.strip() for hop in forwarded.split(',') if hop.strip()]
+    for hop in reversed(hops):
+        if not _trusted(hop, trusted):
+            return hop
+    return hops[0] if hops else peer_ip
+
+
+def _is_text(content_type: str) -> bool:
+    return not content_type or content_type.startswith(TEXT_CONTENT_TYPES)
+
+
+def build_event(
+    method: str,
+    raw_path: str,
+    raw_query: str,
+    headers: dict,
+    body: bytes,
+    source_ip: str = '127.0.0.1',
+    stage: str = '$default'
+) -> dict:
+    """
+    Build an API Gateway HTTP API v2.0 event. Header names are lower-cased and
+    repeated headers comma-joined, as API Gateway does.
+    """
+    query = {}
+    for key, value in parse_qsl(raw_query, keep_blank_values=True):
+        query[key] = f'{query[key]},{value}' if key in query else value
+
+    cookies = [c.strip() for c in headers.get('cookie', '').split(';') if c.strip()]
+    content_type = headers.get('content-type', '')
+    is_base64 = bool(body) and not _is_text(content_type)
+    now = time.time()
+
+    event = {
+        'version': '2.0',
+        'routeKey': '$default',
+        'rawPath': raw_path,
+        'rawQueryString': raw_query,
+        'headers': headers,
+        'requestContext': {
+            'accountId': 'service',
+            'apiId': 'service',
+            'domainName': headers.get('host', 'localhost'),
+            'http': {
+                'method': method,
+                'path': raw_path,
+                'protocol': 'HTTP/1.1',
+                'sourceIp': source_ip,
+                'userAgent': headers.get('user-agent', '')
+            },
+            'requestId': str(uuid.uuid4()),
+            'routeKey': '$default',
+            'stage': stage,
+            'time': time.strftime('%d/%b/%Y:%H:%M:%S +0000', time.gmtime(now)),
+            'timeEpoch': int(now * 1000)
+        },
+        'isBase64Encoded': is_base64
+    }
+    if cookies:
+        event['cookies'] = cookies
+    if query:
+        event['queryStringParameters'] = query
+    if body:
+        event['body'] = base64.b64encode(body).decode('ascii') if is_base64 else body.decode('utf-8')
+    return event
+
+
+def parse_result(result: Any) -> tuple[int, list[tuple[str, str]], bytes]:
+    """
+    Convert a handler return value into (status, headers, body).
+    Mirrors API Gateway: a dict without statusCode is treated as a JSON body.
+    """
+    if result is None:
+        return 204, [], b''
+    if not isinstance(result, dict) or 'statusCode' not in result:
+        return 200, [('content-type', 'application/json')], json.dumps(result).encode('utf-8')
+
+    headers = [(str(k).lower(), str(v)) for k, v in (result.get('headers') or {}).items()]
+    for cookie in result.get('cookies') or []:
+        headers.append(('set-cookie', cookie))
+
+    body: Optional[str] = result.get('body')
+    if body is None:
+        data = b''
+    elif result.get('isBase64Encoded'):
+        data = base64.b64decode(body)
+    else:
+        data = body.encode('utf-8') if isinstance(body, str) else bytes(body)
+    return int(result['statusCode']), headers, data
@@ -0,0 +1,279 @@
+"""
+Dependency-free asyncio HTTP/1.1 server for the service ASGI app.
+
+- Keep-alive connections, Content-Length request bodies, chunked responses
+  when the app streams (`more_body`). Bodies over SERVICE_MAX_BODY_BYTES get
+  a 413 from the Content-Length header, before they are read.
+- `--workers N` forks N processes that each bind the port with SO_REUSEPORT,
+  so the kernel spreads connections across cores. Consecutive requests of one
+  chat session can land on different workers, so chat history is written
+  synchronously when N > 1 (see chatbot CONVERSATION_WRITE_MODE).
+- SIGTERM/SIGINT drain gracefully: stop accepting, report 503 on /healthz,
+  wait up to SERVICE_SHUTDOWN_GRACE_SEC for in-flight requests, flush handler
+  background work (queued conversation writes) with what is left of it, then exit.
+
+Usage (from the lambdas/ directory):
+    python -m service.server --host 0.0.0.0 --port 8080 --workers 4
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+from http import HTTPStatus
+from typing import Optional
+
+from .app import SERVICE_MAX_BODY_BYTES, ServiceApp
+
+SERVICE_SHUTDOWN_GRACE_SEC = float(os.environ.get('SERVICE_SHUTDOWN_GRACE_SEC', '25'))
+KEEPALIVE_TIMEOUT_SEC = float(os.environ.get('SERVICE_KEEPALIVE_TIMEOUT_SEC', '75'))
+MAX_HEADER_BYTES = 64 * 1024
+
+
+class HttpServer:
+    """Serves one ServiceApp on an asyncio loop."""
+
+    def __init__(self, app: ServiceApp, host: str = '0.0.0.0', port: int = 8080, reuse_port: bool = False):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.reuse_port = reuse_port
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._connections: set[asyncio.Task] = set()
+        self._idle: set[asyncio.StreamWriter] = set()
+        self._stopping: Optional[asyncio.Event] = None
+
+    async def start(self):
+        self.app.startup()
+        self._stopping = asyncio.Event()
+        self._server = await asyncio.start_server(
+            self._on_connection,
+            self.host,
+            self.port,
+            reuse_port=self.reuse_port or None,
+            limit=MAX_HEADER_BYTES
+        )
+        sockets = self._server.sockets or []
+        if sockets:
+            self.port = sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        await self.start()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self._stopping.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+        await self._stopping.wait()
+        await self.shutdown()
+
+    def stop(self):
+        if self._stopping:
+            self._stopping.set()
+
+    async def shutdown(self, grace_sec: float = SERVICE_SHUTDOWN_GRACE_SEC):
+        """Stop accepting, let in-flight requests finish, then close everything."""
+        self.app.draining = True
+        if self._server:
+            self._server.close()
+        for writer in list(self._idle):
+            writer.close()
+
+        deadline = time.monotonic() + grace_sec
+        while self.app.inflight and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+        for task in list(self._connections):
+            task.cancel()
+        if self._connections:
+            await asyncio.gather(*self._connections, return_exceptions=True)
+        if self._server:
+            await self._server.wait_closed()
+        # Whatever grace is left (at least 5s, inside ECS's default 30s stop timeout) goes to background writes
+        await asyncio.to_thread(self.app.drain, max(deadline - time.monotonic(), 5.0))
+        self.app.shutdown(wait=False)
+
+    async def _on_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            await self._serve_connection(reader, writer)
+        except (asyncio.CancelledError, ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(task)
+            self._idle.discard(writer)
+            writer.close()
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = writer.get_extra_info('peername') or ('127.0.0.1', 0)
+        while not self.app.draining:
+            self._idle.add(writer)
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEPALIVE_TIMEOUT_SEC)
+            except (asyncio.TimeoutError, asyncio.LimitOverrunError):
+                return
+            self._idle.discard(writer)
+
+            lines = head.decode('latin-1').split('\r\n')
+            try:
+                method, target, version = lines[0].split(' ', 2)
+            except ValueError:
+                await self._write_simple(writer, 400)
+                return
+
+            raw_headers = []
+            headers = {}
+            for line in lines[1:]:
+                if not line:
+                    continue
+                name, _, value = line.partition(':')
+                name, value = name.strip().lower(), value.strip()
+                raw_headers.append((name.encode('latin-1'), value.encode('latin-1')))
+                headers[name] = value
+
+            if 'chunked' in headers.get('transfer-encoding', '').lower():
+                await self._write_simple(writer, 411)
+                return
+            try:
+                length = int(headers.get('content-length', '0') or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                await self._write_simple(writer, 400)
+                return
+            # Refuse before buffering: the app's own limit only applies once the body is in memory
+            if length > SERVICE_MAX_BODY_BYTES:
+                await self._write_simple(writer, 413)
+                return
+            body = await reader.readexactly(length)
+
+            path, _, query = target.partition('?')
+            keep_alive = (headers.get('connection', '').lower() != 'close') and version == 'HTTP/1.1'
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0', 'spec_version': '2.3'},
+                'http_version': version.split('/', 1)[-1],
+                'method': method.upper(),
+                'scheme': 'http',
+                'path': path,
+                'raw_path': path.encode('latin-1'),
+                'query_string': query.encode('latin-1'),
+                'headers': raw_headers,
+                'client': (peer[0], peer[1]),
+                'server': (self.host, self.port)
+            }
+            await self._run_app(scope, body, writer, keep_alive)
+            if not keep_alive:
+                return
+
+    async def _run_app(self, scope: dict, body: bytes, writer: asyncio.StreamWriter, keep_alive: bool):
+        received = False
+        state = {'chunked': False}
+
+        async def receive():
+            nonlocal received
+            if received:
+                return {'type': 'http.disconnect'}
+            received = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message: dict):
+            if message['type'] == 'http.response.start':
+                state['start'] = message
+                return
+
+            data = message.get('body', b'')
+            more = message.get('more_body', False)
+            if 'start' in state:
+                start = state.pop('start')
+                headers = [(k.decode('latin-1').lower(), v.decode('latin-1')) for k, v in start.get('headers', [])]
+                names = {name for name, _ in headers}
+                if more:
+                    state['chunked'] = True
+                    headers.append(('transfer-encoding', 'chunked'))
+                elif 'content-length' not in names:
+                    headers.append(('content-length', str(len(data))))
+                headers.append(('connection', 'keep-alive' if keep_alive else 'close'))
+                writer.write(_status_line(start['status']) + _header_block(headers))
+
+            if state['chunked']:
+                if data:
+                    writer.write(b'%x\r\n%s\r\n' % (len(data), data))
+                if not more:
+                    writer.write(b'0\r\n\r\n')
+            else:
+                writer.write(data)
+            await writer.drain()
+
+        await self.app(scope, receive, send)
+
+    async def _write_simple(self, writer: asyncio.StreamWriter, status: int):
+        writer.write(_status_line(status) + _header_block([('content-length', '0'), ('connection', 'close')]))
+        await writer.drain()
+
+
+def _status_line(status: int) -> bytes:
+    try:
+        phrase = HTTPStatus(status).phrase
+    except ValueError:
+        phrase = ''
+    return f'HTTP/1.1 {status} {phrase}\r\n'.encode('latin-1')
+
+
+def _header_block(headers: list[tuple[str, str]]) -> bytes:
+    return ''.join(f'{name}: {value}\r\n' for name, value in headers).encode('latin-1') + b'\r\n'
+
+
+def _run_worker(host: str, port: int, reuse_port: bool):
+    server = HttpServer(ServiceApp(), host, port, reuse_port=reuse_port)
+    asyncio.run(server.serve_forever())
+
+
+def serve(host: str, port: int, workers: int):
+    """Run one server per worker process; the parent forwards signals and waits."""
+    if workers <= 1:
+        os.environ['SERVICE_WORKERS'] = '1'
+        _run_worker(host, port, reuse_port=False)
+        return
+
+    if not hasattr(socket, 'SO_REUSEPORT'):
+        raise SystemExit('--workers > 1 requires SO_REUSEPORT (Linux)')
+
+    # Handlers check it: per-process state such as queued conversation writes is not shared
+    os.environ['SERVICE_WORKERS'] = str(workers)
+
+    processes = [
+        multiprocessing.Process(target=_run_worker, args=(host, port, True), name=f'worker-{i}')
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    def forward(signum, _frame):
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signum)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for process in processes:
+        process.join()
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description='Serve all Lambda handlers from one process pool.')
+    parser.add_argument('--host', default=os.environ.get('SERVICE_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('SERVICE_PORT', '8080')))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('SERVICE_WORKERS', str(os.cpu_count() or 1))))
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.workers)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,391 @@
+"""
+Admission control for Bedrock-backed routes.
+
+Every request has to pass:
+- a token bucket per client key (session id and/or source IP),
+- a global token bucket shared by all routes that call Bedrock,
+- a global in-process concurrency budget.
+
+Interactive traffic (chat) may use the full global budget; batch traffic
+(skin analysis) must leave `BATCH_RESERVE` of the global bucket and of the
+concurrency slots for interactive requests. Rejections are answered
+immediately with 429 and a Retry-After header instead of waiting on Bedrock.
+
+Bucket state is in-process by default. In Lambda each container only sees its
+own traffic, so set ADMISSION_BACKEND=redis or dynamodb to share buckets across
+containers. Concurrency slots are always per process (service mode); across
+Lambda containers use reserved concurrency instead.
+
+Environment:
+    ADMISSION_ENABLED            true/false (default true)
+    ADMISSION_BACKEND            memory | redis | dynamodb (default memory)
+    ADMISSION_REDIS_URL          redis://host:6379/0
+    ADMISSION_TABLE              DynamoDB table (hash key `id`)
+    ADMISSION_GLOBAL_RATE        Bedrock requests/second across all routes (default 20)
+    ADMISSION_GLOBAL_BURST       (default 40)
+    ADMISSION_MAX_CONCURRENCY    in-flight Bedrock requests per process (default 32)
+    ADMISSION_BATCH_RESERVE      share kept free for interactive traffic (default 0.3)
+    <PREFIX>_RATE / <PREFIX>_BURST   per-client bucket, e.g. CHAT_RATE=0.5 CHAT_BURST=5
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+
+ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+ADMISSION_BACKEND = os.environ.get('ADMISSION_BACKEND', 'memory')
+ADMISSION_REDIS_URL = os.environ.get('ADMISSION_REDIS_URL', '')
+ADMISSION_TABLE = os.environ.get('ADMISSION_TABLE', '')
+GLOBAL_RATE = float(os.environ.get('ADMISSION_GLOBAL_RATE', '20'))
+GLOBAL_BURST = float(os.environ.get('ADMISSION_GLOBAL_BURST', '40'))
+MAX_CONCURRENCY = int(os.environ.get('ADMISSION_MAX_CONCURRENCY', '32'))
+BATCH_RESERVE = float(os.environ.get('ADMISSION_BATCH_RESERVE', '0.3'))
+GLOBAL_KEY = 'global:bedrock'
+
+
+class MemoryBackend:
+    """Token buckets in a bounded LRU dict."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0, reserve: float = 0.0) -> float:
+        """
+        Take `cost` tokens unless that would leave fewer than `reserve`.
+        Returns 0 when admitted, otherwise seconds until enough tokens refill.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            wait = 0.0
+            if tokens - cost >= reserve:
+                tokens -= cost
+            else:
+                wait = (cost + reserve - tokens) / rate if rate > 0 else 60.0
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def refund(self, key: str, rate: float, burst: float, cost: float = 1.0):
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated = self._buckets[key]
+                self._buckets[key] = (min(burst, tokens + cost), updated)
+
+
+class RedisBackend:
+    """Token buckets in Redis, updated atomically with a Lua script."""
+
+    SCRIPT = """
+local tokens = tonumber(redis.call('HGET', KEYS[1], 't') or ARGV[2])
+local updated = tonumber(redis.call('HGET', KEYS[1], 'u') or ARGV[5])
+local rate, burst, cost, now, reserve = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[5]), tonumber(ARGV[4])
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens - cost >= reserve then tokens = tokens - cost else wait = (cost + reserve - tokens) / rate end
+redis.call('HSET', KEYS[1], 't', tokens, 'u', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 60)
+return tostring(wait)
+"""
+
+    def __init__(self, url: str = ADMISSION_REDIS_URL, client: Any = None):
+        if client is None:
+            import redis  # Optional dependency, only needed for ADMISSION_BACKEND=redis
+
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self._script = client.register_script(self.SCRIPT)
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0, reserve: float = 0.0) -> float:
+        return float(self._script(keys=[f'admission:{key}'], args=[rate, burst, cost, reserve, time.time()]))
+
+    def refund(self, key: str, rate: float, burst: float, cost: float = 1.0):
+        self.client.hincrbyfloat(f'admission:{key}', 't', cost)
+
+
+class DynamoDBBackend:
+    """
+    Token buckets in DynamoDB, one conditional UpdateItem per take.
+
+    A bucket is stored as its theoretical arrival time (GCRA): `tat` is when
+    the bucket would be full again, and each token pushes it `1 / rate`
+    seconds later. That turns the refill into a comparison DynamoDB can do in
+    a condition. A take admits while `tat` is at most `burst / rate` seconds
+    ahead, minus the tokens it needs and the reserve. A bucket that has been
+    idle (`tat` in the past, or no item) is reset to now by a second
+    conditional write. The failed first write returns the item, so a
+    rejection never needs a read.
+    """
+
+    def __init__(self, table: Any = None, table_name: str = ADMISSION_TABLE, attempts: int = 4):
+        if table is None:
+            import boto3
+
+            table = boto3.resource('dynamodb').Table(table_name)
+        self.table = table
+        self.attempts = attempts
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0, reserve: float = 0.0) -> float:
+        if rate <= 0:
+            return 60.0
+        interval = 1.0 / rate
+        for _ in range(self.attempts):
+            now = time.time()
+            # Latest arrival time that still leaves `cost + reserve` tokens
+            limit = now + (burst - cost - reserve) * interval
+            ttl = int(now + burst * interval + 3600)
+            old = self._update(
+                key,
+                'SET tat = tat + :step, #ttl = :ttl',
+                'tat BETWEEN :now AND :limit',
+                {':step': _decimal(cost * interval), ':ttl': ttl, ':now': _decimal(now), ':limit': _decimal(limit)}
+            )
+            if old is None:
+                return 0.0
+            tat = _number(old.get('tat'))
+            if tat is not None and tat >= now:
+                return max(tat - limit, 0.001)
+            if limit < now:
+                return now - limit  # cost and reserve exceed the burst
+
+            # Idle bucket: it is full, so start it over from now
+            old = self._update(
+                key,
+                'SET tat = :start, #ttl = :ttl',
+                'attribute_not_exists(tat) OR tat < :now',
+                {':start': _decimal(now + cost * interval), ':ttl': ttl, ':now': _decimal(now)}
+            )
+            if old is None:
+                return 0.0
+            # Another request reset it first; the next pass sees its arrival time
+        # Only clock skew between containers gets here; fail open like a backend error
+        return 0.0
+
+    def _update(self, key: str, expression: str, condition: str, values: dict) -> Optional[dict]:
+        """Conditional update; None when it applied, otherwise the current item ({} if there is none)."""
+        try:
+            self.table.update_item(
+                Key={'id': key},
+                UpdateExpression=expression,
+                ConditionExpression=condition,
+                ExpressionAttributeNames={'#ttl': 'ttl'},
+                ExpressionAttributeValues=values,
+                ReturnValuesOnConditionCheckFailure='ALL_OLD'
+            )
+            return None
+        except Exception as e:
+            if 'ConditionalCheckFailed' not in str(e):
+                raise
+            return getattr(e, 'response', {}).get('Item') or {}
+
+    def refund(self, key: str, rate: float, burst: float, cost: float = 1.0):
+        if rate <= 0:
+            return
+        try:
+            self.table.update_item(
+                Key={'id': key},
+                UpdateExpression='SET tat = tat - :step',
+                ConditionExpression='attribute_exists(tat)',
+                ExpressionAttributeValues={':step': _decimal(cost / rate)}
+            )
+        except Exception as e:
+            if 'ConditionalCheckFailed' not in str(e):
+                raise
+
+
+def _decimal(value: float):
+    from decimal import Decimal
+
+    return Decimal(str(round(value, 4)))
+
+
+def _number(value: Any) -> Optional[float]:
+    """Attribute value from a failed-condition response, which is not deserialized ({'N': '...'})."""
+    if isinstance(value, dict):
+        value = value.get('N')
+    return float(value) if value is not None else None
+
+
+class Decision:
+    """Outcome of an admission check; pass it back to `release` when done."""
+
+    __slots__ = ('allowed', 'retry_after', 'reason', 'priority', 'holds_slot')
+
+    def __init__(self, allowed: bool, retry_after: float = 0.0, reason: str = '', priority: str = INTERACTIVE,
+                 holds_slot: bool = False):
+        self.allowed = allowed
+        self.retry_after = retry_after
+        self.reason = reason
+        self.priority = priority
+        self.holds_slot = holds_slot
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class ConcurrencyBudget:
+    """In-process slots; batch requests may not take the slots reserved for interactive ones."""
+
+    def __init__(self, limit: int = MAX_CONCURRENCY, batch_reserve: float = BATCH_RESERVE):
+        self.limit = limit
+        self.batch_limit = max(1, int(limit * (1 - batch_reserve)))
+        self.inflight = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, priority: str) -> bool:
+        limit = self.limit if priority == INTERACTIVE else self.batch_limit
+        with self._lock:
+            if self.inflight >= limit:
+                return False
+            self.inflight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.inflight = max(0, self.inflight - 1)
+
+
+class AdmissionController:
+    """Per-client and global admission for one route."""
+
+    def __init__(
+        self,
+        client_rate: float,
+        client_burst: float,
+        priority: str = INTERACTIVE,
+        backend: Any = None,
+        budget: Optional[ConcurrencyBudget] = None,
+        global_rate: float = GLOBAL_RATE,
+        global_burst: float = GLOBAL_BURST,
+        batch_reserve: float = BATCH_RESERVE,
+        enabled: bool = ADMISSION_ENABLED
+    ):
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.priority = priority
+        self.backend = backend or default_backend()
+        self.budget = budget or default_budget()
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        self.batch_reserve = batch_reserve
+        self.enabled = enabled
+        self.admitted = 0
+        self.rejected = 0
+
+    def admit(self, client_keys: list[str]) -> Decision:
+        if not self.enabled:
+            return Decision(True, priority=self.priority)
+
+        try:
+            taken = []
+            for key in client_keys:
+                wait = self.backend.take(key, self.client_rate, self.client_burst)
+                if wait > 0:
+                    self._refund(taken)
+                    return self._reject(wait, 'client_rate')
+                taken.append(key)
+
+            reserve = self.global_burst * self.batch_reserve if self.priority == BATCH else 0.0
+            wait = self.backend.take(GLOBAL_KEY, self.global_rate, self.global_burst, reserve=reserve)
+            if wait > 0:
+                self._refund(taken)
+                return self._reject(wait, 'global_rate')
+        except Exception as e:
+            # Fail open: a broken shared backend must not take the feature down
+            print(f'Admission backend error: {str(e)}')
+            return Decision(True, priority=self.priority)
+
+        if not self.budget.acquire(self.priority):
+            self._refund(taken)
+            self.backend.refund(GLOBAL_KEY, self.global_rate, self.global_burst)
+            return self._reject(1.0, 'concurrency')
+
+        self.admitted += 1
+        return Decision(True, priority=self.priority, holds_slot=True)
+
+    def release(self, decision: Decision):
+        if decision.holds_slot:
+            decision.holds_slot = False
+            self.budget.release()
+
+    def _refund(self, keys: list[str]):
+        for key in keys:
+            self.backend.refund(key, self.client_rate, self.client_burst)
+
+    def _reject(self, wait: float, reason: str) -> Decision:
+        self.rejected += 1
+        return Decision(False, retry_after=wait, reason=reason, priority=self.priority)
+
+
+_backend: Any = None
+_budget: Optional[ConcurrencyBudget] = None
+_lock = threading.Lock()
+
+
+def default_backend() -> Any:
+    """Backend shared by every controller in the process (chosen by ADMISSION_BACKEND)."""
+    global _backend
+    with _lock:
+        if _backend is None:
+            if ADMISSION_BACKEND == 'redis':
+                _backend = RedisBackend()
+            elif ADMISSION_BACKEND == 'dynamodb':
+                _backend = DynamoDBBackend()
+            else:
+                _backend = MemoryBackend()
+        return _backend
+
+
+def default_budget() -> ConcurrencyBudget:
+    global _budget
+    with _lock:
+        if _budget is None:
+            _budget = ConcurrencyBudget()
+        return _budget
+
+
+def from_env(prefix: str, priority: str, rate: float, burst: float) -> AdmissionController:
+    """Controller for a route, with per-client limits overridable via <PREFIX>_RATE / <PREFIX>_BURST."""
+    return AdmissionController(
+        client_rate=float(os.environ.get(f'{prefix}_RATE', str(rate))),
+        client_burst=float(os.environ.get(f'{prefix}_BURST', str(burst))),
+        priority=priority
+    )
+
+
+def source_ip(event: dict) -> str:
+    http = (event.get('requestContext') or {}).get('http') or {}
+    if http.get('sourceIp'):
+        return http['sourceIp']
+    headers = event.get('headers') or {}
+    forwarded = headers.get('x-forwarded-for') or headers.get('X-Forwarded-For') or ''
+    return forwarded.split(',')[0].strip() or 'unknown'
+
+
+def throttled_response(decision: Decision) -> dict:
+    return {
+        'statusCode': 429,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Expose-Headers': 'Retry-After',
+            'Retry-After': decision.retry_after_header
+        },
+        'body': json.dumps({
+            'error': 'Too many requests',
+            'reason': decision.reason,
+            'retryAfter': int(decision.retry_after_header)
+        })
+    }
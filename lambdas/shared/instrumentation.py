@@ -0,0 +1,288 @@
+"""
+Per-invocation timing spans and CloudWatch Embedded Metric Format (EMF) output.
+
+Wrap the handler with `instrument()` and every outbound call with `span()`:
+
+    @instrumentation.instrument('chatbot')
+    def lambda_handler(event, context): ...
+
+    with instrumentation.span('bedrock', 'InvokeModel') as s:
+        response = bedrock.invoke_model(...)
+        s.set(InputTokens=usage['input_tokens'], ResponseBytes=len(raw))
+
+Spans are aggregated per dependency while the invocation runs and written
+once, when it finishes, as a single stdout write of EMF documents. CloudWatch
+Logs turns them into metrics with no PutMetricData calls:
+
+- namespace METRICS_NAMESPACE, dimensions [Function]: DurationMs, ColdStart,
+  InstrumentationOverheadUs and anything added with `metric()`;
+- dimensions [Function, Dependency]: LatencyMs (one value per call), Calls,
+  Errors and the values set on the spans (tokens, payload sizes, ...), plus
+  CacheHits/CacheMisses from `cache()`.
+
+Spans may also be opened on worker threads, if the work is handed over with
+`submit()`, which carries the invocation into the thread.
+
+Metric units follow the name: *Ms milliseconds, *Us microseconds, *Bytes bytes,
+anything else a count. Outside an instrumented invocation (imports, scripts)
+all calls are no-ops. The bookkeeping cost of every invocation is measured and
+reported as InstrumentationOverheadUs; `python benchmarks/bench_instrumentation.py`
+checks it against OVERHEAD_BUDGET_US.
+
+Environment:
+    METRICS_ENABLED              true/false (default true)
+    METRICS_NAMESPACE            (default Dermastore/Lambdas)
+"""
+
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Optional
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'Dermastore/Lambdas')
+# Per-request budget for span bookkeeping plus the flush, enforced by the benchmark
+OVERHEAD_BUDGET_US = 250
+
+_current: contextvars.ContextVar[Optional['Invocation']] = contextvars.ContextVar('invocation', default=None)
+_cold_start = True
+
+
+def _unit(name: str) -> str:
+    if name.endswith('Ms'):
+        return 'Milliseconds'
+    if name.endswith('Us'):
+        return 'Microseconds'
+    if name.endswith('Bytes'):
+        return 'Bytes'
+    return 'Count'
+
+
+class Dependency:
+    """Everything one invocation recorded against one downstream dependency."""
+
+    __slots__ = ('latencies_ms', 'errors', 'values', 'operations')
+
+    def __init__(self):
+        self.latencies_ms: list[float] = []
+        self.errors = 0
+        self.values: dict[str, float] = {}
+        self.operations: dict[str, int] = {}
+
+    def add(self, name: str, value: float):
+        self.values[name] = self.values.get(name, 0) + value
+
+
+class Span:
+    """Times one outbound call; exceptions are counted as errors and re-raised."""
+
+    __slots__ = ('invocation', 'dependency', 'operation', 'values', 'start_ns')
+
+    def __init__(self, invocation: 'Invocation', dependency: str, operation: str):
+        self.invocation = invocation
+        self.dependency = dependency
+        self.operation = operation
+        self.values: Optional[dict[str, float]] = None
+        self.start_ns = 0
+
+    def set(self, **values: float) -> 'Span':
+        """Attach counts/sizes to this call (summed per dependency for the invocation)."""
+        if self.values is None:
+            self.values = values
+        else:
+            self.values.update(values)
+        return self
+
+    def __enter__(self) -> 'Span':
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        end_ns = time.perf_counter_ns()
+        self.invocation._record(self, (end_ns - self.start_ns) / 1e6, exc_type is not None)
+        self.invocation.overhead_ns += time.perf_counter_ns() - end_ns
+        return False
+
+
+class _NullSpan:
+    """Returned when nothing is being recorded."""
+
+    __slots__ = ()
+
+    def set(self, **values: float) -> '_NullSpan':
+        return self
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Invocation:
+    """Metrics of one handler invocation, flushed as EMF when it ends."""
+
+    def __init__(self, function: str, request_id: str = '', cold_start: bool = False):
+        self.function = function
+        self.request_id = request_id
+        self.cold_start = cold_start
+        self.dependencies: dict[str, Dependency] = {}
+        self.metrics: dict[str, float] = {}
+        self.properties: dict[str, Any] = {}
+        self.start_ns = time.perf_counter_ns()
+        self.overhead_ns = 0
+        self._lock = threading.Lock()  # spans submitted to worker threads record concurrently
+
+    def _dependency(self, name: str) -> Dependency:
+        dependency = self.dependencies.get(name)
+        if dependency is None:
+            dependency = self.dependencies[name] = Dependency()
+        return dependency
+
+    def _record(self, span: Span, elapsed_ms: float, failed: bool):
+        with self._lock:
+            dependency = self._dependency(span.dependency)
+            dependency.latencies_ms.append(round(elapsed_ms, 3))
+            dependency.operations[span.operation] = dependency.operations.get(span.operation, 0) + 1
+            if failed:
+                dependency.errors += 1
+            if span.values:
+                for name, value in span.values.items():
+                    dependency.add(name, value)
+
+    def summary_document(self, timestamp: int, duration_ms: float) -> dict:
+        metrics = {
+            'DurationMs': round(duration_ms, 3),
+            'ColdStart': int(self.cold_start),
+            'InstrumentationOverheadUs': round(self.overhead_ns / 1000, 1),
+            **self.metrics
+        }
+        return self._document(timestamp, ['Function'], metrics, {
+            'Function': self.function, 'RequestId': self.request_id, **self.properties
+        })
+
+    def dependency_documents(self, timestamp: int) -> list[dict]:
+        documents = []
+        for name, dependency in self.dependencies.items():
+            metrics = {}
+            if dependency.latencies_ms:  # Cache-only dependencies have outcomes but no calls
+                metrics = {
+                    'LatencyMs': dependency.latencies_ms,
+                    'Calls': len(dependency.latencies_ms),
+                    'Errors': dependency.errors
+                }
+            metrics.update(dependency.values)
+            documents.append(self._document(timestamp, ['Function', 'Dependency'], metrics, {
+                'Function': self.function, 'Dependency': name, 'RequestId': self.request_id,
+                'Operations': dependency.operations
+            }))
+        return documents
+
+    @staticmethod
+    def _document(timestamp: int, dimensions: list[str], metrics: dict, properties: dict) -> dict:
+        return {
+            '_aws': {
+                'Timestamp': timestamp,
+                'CloudWatchMetrics': [{
+                    'Namespace': METRICS_NAMESPACE,
+                    'Dimensions': [dimensions],
+                    'Metrics': [{'Name': name, 'Unit': _unit(name)} for name in metrics]
+                }]
+            },
+            **properties,
+            **metrics
+        }
+
+    def flush(self, write: Optional[Callable[[str], Any]] = None):
+        """One write for the whole invocation; the summary line reports the overhead up to it."""
+        end_ns = time.perf_counter_ns()
+        timestamp = int(time.time() * 1000)
+        lines = [json.dumps(document, separators=(',', ':')) for document in self.dependency_documents(timestamp)]
+        self.overhead_ns += time.perf_counter_ns() - end_ns
+        summary = self.summary_document(timestamp, (end_ns - self.start_ns) / 1e6)
+        lines.insert(0, json.dumps(summary, separators=(',', ':')))
+        (write or sys.stdout.write)('\n'.join(lines) + '\n')
+
+
+def current() -> Optional[Invocation]:
+    return _current.get()
+
+
+def span(dependency: str, operation: str) -> Any:
+    """Context manager timing one call to `dependency` (e.g. 'bedrock', 'InvokeModel')."""
+    invocation = _current.get()
+    if invocation is None:
+        return NULL_SPAN
+    return Span(invocation, dependency, operation)
+
+
+def cache(dependency: str, hit: bool):
+    """Record a cache lookup outcome (CacheHits / CacheMisses) for `dependency`."""
+    invocation = _current.get()
+    if invocation is not None:
+        with invocation._lock:
+            invocation._dependency(dependency).add('CacheHits' if hit else 'CacheMisses', 1)
+
+
+def metric(name: str, value: float = 1):
+    """Add to an invocation-level metric (dimension Function only)."""
+    invocation = _current.get()
+    if invocation is not None:
+        with invocation._lock:
+            invocation.metrics[name] = invocation.metrics.get(name, 0) + value
+
+
+def prop(name: str, value: Any):
+    """Attach a searchable, non-metric field (e.g. route, status code) to the invocation document."""
+    invocation = _current.get()
+    if invocation is not None:
+        invocation.properties[name] = value
+
+
+def submit(executor: Executor, fn: Callable, *args: Any) -> Future:
+    """`executor.submit()` that keeps spans and metrics of `fn` in the current invocation."""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+def instrument(function: str) -> Callable:
+    """
+    Decorator for a lambda_handler. The function name dimension is the Lambda
+    function name when deployed, `function` otherwise (service mode, tests).
+    """
+    def decorator(handler: Callable) -> Callable:
+        @functools.wraps(handler)
+        def wrapper(event: Any, context: Any) -> Any:
+            global _cold_start
+            if not METRICS_ENABLED:
+                return handler(event, context)
+            cold_start, _cold_start = _cold_start, False
+            invocation = Invocation(
+                os.environ.get('AWS_LAMBDA_FUNCTION_NAME') or function,
+                getattr(context, 'aws_request_id', '') or '',
+                cold_start
+            )
+            token = _current.set(invocation)
+            try:
+                result = handler(event, context)
+                if isinstance(result, dict) and 'statusCode' in result:
+                    invocation.properties['StatusCode'] = result['statusCode']
+                return result
+            except Exception:
+                invocation.metrics['UnhandledErrors'] = 1
+                raise
+            finally:
+                _current.reset(token)
+                try:
+                    invocation.flush()
+                except Exception as e:  # Metrics must never fail a request
+                    print(f'Metrics flush error: {str(e)}')
+        return wrapper
+    return decorator
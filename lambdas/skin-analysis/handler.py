@@ -1,16 +1,24 @@
 """
 AWS Lambda handler for AI Skin Analysis using Amazon Rekognition.
 Analyzes uploaded skin images and returns skin type, concerns, and recommendations.
+
+POST /api/skin-analysis/batch (or a body with `images`) analyzes several
+photos of one person for progress tracking: DetectFaces runs for all images on a
+bounded pool, then a single Bedrock call rates every image and compares them.
 """
 
 import json
 import base64
 import boto3
 import os
-from typing import Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
 from dataclasses import dataclass
 from datetime import datetime
 
+import admission
+import instrumentation
+
 # Initialize AWS clients
 rekognition = boto3.client('rekognition')
 bedrock = boto3.client('bedrock-runtime')
@@ -19,6 +27,25 @@ bedrock = boto3.client('bedrock-runtime')
 MODEL_ID = os.environ.get('BEDROCK_MODEL_ID', 'anthropic.claude-3-sonnet-20240229-v1:0')
 CONFIDENCE_THRESHOLD = 75.0
 
+# Batch limits. Decoded image bytes per request stay well under Lambda's 6 MB
+# synchronous payload once base64 encoded, and DetectFaces takes at most 5 MB per image.
+BATCH_MAX_IMAGES = int(os.environ.get('SKIN_ANALYSIS_BATCH_MAX_IMAGES', '8'))
+BATCH_MAX_BYTES = int(os.environ.get('SKIN_ANALYSIS_BATCH_MAX_BYTES', str(4 * 1024 * 1024)))
+# The whole request body: the images base64 encoded, plus room for labels and JSON
+BATCH_MAX_REQUEST_BYTES = int(os.environ.get(
+    'SKIN_ANALYSIS_BATCH_MAX_REQUEST_BYTES', str(BATCH_MAX_BYTES * 4 // 3 + 64 * 1024)
+))
+# Labels go into the prompt and the response, so they stay short single-line names
+BATCH_MAX_LABEL_CHARS = 64
+REKOGNITION_MAX_IMAGE_BYTES = 5 * 1024 * 1024
+REKOGNITION_CONCURRENCY = int(os.environ.get('SKIN_ANALYSIS_REKOGNITION_CONCURRENCY', '4'))
+
+# Shared by all requests in the container, so concurrent batches cannot exceed the DetectFaces TPS quota
+rekognition_pool = ThreadPoolExecutor(max_workers=REKOGNITION_CONCURRENCY, thread_name_prefix='rekognition')
+
+# Per-IP token bucket; analysis is batch priority so it cannot starve chat of Bedrock capacity
+limiter = admission.from_env('SKIN_ANALYSIS', admission.BATCH, rate=0.2, burst=3)
+
 
 @dataclass
 class SkinAnalysisResult:
@@ -36,17 +63,88 @@ def analyze_image_with_rekognition(image_bytes: bytes) -> dict:
     Use Amazon Rekognition to detect faces and facial attributes.
     """
     try:
-        response = rekognition.detect_faces(
-            Image={'Bytes': image_bytes},
-            Attributes=['ALL']
-        )
+        with instrumentation.span('rekognition', 'DetectFaces') as span:
+            response = rekognition.detect_faces(
+                Image={'Bytes': image_bytes},
+                Attributes=['ALL']
+            )
+            span.set(RequestBytes=len(image_bytes), Faces=len(response.get('FaceDetails', [])))
         
         if not response.get('FaceDetails'):
             raise ValueError('No face detected in image')
         
         return response['FaceDetails'][0]
     except Exception as e:
-        raise Exception(f'Rekognition analysis failed: {str(e)}')
+        raise Exception(f'Rekognition analysis failed: {str(e)}') from e
+
+
+def describe_face(face_data: dict) -> str:
+    """Facial analysis data as prompt lines."""
+    return f"""- Age Range: {face_data.get('AgeRange', {})}
+- Gender: {face_data.get('Gender', {})}
+- Emotions: {face_data.get('Emotions', [])}
+- Quality: Brightness={face_data.get('Quality', {}).get('Brightness', 0)}, Sharpness={face_data.get('Quality', {}).get('Sharpness', 0)}"""
+
+
+def invoke_bedrock_json(prompt: str, max_tokens: int) -> dict:
+    """
+    Send one prompt to Bedrock (Claude) and parse the JSON reply.
+    """
+    body = json.dumps({
+        'anthropic_version': 'bedrock-2023-05-31',
+        'max_tokens': max_tokens,
+        'messages': [
+            {
+                'role': 'user',
+                'content': prompt
+            }
+        ]
+    })
+
+    with instrumentation.span('bedrock', 'InvokeModel') as span:
+        response = bedrock.invoke_model(
+            modelId=MODEL_ID,
+            body=body,
+            contentType='application/json'
+        )
+        raw = response['body'].read()
+        response_body = json.loads(raw)
+        usage = response_body.get('usage', {})
+        span.set(
+            RequestBytes=len(body),
+            ResponseBytes=len(raw),
+            InputTokens=usage.get('input_tokens', 0),
+            OutputTokens=usage.get('output_tokens', 0)
+        )
+    content = response_body['content'][0]['text']
+
+    # Parse the JSON response
+    with instrumentation.span('json', 'DecodeAnalysis'):
+        return json.loads(content)
+
+
+def default_analysis() -> dict:
+    """Generic analysis returned when Bedrock fails."""
+    return {
+        'skin_type': 'Combination',
+        'concerns': [
+            {'name': 'General Skincare Maintenance', 'severity': 'low'}
+        ],
+        'recommendations': [
+            'Use a gentle cleanser twice daily',
+            'Apply moisturizer after cleansing',
+            'Use SPF 30+ sunscreen daily',
+            'Stay hydrated'
+        ],
+        'overall_score': 75,
+        'details': {
+            'hydration': 70,
+            'oiliness': 50,
+            'sensitivity': 40,
+            'texture': 75,
+            'pores': 60
+        }
+    }
 
 
 def analyze_with_bedrock(face_data: dict, image_base64: str) -> dict:
@@ -56,10 +154,7 @@ def analyze_with_bedrock(face_data: dict, image_base64: str) -> dict:
     prompt = f"""You are an expert dermatologist AI assistant. Analyze the following facial analysis data and provide skincare recommendations.
 
 Facial Analysis Data:
-- Age Range: {face_data.get('AgeRange', {})}
-- Gender: {face_data.get('Gender', {})}
-- Emotions: {face_data.get('Emotions', [])}
-- Quality: Brightness={face_data.get('Quality', {}).get('Brightness', 0)}, Sharpness={face_data.get('Quality', {}).get('Sharpness', 0)}
+{describe_face(face_data)}
 
 Based on this data, provide a JSON response with the following structure:
 {{
@@ -83,59 +178,228 @@ Based on this data, provide a JSON response with the following structure:
 
 Respond ONLY with valid JSON, no additional text."""
 
-    body = json.dumps({
-        'anthropic_version': 'bedrock-2023-05-31',
-        'max_tokens': 1024,
-        'messages': [
-            {
-                'role': 'user',
-                'content': prompt
-            }
-        ]
-    })
-
     try:
-        response = bedrock.invoke_model(
-            modelId=MODEL_ID,
-            body=body,
-            contentType='application/json'
-        )
-        
-        response_body = json.loads(response['body'].read())
-        content = response_body['content'][0]['text']
-        
-        # Parse the JSON response
-        return json.loads(content)
+        return invoke_bedrock_json(prompt, 1024)
     except Exception as e:
         # Return default analysis if Bedrock fails
-        return {
-            'skin_type': 'Combination',
-            'concerns': [
-                {'name': 'General Skincare Maintenance', 'severity': 'low'}
-            ],
-            'recommendations': [
-                'Use a gentle cleanser twice daily',
-                'Apply moisturizer after cleansing',
-                'Use SPF 30+ sunscreen daily',
-                'Stay hydrated'
+        print(f'Bedrock analysis error: {str(e)}')
+        instrumentation.metric('FallbackAnalyses')
+        return default_analysis()
+
+
+def analyze_batch_with_bedrock(faces: list[tuple[int, Optional[str], dict]]) -> dict:
+    """
+    Rate every (index, label, face data) in one Bedrock call and compare them.
+    """
+    images = '\n\n'.join(
+        f'Image {index}' + (f' (user label {json.dumps(label)})' if label else '') + f':\n{describe_face(face_data)}'
+        for index, label, face_data in faces
+    )
+    prompt = f"""You are an expert dermatologist AI assistant tracking one person's skin across several photos (for example before/after, or different angles). Analyze the facial analysis data of each image, then compare the images.
+
+{images}
+
+Based on this data, provide a JSON response with the following structure, with one entry in "images" per image above:
+{{
+    "images": [
+        {{
+            "index": image number,
+            "skin_type": "Oily|Dry|Combination|Normal|Sensitive",
+            "concerns": [
+                {{"name": "concern name", "severity": "low|medium|high"}}
             ],
-            'overall_score': 75,
-            'details': {
-                'hydration': 70,
-                'oiliness': 50,
-                'sensitivity': 40,
-                'texture': 75,
-                'pores': 60
-            }
-        }
+            "overall_score": 0-100,
+            "details": {{
+                "hydration": 0-100,
+                "oiliness": 0-100,
+                "sensitivity": 0-100,
+                "texture": 0-100,
+                "pores": 0-100
+            }}
+        }}
+    ],
+    "recommendations": [
+        "recommendation 1",
+        "recommendation 2"
+    ],
+    "comparison": {{
+        "summary": "one or two sentences on how the skin differs between the images",
+        "changes": [
+            {{"metric": "hydration|oiliness|sensitivity|texture|pores|overall", "direction": "improved|worsened|unchanged", "note": "short note"}}
+        ]
+    }}
+}}
+
+Use null for "comparison" when there is only one image. Keep notes short. Respond ONLY with valid JSON on a single line, without indentation or additional text."""
+
+    # Output grows with the number of images, so does the token budget. Unindented JSON
+    # keeps generation time, which dominates this call, down.
+    return invoke_bedrock_json(prompt, min(4096, 400 + 300 * len(faces)))
+
 
+def clean_label(label: Any) -> Optional[str]:
+    """A client label as one line of at most BATCH_MAX_LABEL_CHARS printable characters, or None."""
+    if not isinstance(label, (str, int, float)) or isinstance(label, bool):
+        return None
+    text = ' '.join(''.join(c if c.isprintable() else ' ' for c in str(label)[:BATCH_MAX_LABEL_CHARS * 4]).split())
+    return text[:BATCH_MAX_LABEL_CHARS] or None
 
+
+def decode_batch(images: list) -> list[dict]:
+    """
+    Decode batch entries (base64 strings or {"image": ..., "label": ...}) in order.
+    An entry that is missing, invalid, too large or over the batch byte budget
+    gets an `error` instead of failing the whole request.
+    """
+    entries, remaining = [], BATCH_MAX_BYTES
+    for index, item in enumerate(images):
+        image_data, label = (item.get('image'), item.get('label')) if isinstance(item, dict) else (item, None)
+        entry = {'index': index, 'label': clean_label(label)}
+        entries.append(entry)
+        if not image_data or not isinstance(image_data, str):
+            entry['error'] = 'No image provided'
+            continue
+
+        # Remove data URL prefix if present
+        if ',' in image_data:
+            image_data = image_data.split(',')[1]
+        try:
+            image_bytes = base64.b64decode(image_data)
+        except ValueError:
+            entry['error'] = 'Image is not valid base64'
+            continue
+
+        if len(image_bytes) > REKOGNITION_MAX_IMAGE_BYTES:
+            entry['error'] = f'Image is larger than {REKOGNITION_MAX_IMAGE_BYTES} bytes'
+        elif len(image_bytes) > remaining:
+            entry['error'] = f'Batch is larger than {BATCH_MAX_BYTES} image bytes'
+        else:
+            remaining -= len(image_bytes)
+            entry['bytes'] = image_bytes
+    return entries
+
+
+def detect_faces_batch(entries: list[dict]):
+    """Run DetectFaces for every decoded entry on the shared pool; failures stay per entry."""
+    futures = {
+        entry['index']: instrumentation.submit(rekognition_pool, analyze_image_with_rekognition, entry.pop('bytes'))
+        for entry in entries if 'bytes' in entry
+    }
+    for entry in entries:
+        future = futures.get(entry['index'])
+        if future is None:
+            continue
+        try:
+            entry['face'] = future.result()
+        except Exception as e:
+            print(f'Batch image {entry["index"]}: {str(e)}')
+            no_face = isinstance(e.__cause__, ValueError)
+            entry['error'] = str(e.__cause__) if no_face else 'An error occurred during face detection'
+
+
+def analyze_batch(event: dict, body: dict) -> dict:
+    """
+    POST /api/skin-analysis/batch with {"images": [...]}: per-image results in
+    request order, shared recommendations and a comparison of the images.
+    """
+    raw = event.get('body')
+    size = len(raw) if isinstance(raw, str) else len(json.dumps(body))
+    if size > BATCH_MAX_REQUEST_BYTES:
+        raise ValueError(f'Batch request is larger than {BATCH_MAX_REQUEST_BYTES} bytes')
+    images = body.get('images')
+    if not isinstance(images, list) or not images:
+        raise ValueError('Please provide a non-empty "images" list of base64-encoded images')
+    if len(images) > BATCH_MAX_IMAGES:
+        raise ValueError(f'At most {BATCH_MAX_IMAGES} images per batch')
+
+    entries = decode_batch(images)
+    decoded = [entry for entry in entries if 'bytes' in entry]
+    instrumentation.metric('BatchImages', len(entries))
+    instrumentation.metric('ImageBytes', sum(len(entry['bytes']) for entry in decoded))
+
+    analysis = None
+    if decoded:
+        # One admission for the batch: it makes a single Bedrock call
+        decision = limiter.admit([f'ip:{admission.source_ip(event)}'])
+        if not decision.allowed:
+            instrumentation.metric('AdmissionRejected')
+            return admission.throttled_response(decision)
+
+        try:
+            detect_faces_batch(entries)
+            faces = [(entry['index'], entry['label'], entry['face']) for entry in entries if 'face' in entry]
+            if faces:
+                try:
+                    analysis = analyze_batch_with_bedrock(faces)
+                except Exception as e:
+                    # Every analyzed image falls back to the default analysis below
+                    print(f'Bedrock batch analysis error: {str(e)}')
+        finally:
+            limiter.release(decision)
+
+    analysis = analysis if isinstance(analysis, dict) else {}
+    by_index = {}
+    for item in analysis.get('images') or []:
+        if isinstance(item, dict) and str(item.get('index', '')).isdigit():
+            by_index[int(item['index'])] = item
+    results = []
+    for entry in entries:
+        result = {'index': entry['index'], 'label': entry['label']}
+        if 'face' not in entry:
+            result.update(success=False, error=entry.get('error', 'Image was not analyzed'))
+            results.append(result)
+            continue
+
+        image_analysis = by_index.get(entry['index'])
+        if image_analysis is None:
+            # Bedrock failed or left this image out
+            image_analysis = default_analysis()
+            instrumentation.metric('FallbackAnalyses')
+        result.update(success=True, analysis={
+            'skinType': image_analysis.get('skin_type'),
+            'concerns': image_analysis.get('concerns', []),
+            'overallScore': image_analysis.get('overall_score'),
+            'details': image_analysis.get('details', {}),
+            'confidence': entry['face'].get('Confidence', 0)
+        })
+        results.append(result)
+
+    analyzed = sum(1 for result in results if result['success'])
+    instrumentation.metric('BatchImageErrors', len(results) - analyzed)
+    payload = {
+        'success': analyzed > 0,
+        'timestamp': datetime.utcnow().isoformat(),
+        'analyzed': analyzed,
+        'failed': len(results) - analyzed,
+        'results': results,
+        'recommendations': analysis.get('recommendations') or (
+            default_analysis()['recommendations'] if analyzed else []
+        ),
+        'comparison': analysis.get('comparison') if analyzed > 1 else None
+    }
+    if not analyzed:
+        payload['error'] = 'No image could be analyzed'
+
+    return {
+        'statusCode': 200 if analyzed else 400,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Methods': 'POST, OPTIONS',
+            'Access-Control-Allow-Headers': 'Content-Type'
+        },
+        'body': json.dumps(payload)
+    }
+
+
+@instrumentation.instrument('skin-analysis')
 def lambda_handler(event: dict, context: Any) -> dict:
     """
     Main Lambda handler for skin analysis.
     
     Expects:
     - POST request with base64-encoded image in body
+    - POST /skin-analysis/batch with an `images` list (see `analyze_batch`)
     
     Returns:
     - Skin analysis results with recommendations
@@ -146,6 +410,10 @@ def lambda_handler(event: dict, context: Any) -> dict:
             body = json.loads(event['body'])
         else:
             body = event.get('body', {})
+
+        path = event.get('rawPath', event.get('path', ''))
+        if path.endswith('/batch') or 'images' in body:
+            return analyze_batch(event, body)
         
         image_data = body.get('image')
         if not image_data:
@@ -167,12 +435,21 @@ def lambda_handler(event: dict, context: Any) -> dict:
         
         # Decode image
         image_bytes = base64.b64decode(image_data)
+        instrumentation.metric('ImageBytes', len(image_bytes))
         
-        # Analyze with Rekognition
-        face_data = analyze_image_with_rekognition(image_bytes)
+        decision = limiter.admit([f'ip:{admission.source_ip(event)}'])
+        if not decision.allowed:
+            instrumentation.metric('AdmissionRejected')
+            return admission.throttled_response(decision)
         
-        # Analyze with Bedrock
-        analysis = analyze_with_bedrock(face_data, image_data)
+        try:
+            # Analyze with Rekognition
+            face_data = analyze_image_with_rekognition(image_bytes)
+            
+            # Analyze with Bedrock
+            analysis = analyze_with_bedrock(face_data, image_data)
+        finally:
+            limiter.release(decision)
         
         # Build response
         result = {